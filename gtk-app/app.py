@@ -1,9 +1,34 @@
 #!/usr/bin/env python3
-import gi, subprocess, time, sys, os, configparser, json, re
+import gi, subprocess, time, sys, os, configparser, json, re, shutil, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+
+# When the process started, on the monotonic clock (interpreter start-up included)
+def process_start_time():
+    try:
+        with open("/proc/self/stat", "r") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        elapsed = time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+        return time.monotonic() - elapsed
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic()
+
+launched_at = process_start_time()
+# SMARTSCREENSHOT_STARTUP_TIMING=1 prints start-up milestones; "exit" also
+# quits once the window list and the redaction engine are loaded
+startup_timing = os.environ.get("SMARTSCREENSHOT_STARTUP_TIMING", "")
+
+def startup_mark(name):
+    if startup_timing:
+        print(f"Startup: {name} at {(time.monotonic() - launched_at) * 1000:.0f} ms")
 gi.require_version("Gtk", "3.0")
 gi.require_version("Wnck", "3.0")
 gi.require_version("GdkX11", "3.0")
-from gi.repository import Gtk, GdkPixbuf, Gdk, Wnck, GdkX11
+from gi.repository import Gtk, GdkPixbuf, Gdk, Wnck, GdkX11, GLib
+
+# Shared redaction code lives next to the scripts it is used by
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from common import client as redaction_client
+from common import tracing
 
 # Scan the scripts folder for subdirectories that contain a "main.py"
 def get_available_scripts(scripts_root="scripts"):
@@ -17,38 +42,63 @@ def get_available_scripts(scripts_root="scripts"):
                     available[entry] = main_py
     return available
 
+CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".config", "smartscreenshot")
+
+# Every [General] key with its default; new files get all of them and keys
+# missing from an older file are filled in on load
+DEFAULTS = {
+    "override_width": "",
+    "override_height": "",
+    "main_border_width": "10",
+    "image_viewer": "xdg-open",
+    "thumbnail_scale_divisor": "4",
+    "global_preview_scale_fraction": "0.5",
+    "container_border": "2",
+    "capture_delay": "0.5",
+    "watch_fps": "5",
+    "watch_budget_ms": "150",
+    "watch_sink": "",
+    "daemon_socket": "",
+    "daemon_timeout": "60",
+    "ocr_cache_dir": "",
+    "rules_file": "",
+    "ocr_tile_size": "0",
+    "ocr_tile_overlap": "200",
+    "ocr_workers": "0",
+    "ocr_prefilter": "0",
+    "ocr_profile": "balanced",
+    "ocr_timeout": "0",
+    "ml_model": "",
+    "ml_budget_ms": "200",
+    "ml_threshold": "0.5",
+    "redaction_mode": "gaussian",
+    "max_concurrent_jobs": "2",
+    "shm_handoff": "1",
+    "history_max_mb": "512",
+    "history_max_captures": "20",
+    "trace": "0",
+    "trace_file": "",
+    "chrome_trace": "",
+    "regions_file": os.path.join(CONFIG_DIR, "regions.json"),
+    "scripts_config": os.path.join(CONFIG_DIR, "scripts.json"),
+}
+
 def load_config():
     config = configparser.ConfigParser()
     if len(sys.argv) > 1:
         config_file = sys.argv[1]
     else:
-        home = os.path.expanduser("~")
-        config_file = os.path.join(home, ".config", "smartscreenshot", "smartscreenshot.ini")
+        config_file = os.path.join(CONFIG_DIR, "smartscreenshot.ini")
     os.makedirs(os.path.dirname(config_file), exist_ok=True)
     if os.path.exists(config_file):
         config.read(config_file)
     else:
-        config["General"] = {
-            "override_width": "",
-            "override_height": "",
-            "main_border_width": "10",
-            "image_viewer": "xdg-open",
-            "thumbnail_scale_divisor": "4",
-            "global_preview_scale_fraction": "0.5",
-            "container_border": "2",
-            "capture_delay": "0.5",
-            "scripts_config": os.path.join(os.path.expanduser("~"), ".config", "smartscreenshot", "scripts.json")
-        }
+        config["General"] = DEFAULTS
         with open(config_file, "w") as f:
             config.write(f)
-    if "container_border" not in config["General"]:
-        config["General"]["container_border"] = "2"
-    if "capture_delay" not in config["General"]:
-        config["General"]["capture_delay"] = "0.5"
-    if "image_viewer" not in config["General"]:
-        config["General"]["image_viewer"] = "xdg-open" 
-    if "scripts_config" not in config["General"]:
-        config["General"]["scripts_config"] = os.path.join(os.path.expanduser("~"), ".config", "smartscreenshot", "scripts.json")
+    for key, value in DEFAULTS.items():
+        if key not in config["General"]:
+            config["General"][key] = value
     return config, config_file
 
 def load_scripts_config(config):
@@ -77,56 +127,24 @@ def load_scripts_config(config):
                 scripts_conf = {"scripts": []}
         return scripts_conf
 
-# Blurring function using OpenCV
-def blur_region(image, x, y, w, h, kernel_size, sigma):
-    roi = image[y:y+h, x:x+w]
-    blurred_roi = cv2.GaussianBlur(roi, (kernel_size, kernel_size), sigma)
-    image[y:y+h, x:x+w] = blurred_roi
-
-# Automatically blur sensitive regions based on OCR results
-def auto_blur(image, kernel_size, sigma):
-    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-    texts = data["text"]
-    lefts = data["left"]
-    tops = data["top"]
-    widths = data["width"]
-    heights = data["height"]
-    print(f"Detected {len([t for t in texts if t.strip()])} non-empty text regions.")
-
-    sensitive_labels = ["password", "api key", "secret", "token", "pwd", "pass", "credential", "key"]
-    sensitive_patterns = [
-        re.compile(r'[a-fA-F0-9]{32,}'),
-        re.compile(r'[A-Za-z0-9-_]{20,}'),
-        re.compile(r'eyJ[A-Za-z0-9-_]+\.eyJ[A-Za-z0-9-_]+\.[A-Za-z0-9-_]+'),
-        re.compile(r'[A-Za-z0-9+/]{20,}=*'),
-    ]
-
-    sensitive_boxes = []
-    for i in range(len(texts)):
-        text = texts[i].strip()
-        if not text:
-            continue
-        lower_text = text.lower()
-        if any(label in lower_text for label in sensitive_labels):
-            print(f"Found potential sensitive label: '{texts[i]}'")
-            sensitive_boxes.append((lefts[i], tops[i], widths[i], heights[i]))
-            for j in range(i + 1, len(texts)):
-                if abs(tops[j] - tops[i]) < 10 and texts[j].strip():
-                    print(f"Blurring subsequent sensitive value: '{texts[j]}'")
-                    sensitive_boxes.append((lefts[j], tops[j], widths[j], heights[j]))
-                    break
-        elif any(pattern.search(text) for pattern in sensitive_patterns):
-            print(f"Found potential standalone secret: '{text}'")
-            sensitive_boxes.append((lefts[i], tops[i], widths[i], heights[i]))
-    print(f"Number of sensitive boxes detected: {len(sensitive_boxes)}")
-    for box in sensitive_boxes:
-        x, y, w, h = box
-        blur_region(image, x, y, w, h, kernel_size, sigma)
-    return image
-
-# Import cv2 and pytesseract after function definitions
-import cv2
-import pytesseract
+# OCR, detection and blurring are shared with the scripts (and their OCR
+# cache).  common.engine (OpenCV, tesseract) and pixbuf_bridge (NumPy) are
+# imported where they are used, and warmed up in the background once the
+# window is on screen, so they never delay the first paint.
+from common import manifest, shm_image
+from common.ocr_profiles import PROFILES
+from capture_store import CaptureStore
+from jobs import Job, JobQueue
+from preview import PreviewScaler
+from region_select import RegionSelector, RegionStore, clip_region
+startup_mark("imports done")
+
+# Wnck events for the window list are collected this long, then applied together
+WINDOW_UPDATE_DELAY_MS = 100
+
+# Scripts that read and write raw-pixel buffers (common/shm_image.py); any
+# other script under scripts/ gets PNG files
+SHM_SCRIPTS = ("secrets-handling", "userspecific")
 
 class ScreenshotApp(Gtk.Window):
     def __init__(self):
@@ -179,6 +197,77 @@ class ScreenshotApp(Gtk.Window):
             self.capture_delay = float(self.config["General"].get("capture_delay", "0.5"))
         except ValueError:
             self.capture_delay = 0.5
+        # Watch mode: live redaction of one window into a sink (see scripts/common/watch.py)
+        try:
+            self.watch_fps = float(self.config["General"].get("watch_fps", "5"))
+            if self.watch_fps <= 0:
+                self.watch_fps = 5
+        except ValueError:
+            self.watch_fps = 5
+        try:
+            self.watch_budget_ms = float(self.config["General"].get("watch_budget_ms", "150"))
+        except ValueError:
+            self.watch_budget_ms = 150
+        self.watch_sink = self.config["General"].get("watch_sink", "")
+        self.watchers = {}
+        # Remembered capture regions, one per window class
+        self.regions = RegionStore(os.path.expanduser(self.config["General"].get("regions_file", "")))
+        self.daemon_socket = self.config["General"].get("daemon_socket", "") or None
+        # How long a daemon request may hang before the script runs instead
+        try:
+            os.environ["SMARTSCREENSHOT_DAEMON_TIMEOUT"] = str(float(self.config["General"].get("daemon_timeout", "60")))
+        except ValueError:
+            pass
+        # The engine reads its settings from the environment when it is first
+        # imported; the scripts started from here inherit the same values
+        ocr_cache_dir = self.config["General"].get("ocr_cache_dir", "")
+        if ocr_cache_dir:
+            os.environ["SMARTSCREENSHOT_OCR_CACHE"] = os.path.expanduser(ocr_cache_dir)
+        # Exported so the scripts started from here pick up the same rules
+        rules_file = self.config["General"].get("rules_file", "")
+        if rules_file:
+            os.environ["SMARTSCREENSHOT_RULES"] = os.path.expanduser(rules_file)
+        # Tiled or text-region OCR, in-process and in the scripts
+        for key, env_name in (("ocr_tile_size", "SMARTSCREENSHOT_OCR_TILE_SIZE"),
+                              ("ocr_tile_overlap", "SMARTSCREENSHOT_OCR_TILE_OVERLAP"),
+                              ("ocr_workers", "SMARTSCREENSHOT_OCR_WORKERS"),
+                              ("ocr_prefilter", "SMARTSCREENSHOT_OCR_PREFILTER")):
+            try:
+                os.environ[env_name] = str(int(self.config["General"].get(key, "0")))
+            except ValueError:
+                continue
+        # fast, balanced or accurate; HiDPI captures are shrunk to logical size first
+        self.ocr_profile = self.config["General"].get("ocr_profile", "balanced")
+        if self.ocr_profile in PROFILES:
+            os.environ["SMARTSCREENSHOT_OCR_PROFILE"] = self.ocr_profile
+        else:
+            print(f"Unknown ocr_profile '{self.ocr_profile}', using the default.")
+            self.ocr_profile = None
+        try:
+            os.environ["SMARTSCREENSHOT_OCR_TIMEOUT"] = str(float(self.config["General"].get("ocr_timeout", "0")))
+        except ValueError:
+            pass
+        # Optional classifier next to the regex rules; loaded on first detection
+        ml_model = self.config["General"].get("ml_model", "")
+        if ml_model:
+            os.environ["SMARTSCREENSHOT_ML_MODEL"] = os.path.expanduser(ml_model)
+        for key, env_name in (("ml_budget_ms", "SMARTSCREENSHOT_ML_BUDGET_MS"),
+                              ("ml_threshold", "SMARTSCREENSHOT_ML_THRESHOLD")):
+            try:
+                os.environ[env_name] = str(float(self.config["General"].get(key, "")))
+            except ValueError:
+                continue
+        os.environ["SMARTSCREENSHOT_SCALE_FACTOR"] = str(float(monitor.get_scale_factor()))
+        # gaussian, fast, pixelate or fill
+        os.environ["SMARTSCREENSHOT_REDACTION_MODE"] = self.config["General"].get("redaction_mode", "gaussian")
+        # Span tracing, shared with the scripts through the environment
+        for key, env_name in (("trace", "SMARTSCREENSHOT_TRACE"),
+                              ("trace_file", "SMARTSCREENSHOT_TRACE_FILE"),
+                              ("chrome_trace", "SMARTSCREENSHOT_CHROME_TRACE")):
+            value = self.config["General"].get(key, "")
+            if value:
+                os.environ[env_name] = os.path.expanduser(value) if key != "trace" else value
+        tracing.configure()
 
         # Store manual blur parameters from command-line (or default)
         if len(sys.argv) >= 4:
@@ -198,9 +287,42 @@ class ScreenshotApp(Gtk.Window):
         else:
             self.manual_sigma = 30
 
+        try:
+            max_jobs = int(self.config["General"].get("max_concurrent_jobs", "2"))
+        except ValueError:
+            max_jobs = 2
+        self.jobs = JobQueue(max_jobs)
+        # Per-job inputs and outputs, so concurrent jobs never share a file.
+        # The bundled scripts get raw pixels through shared memory instead of PNGs
+        self.shm_handoff = self.config["General"].get("shm_handoff", "1").strip().lower() in ("1", "true", "yes", "on")
+        self.work_dir = tempfile.mkdtemp(prefix="smartscreenshot-",
+                                         dir=shm_image.shm_dir() if self.shm_handoff else None)
+        # Captures and their edits, kept in memory for undo/redo (see capture_store.py)
+        try:
+            history_max_mb = float(self.config["General"].get("history_max_mb", "512"))
+        except ValueError:
+            history_max_mb = 512
+        try:
+            history_max_captures = int(self.config["General"].get("history_max_captures", "20"))
+        except ValueError:
+            history_max_captures = 20
+        self.store = CaptureStore(self.work_dir, int(history_max_mb * 1024 * 1024), history_max_captures)
+        self.updating_history = False
+
         self.set_default_size(self.screen_width // 2, self.screen_height // 2)
         self.last_pixbuf = None
         self.last_capture_name = "None"
+        self.preview_scaler = PreviewScaler()
+        self.preview_revision = None
+        # The last redaction's manifest, the revision it was detected on and the
+        # revision rendered from it; the blur slider re-renders from these
+        self.last_manifest = None
+        self.manifest_source = None
+        self.manifest_revision = None
+        self.manifest_output = None
+        self.rerender_source = None
+        self.render_generation = 0
+        self.render_pool = ThreadPoolExecutor(max_workers=1)
 
         notebook = Gtk.Notebook()
         self.add(notebook)
@@ -218,6 +340,13 @@ class ScreenshotApp(Gtk.Window):
         capture_full_btn = Gtk.Button(label="Capture Full Screen")
         capture_full_btn.connect("clicked", self.on_capture_full_clicked)
         button_box.pack_start(capture_full_btn, False, False, 0)
+        capture_region_btn = Gtk.Button(label="Capture Screen Region")
+        capture_region_btn.set_tooltip_text("Capture the remembered part of the screen; Select Region picks a new one")
+        capture_region_btn.connect("clicked", lambda b: self.capture_region(None, "Screen"))
+        button_box.pack_start(capture_region_btn, False, False, 0)
+        select_region_btn = Gtk.Button(label="Select Screen Region")
+        select_region_btn.connect("clicked", lambda b: self.capture_region(None, "Screen", select=True))
+        button_box.pack_start(select_region_btn, False, False, 0)
         refresh_btn = Gtk.Button(label="Refresh Window List")
         refresh_btn.connect("clicked", lambda b: self.populate_window_list())
         button_box.pack_start(refresh_btn, False, False, 0)
@@ -237,7 +366,20 @@ class ScreenshotApp(Gtk.Window):
         self.flowbox.set_row_spacing(10)
         self.flowbox.set_column_spacing(10)
         scrolled_list.add(self.flowbox)
-        self.populate_window_list()
+        self.thumbnail_cache = {}
+        self.thumbnail_sizes = {}
+        self.thumbnail_queue = []
+        self.thumbnail_widgets = {}
+        # xid -> (flowbox child, title button) of each window card; Wnck events
+        # for a window are collected in pending_windows and applied together
+        self.window_cards = {}
+        self.pending_windows = {}
+        self.window_update_source = None
+        self.tracking_windows = False
+        self.thumbnail_source = None
+        self.thumbnail_pool = ThreadPoolExecutor(max_workers=2)
+        self.watched_windows = set()
+        # Filled in after the first paint; see on_first_draw
 
         notebook.append_page(window_frame, Gtk.Label(label="Window Capture"))
 
@@ -251,6 +393,35 @@ class ScreenshotApp(Gtk.Window):
         manual_blur_btn = Gtk.Button(label="Manual Blur (Enter Keyword)")
         manual_blur_btn.connect("clicked", self.show_keyword_dialog)
         scripts_vbox.pack_start(manual_blur_btn, False, False, 0)
+        # Blur strength (kernel size); re-renders the last redaction without OCR
+        strength_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        strength_box.pack_start(Gtk.Label(label="Blur Strength:"), False, False, 0)
+        strength_scale = Gtk.Scale.new_with_range(Gtk.Orientation.HORIZONTAL, 3, 199, 2)
+        strength_scale.set_digits(0)
+        strength_scale.set_value(self.manual_kernel)
+        strength_scale.connect("value-changed", self.on_blur_strength_changed)
+        strength_box.pack_start(strength_scale, True, True, 0)
+        scripts_vbox.pack_start(strength_box, False, False, 0)
+        # Capture history: undo/redo within a capture, or go back to an earlier one
+        history_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        self.undo_btn = Gtk.Button(label="Undo")
+        self.undo_btn.connect("clicked", lambda b: self.on_undo())
+        history_box.pack_start(self.undo_btn, False, False, 0)
+        self.redo_btn = Gtk.Button(label="Redo")
+        self.redo_btn.connect("clicked", lambda b: self.on_redo())
+        history_box.pack_start(self.redo_btn, False, False, 0)
+        history_box.pack_start(Gtk.Label(label="History:"), False, False, 0)
+        self.history_combo = Gtk.ComboBoxText()
+        self.history_combo.connect("changed", self.on_history_selected)
+        history_box.pack_start(self.history_combo, True, True, 0)
+        scripts_vbox.pack_start(history_box, False, False, 0)
+        accel_group = Gtk.AccelGroup()
+        self.add_accel_group(accel_group)
+        self.undo_btn.add_accelerator("clicked", accel_group, Gdk.KEY_z, Gdk.ModifierType.CONTROL_MASK, Gtk.AccelFlags.VISIBLE)
+        self.redo_btn.add_accelerator("clicked", accel_group, Gdk.KEY_z,
+                                      Gdk.ModifierType.CONTROL_MASK | Gdk.ModifierType.SHIFT_MASK, Gtk.AccelFlags.VISIBLE)
+        self.redo_btn.add_accelerator("clicked", accel_group, Gdk.KEY_y, Gdk.ModifierType.CONTROL_MASK, Gtk.AccelFlags.VISIBLE)
+        self.refresh_history()
         # Add preview frame for last capture.
         preview_scrolled = Gtk.ScrolledWindow()
         preview_scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
@@ -267,12 +438,56 @@ class ScreenshotApp(Gtk.Window):
         self.global_preview = Gtk.Image()
         self.global_preview.set_hexpand(True)
         self.global_preview.set_vexpand(True)
+        # Boxes (in capture pixels) outlined over the preview while typing keywords
+        self.highlight_boxes = []
+        self.global_preview.connect_after("draw", self.on_preview_draw)
         preview_box.pack_start(self.global_preview, True, True, 0)
         scripts_vbox.pack_start(preview_scrolled, True, True, 0)
+        # Running and finished script jobs
+        jobs_frame = Gtk.Frame(label="Jobs")
+        jobs_frame.set_shadow_type(Gtk.ShadowType.IN)
+        jobs_scrolled = Gtk.ScrolledWindow()
+        jobs_scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        jobs_scrolled.set_min_content_height(120)
+        jobs_scrolled.add(self.jobs.listbox)
+        jobs_frame.add(jobs_scrolled)
+        scripts_vbox.pack_start(jobs_frame, False, False, 0)
 
         notebook.append_page(scripts_vbox, Gtk.Label(label="Scripts"))
 
+        self.startup_pending = {"window list", "engine"}
+        self.first_draw_handler = self.connect("draw", self.on_first_draw)
         self.show_all()
+        startup_mark("window built")
+
+    # Runs while the first frame is painted; the slow start-up work is queued
+    # behind it so the window appears first
+    def on_first_draw(self, widget, cr):
+        self.disconnect(self.first_draw_handler)
+        startup_mark("first paint")
+        GLib.idle_add(self.finish_startup)
+        return False
+
+    def finish_startup(self):
+        self.populate_window_list()
+        self.track_windows()
+        self.startup_done("window list")
+        threading.Thread(target=self.warm_up, daemon=True).start()
+        return False
+
+    # Import OpenCV, tesseract's wrapper and NumPy off the main thread
+    def warm_up(self):
+        with tracing.span("warm_up"):
+            from common import engine
+            import pixbuf_bridge
+        GLib.idle_add(self.startup_done, "engine")
+
+    def startup_done(self, name):
+        startup_mark(f"{name} loaded")
+        self.startup_pending.discard(name)
+        if not self.startup_pending and startup_timing == "exit":
+            self.destroy()
+        return False
 
     def create_script_selector(self):
         box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
@@ -306,58 +521,396 @@ class ScreenshotApp(Gtk.Window):
         if self.last_pixbuf is None:
             print("No capture available!")
             return
-        temp_input = "last_capture.png"
-        self.last_pixbuf.savev(temp_input, "png", [], [])
-        cmd = ["python3", script_path, temp_input, "output.png"]
+        name = os.path.basename(os.path.dirname(script_path))
+        shm = name in SHM_SCRIPTS
+        temp_input = self.write_job_input(self.last_pixbuf, shm)
+        if name == "secrets-handling":
+            args = extra_params.split()
+            try:
+                kernel_size = int(args[0]) if len(args) > 0 else 99
+                sigma = float(args[1]) if len(args) > 1 else 30
+            except ValueError:
+                kernel_size, sigma = 99, 30
+            self.run_secrets_handling(temp_input, "output.png", kernel_size, sigma)
+            return
+        temp_output = self.job_path("output", self.job_suffix(shm))
+        cmd = ["python3", script_path, temp_input, temp_output]
         if extra_params:
             cmd.extend(extra_params.split())
-        print("Running script:", " ".join(cmd))
-        subprocess.run(cmd)
+        parent = self.store.current
+        self.jobs.submit(Job(name, argv=cmd,
+                             output=(temp_output, "output.png"),
+                             on_done=lambda job: self.on_job_output(job, parent=parent)))
+
+    def job_path(self, kind, suffix=".png"):
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix=kind + "-", dir=self.work_dir)
+        os.close(fd)
+        return path
 
+    # `shm`: the file is for one of SHM_SCRIPTS
+    def job_suffix(self, shm=True):
+        return shm_image.SUFFIX if self.shm_handoff and shm else ".png"
+
+    # Input file for a script; a buffer for SHM_SCRIPTS when shm_handoff is on
+    def write_job_input(self, pixbuf, shm=True):
+        from pixbuf_bridge import pixbuf_to_buffer
+        path = self.job_path("input", self.job_suffix(shm))
+        with tracing.span("encode", path=path):
+            if shm_image.is_buffer(path):
+                pixbuf_to_buffer(pixbuf, path)
+            else:
+                pixbuf.savev(path, "png", [], [])
+        return path
+
+    # Write a revision's PNG for the user from the job pool, off the
+    # capture/redaction path; a revision is encoded at most once
+    def export_later(self, revision, path):
+        pixbuf = self.store.pixbuf(revision)
+        def save():
+            with tracing.span("encode", path=path):
+                self.store.export(revision, path, pixbuf)
+            print(f"Saved '{os.path.abspath(path)}'.")
+            return path
+        return self.jobs.submit(Job(f"save {os.path.basename(path)}", function=save))
+
+    # Queue a redaction: a daemon request when it is running, otherwise the script.
+    # `key` names a repeatedly captured source so the daemon only re-OCRs what
+    # changed; the script fallback OCRs the whole capture.
+    # The redaction's manifest is kept for the blur slider, with the current
+    # revision as its source; `origin` places a region capture in its window
+    # (see manifest.py).
+    def run_secrets_handling(self, input_path, output_path, kernel_size, sigma, key=None, origin=None):
+        if kernel_size % 2 == 0:
+            kernel_size += 1
+        temp_output = self.job_path("output", self.job_suffix())
+        manifest_path = manifest.manifest_path(temp_output)
+        secrets_script = os.path.join("scripts", "secrets-handling", "main.py")
+        cmd = ["python3", secrets_script, input_path, temp_output, str(kernel_size), str(sigma), "--manifest"]
+
+        # Probing the daemon can take up to a second, so it happens on the worker
+        def request():
+            if redaction_client.is_running(self.daemon_socket):
+                boxes = redaction_client.redact_file(input_path, temp_output, kernel_size, sigma,
+                                                     socket_path=self.daemon_socket, key=key,
+                                                     profile=self.ocr_profile, manifest_path=manifest_path)
+                if boxes is not None:
+                    print(f"Redaction daemon blurred {len(boxes)} regions.")
+                    return boxes
+                print("Redaction daemon did not process the request; running the script instead.")
+                return self.jobs.run_child(job, cmd, env={"SMARTSCREENSHOT_DAEMON": "0"})
+            return self.jobs.run_child(job, cmd)
+        job = Job("secrets-handling", function=request)
+        job.output = (temp_output, output_path)
+        parent = self.store.current
+        job.on_done = lambda job: self.on_job_output(job, (manifest_path, origin), parent)
+        return self.jobs.submit(job)
+
+    # Add a finished job's image to the history, move it to its final name and,
+    # if its capture is still the one on screen, show it and copy it to the
+    # clipboard.  `parent` is the revision the job started from: edits made
+    # since then are kept on top of the job's pixels (see capture_store.py), so
+    # a keyword blurred while a redaction ran does not disappear.
+    # `redaction` is (manifest path, origin) for redaction jobs.
+    def on_job_output(self, job, redaction=None, parent=None):
+        temp_output, final_output = job.output
+        if not os.path.exists(temp_output) or os.path.getsize(temp_output) == 0:
+            print(f"Job #{job.id} {job.name} produced no image.")
+            return
+        rebased = parent is not None and parent is not parent.capture.current
+        if shm_image.is_buffer(temp_output):
+            from pixbuf_bridge import buffer_to_pixbuf
+            with tracing.span("decode", path=temp_output):
+                pb = buffer_to_pixbuf(temp_output)
+            os.remove(temp_output)
+            revision = self.store.add_revision(pb, job.name, parent=parent)
+            self.export_later(revision, final_output)
+        else:
+            pb = GdkPixbuf.Pixbuf.new_from_file(temp_output)
+            revision = self.store.add_revision(pb, job.name, parent=parent)
+            if rebased:
+                os.remove(temp_output)
+                self.export_later(revision, final_output)
+            else:
+                shutil.move(temp_output, final_output)
+                print(f"Job #{job.id} result saved as '{os.path.abspath(final_output)}'.")
+        if redaction is not None:
+            # Re-renders start from what the redaction was put on top of
+            revisions = revision.capture.revisions
+            position = revisions.index(revision)
+            below = revisions[position - 1] if position > 0 else parent
+            self.keep_manifest(redaction, below, revision, final_output)
+        if revision.capture is not self.store.current_capture:
+            print(f"Job #{job.id} finished on '{revision.capture.name}', which is no longer shown; "
+                  "it is in the History list.")
+            self.refresh_history()
+            return
+        if rebased:
+            print(f"Job #{job.id} result applied under the edits made while it ran.")
+        self.show_revision(revision)
+        clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
+        clipboard.set_image(self.store.pixbuf(revision))
+        clipboard.store()
+
+    # Move a redaction's manifest next to its output and, when its capture is
+    # the one shown, remember it for re-rendering
+    def keep_manifest(self, redaction, source, revision, final_output):
+        manifest_path, origin = redaction
+        shown = revision.capture is self.store.current_capture
+        if shown:
+            self.last_manifest = None
+        if not os.path.exists(manifest_path):
+            return
+        saved_path = manifest.manifest_path(final_output)
+        shutil.move(manifest_path, saved_path)
+        try:
+            redactions = manifest.load(saved_path)
+        except (OSError, ValueError) as e:
+            print(f"Could not read the redaction manifest '{saved_path}':", e)
+            return
+        if origin is not None:
+            redactions["region"] = origin
+            manifest.save(saved_path, redactions)
+        print(f"Redaction manifest saved as '{os.path.abspath(saved_path)}'.")
+        if not shown:
+            return
+        self.last_manifest = redactions
+        self.manifest_source = source
+        self.manifest_revision = revision
+        self.manifest_output = final_output
+
+    def on_blur_strength_changed(self, scale):
+        kernel_size = int(scale.get_value()) | 1
+        # Keep sigma in proportion to the kernel
+        self.manual_sigma = self.manual_sigma * kernel_size / self.manual_kernel
+        self.manual_kernel = kernel_size
+        if self.rerender_source:
+            GLib.source_remove(self.rerender_source)
+        self.rerender_source = GLib.timeout_add(100, self.rerender_from_manifest)
+
+    # Blur the last redaction's source again at the slider's strength; no OCR
+    def rerender_from_manifest(self):
+        self.rerender_source = None
+        if self.last_manifest is None or self.manifest_source is None or self.store.current is not self.manifest_revision:
+            return False
+        self.render_generation += 1
+        generation = self.render_generation
+        source, redactions = self.store.pixbuf(self.manifest_source), self.last_manifest
+        kernel_size, sigma = self.manual_kernel, self.manual_sigma
+
+        def render():
+            from pixbuf_bridge import array_to_pixbuf, pixbuf_to_array
+            image = pixbuf_to_array(source, writable=True)
+            with tracing.span("render", boxes=len(redactions["redactions"]), kernel_size=kernel_size):
+                boxes = manifest.render(image, redactions, kernel_size, sigma, check=False)
+            GLib.idle_add(self.on_rerendered, generation, array_to_pixbuf(image), boxes)
+        self.render_pool.submit(render)
+        return False
+
+    def on_rerendered(self, generation, pixbuf, boxes):
+        # A newer slider position, an undo or a new capture replaced this render
+        if generation != self.render_generation or self.store.current is not self.manifest_revision:
+            return False
+        # One history entry per redaction, whatever the number of slider moves
+        revision = self.store.add_revision(pixbuf, f"blur {self.manual_kernel}", dirty=boxes, replace=True)
+        self.manifest_revision = revision
+        self.show_revision(revision, dirty=boxes)
+        clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
+        clipboard.set_image(pixbuf)
+        clipboard.store()
+        self.export_later(revision, self.manifest_output)
+        return False
+
+    # Show a revision from the history in the preview
+    def show_revision(self, revision, dirty=None):
+        capture = revision.capture
+        name = capture.name if revision is capture.revisions[0] else f"{capture.name} ({revision.label})"
+        self.update_global_preview(self.store.pixbuf(revision), name, revision, dirty=dirty)
+        self.refresh_history()
+
+    def refresh_history(self):
+        self.updating_history = True
+        self.history_combo.remove_all()
+        for capture in reversed(list(self.store.captures.values())):
+            self.history_combo.append(str(capture.id), f"#{capture.id} {capture.name}")
+        if self.store.current_capture is not None:
+            self.history_combo.set_active_id(str(self.store.current_capture.id))
+        self.updating_history = False
+        self.undo_btn.set_sensitive(self.store.can_undo())
+        self.redo_btn.set_sensitive(self.store.can_redo())
+
+    def on_undo(self):
+        revision = self.store.undo()
+        if revision:
+            self.show_revision(revision)
+
+    def on_redo(self):
+        revision = self.store.redo()
+        if revision:
+            self.show_revision(revision)
+
+    def on_history_selected(self, combo):
+        if self.updating_history or combo.get_active_id() is None:
+            return
+        revision = self.store.select(int(combo.get_active_id()))
+        if revision:
+            self.show_revision(revision)
+
+    # Matches are outlined on the preview as the keywords are typed; Apply
+    # blurs all of them at once.  The capture is OCR'd and indexed once, on a
+    # worker, when the dialog opens.
     def show_keyword_dialog(self, button):
+        if self.last_pixbuf is None:
+            print("No capture available!")
+            return
         dialog = Gtk.Dialog(title="Enter Keyword to Blur", transient_for=self, modal=True)
         dialog.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL,
                            "Apply", Gtk.ResponseType.APPLY,
                            "Done", Gtk.ResponseType.OK)
         content_area = dialog.get_content_area()
         entry = Gtk.Entry()
-        entry.set_placeholder_text("Enter keyword (e.g. password, host, etc.)")
+        entry.set_placeholder_text("Keywords, comma separated (e.g. password, host, /[0-9]{6}/)")
+        entry.set_activates_default(True)
         content_area.add(entry)
+        status = Gtk.Label(label="Reading text...")
+        status.set_xalign(0)
+        content_area.add(status)
+        dialog.set_default_response(Gtk.ResponseType.APPLY)
+        state = {"index": None, "revision": None}
+
+        def on_changed(entry):
+            index = state["index"]
+            if index is None:
+                return
+            from common.token_index import parse_terms
+            try:
+                words = index.search_all(parse_terms(entry.get_text()))
+            except re.error as e:
+                status.set_text(f"Invalid pattern: {e}")
+                self.set_highlight([])
+                return
+            status.set_text(f"{len(words)} matches")
+            self.set_highlight(index.boxes(words))
+
+        def on_indexed(job):
+            if dialog.get_window() is None:
+                return
+            if job.result is None:
+                status.set_text("Could not read the text of this capture.")
+                return
+            state["index"] = job.result
+            on_changed(entry)
+
+        def read_text():
+            state["revision"] = self.store.current
+            status.set_text("Reading text...")
+            self.index_keywords_later(self.last_pixbuf, on_indexed)
+
+        entry.connect("changed", on_changed)
         dialog.show_all()
+        read_text()
         while True:
             response = dialog.run()
             if response == Gtk.ResponseType.APPLY:
-                keyword = entry.get_text().strip().lower()
-                if keyword:
-                    self.manual_blur_by_keyword(keyword)
+                if state["index"] is None:
+                    continue
+                # A job finished meanwhile and replaced the capture: index that one
+                if self.store.current is not state["revision"]:
+                    state["index"] = None
+                    read_text()
+                    continue
+                if entry.get_text().strip():
+                    self.manual_blur_by_keyword(entry.get_text(), state["index"])
+                    state["revision"] = self.store.current
                     entry.set_text("")
-            elif response in (Gtk.ResponseType.OK, Gtk.ResponseType.CANCEL):
+            elif response in (Gtk.ResponseType.OK, Gtk.ResponseType.CANCEL, Gtk.ResponseType.DELETE_EVENT):
                 break
+        self.set_highlight([])
         dialog.destroy()
 
-    def manual_blur_by_keyword(self, keyword):
-        # Save the current capture to a temporary file and run OCR on it.
-        temp_file = "temp_capture.png"
-        self.last_pixbuf.savev(temp_file, "png", [], [])
-        image = cv2.imread(temp_file)
-        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-        texts = data["text"]
-        lefts = data["left"]
-        tops = data["top"]
-        widths = data["width"]
-        heights = data["height"]
-        count = 0
-        for i in range(len(texts)):
-            if keyword in texts[i].lower():
-                blur_region(image, lefts[i], tops[i], widths[i], heights[i],
-                            self.manual_kernel, self.manual_sigma)
-                count += 1
-        print(f"Blurred {count} regions containing '{keyword}'.")
-        cv2.imwrite(temp_file, image)
-        self.last_pixbuf = GdkPixbuf.Pixbuf.new_from_file(temp_file)
-        self.update_global_preview(self.last_pixbuf, self.last_capture_name)
-
-    def update_global_preview(self, pixbuf, capture_name):
+    # OCR `pixbuf` and build its keyword index on the job pool; `on_done(job)`
+    # gets the TokenIndex as job.result, or None when OCR timed out
+    def index_keywords_later(self, pixbuf, on_done):
+        from pixbuf_bridge import pixbuf_to_array
+        image = pixbuf_to_array(pixbuf)
+        def index():
+            from common import engine
+            from common.token_index import TokenIndex
+            try:
+                data = engine.run_ocr(image)
+            except engine.OCRTimeout as e:
+                print(f"Keyword search skipped: {e}")
+                return None
+            with tracing.span("keyword_index", words=len(data["text"])):
+                return TokenIndex(data)
+        return self.jobs.submit(Job("read text", function=index, on_done=on_done))
+
+    def set_highlight(self, boxes):
+        self.highlight_boxes = boxes
+        self.global_preview.queue_draw()
+
+    def on_preview_draw(self, widget, cr):
+        shown = widget.get_pixbuf()
+        if not self.highlight_boxes or shown is None or self.last_pixbuf is None:
+            return False
+        # Gtk.Image centres the scaled preview in its allocation
+        allocation = widget.get_allocation()
+        scale = shown.get_width() / float(self.last_pixbuf.get_width())
+        cr.translate((allocation.width - shown.get_width()) / 2, (allocation.height - shown.get_height()) / 2)
+        for x, y, w, h in self.highlight_boxes:
+            cr.rectangle(x * scale - 1, y * scale - 1, w * scale + 2, h * scale + 2)
+        cr.set_source_rgba(1.0, 0.85, 0.0, 0.35)
+        cr.fill_preserve()
+        cr.set_source_rgb(1.0, 0.6, 0.0)
+        cr.set_line_width(1.5)
+        cr.stroke()
+        return False
+
+    # `text` holds comma-separated keywords and /regexes/ (see token_index.py);
+    # `index` is a TokenIndex of the current capture, built here when missing
+    def manual_blur_by_keyword(self, text, index=None):
+        from common import engine
+        with tracing.span("keyword_blur", keyword=text):
+            try:
+                self._blur_keywords(text, index)
+            except engine.OCRTimeout as e:
+                print(f"Keyword blur skipped: {e}")
+            except re.error as e:
+                print(f"Keyword blur skipped, invalid pattern: {e}")
+
+    def _blur_keywords(self, text, index):
+        # Blur straight on a copy of the capture's pixels; no PNG round trip.
+        from common import engine
+        from common.token_index import TokenIndex, parse_terms, term_label
+        from pixbuf_bridge import pixbuf_to_array, array_to_pixbuf
+        terms = parse_terms(text)
+        image = pixbuf_to_array(self.last_pixbuf, writable=True)
+        if index is None:
+            index = TokenIndex(engine.run_ocr(image))
+        matches = [(term_label(term), index.boxes(index.search(term))) for term in terms]
+        boxes = index.boxes(index.search_all(terms))
+        label = ", ".join(label for label, _ in matches)
+        print(f"Blurred {len(boxes)} regions matching '{label}'.")
+        if not boxes:
+            return
+        # One blur and one history entry for every keyword
+        engine.blur_boxes(image, boxes, self.manual_kernel, self.manual_sigma)
+        engine.remember_ocr(image, index.data)
+        # Keyword boxes on top of a redaction join its manifest, so the slider keeps them
+        on_manifest = self.last_manifest is not None and self.store.current is self.manifest_revision
+        # Only the tiles under the boxes are stored; the rest is shared with the previous revision
+        revision = self.store.add_revision(array_to_pixbuf(image), f"blur '{label}'", dirty=boxes, pixels=image)
+        self.show_revision(revision, dirty=boxes)
+        if on_manifest:
+            for keyword, keyword_boxes in matches:
+                self.last_manifest["redactions"].extend(manifest.keyword_redactions(keyword_boxes, keyword))
+            manifest.save(manifest.manifest_path(self.manifest_output), self.last_manifest)
+            self.manifest_revision = revision
+
+    # Show `revision` (whose pixels are `pixbuf`); `dirty` lists the rects
+    # that changed since the previously shown revision, if known
+    def update_global_preview(self, pixbuf, capture_name, revision, dirty=None):
+        base_revision = self.preview_revision
+        self.preview_revision = revision
         self.last_pixbuf = pixbuf
         self.last_capture_name = capture_name
         self.last_capture_label.set_text(f"Last Capture: {capture_name}")
@@ -366,136 +919,409 @@ class ScreenshotApp(Gtk.Window):
             target_width = int(self.screen_width * self.preview_fraction)
             scale_factor = target_width / float(orig_width) if orig_width else 1
             new_height = int(pixbuf.get_height() * scale_factor)
-            scaled = pixbuf.scale_simple(target_width, new_height, GdkPixbuf.InterpType.HYPER)
+            with tracing.span("preview.scale", width=target_width, height=new_height):
+                scaled = self.preview_scaler.scale(pixbuf, target_width, new_height,
+                                                   self.global_preview.set_from_pixbuf, revision,
+                                                   dirty=dirty, base_revision=base_revision)
             self.global_preview.set_from_pixbuf(scaled)
 
-    def show_preview_dialog(self, pixbuf, title="Preview"):
-        temp_path = "temp_preview.png"
-        pixbuf.savev(temp_path, "png", [], [])
+    # Open a revision in the external viewer; its PNG is reused by later saves
+    def show_preview_dialog(self, revision, title="Preview"):
+        with tracing.span("encode", path="preview"):
+            path = self.store.file(revision)
+        return self.open_in_viewer(path)
+
+    def open_in_viewer(self, path):
         try:
             image_viewer = self.config["General"].get("image_viewer", "xdg-open")
-            subprocess.run([image_viewer, temp_path])
+            subprocess.run([image_viewer, path])
         except Exception as e:
             print("Error opening external viewer:", e)
         return None
 
-    def on_capture_full_clicked(self, button):
-        self.hide()
-        while Gtk.events_pending():
-            Gtk.main_iteration_do(False)
-        time.sleep(self.capture_delay)
-        root_window = Gdk.get_default_root_window()
-        width = root_window.get_width()
-        height = root_window.get_height()
-        pb = Gdk.pixbuf_get_from_window(root_window, 0, 0, width, height)
+    # Hide the app, wait capture_delay and grab the window's pixels; (x, y,
+    # width, height) are window coordinates, the pixbuf may be larger on HiDPI
+    def grab_window(self, gdk_win, width, height, x=0, y=0):
+        with tracing.span("capture_delay", delay=self.capture_delay):
+            self.hide()
+            while Gtk.events_pending():
+                Gtk.main_iteration_do(False)
+            time.sleep(self.capture_delay)
+        with tracing.span("capture", width=width, height=height):
+            pb = Gdk.pixbuf_get_from_window(gdk_win, x, y, width, height)
         self.show()
-        if not pb:
-            print("Screenshot failed (pb is None). Are you on X11?")
-            return
-        pb.savev("screenshot.png", "png", [], [])
-        abs_path = os.path.abspath("screenshot.png")
-        print("Screenshot saved at:", abs_path)
-        self.update_global_preview(pb, "Full Screen")
-        self.show_preview_dialog(pb, title="Full Screen Preview")
+        return pb
+
+    def on_capture_full_clicked(self, button):
+        with tracing.span("capture.full"):
+            root_window = Gdk.get_default_root_window()
+            width = root_window.get_width()
+            height = root_window.get_height()
+            pb = self.grab_window(root_window, width, height)
+            if not pb:
+                print("Screenshot failed (pb is None). Are you on X11?")
+                return
+            revision = self.store.add_capture(pb, "Full Screen")
+            self.export_later(revision, "screenshot.png")
+            self.show_revision(revision)
+            self.show_preview_dialog(revision, title="Full Screen Preview")
 
+    # Rebuild every card; afterwards Wnck's signals keep the list current
     def populate_window_list(self):
         for child in self.flowbox.get_children():
             self.flowbox.remove(child)
+        self.thumbnail_queue = []
+        self.thumbnail_widgets = {}
+        self.window_cards = {}
         screen = Wnck.Screen.get_default()
         screen.force_update()
-        windows = screen.get_windows()
-        for win in windows:
-            title = win.get_name()
-            if title and not win.is_minimized():
-                xid = win.get_xid()
-                vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
-                card_frame = Gtk.Frame()
-                card_frame.set_shadow_type(Gtk.ShadowType.IN)
-                card_frame.set_border_width(self.container_border)
-                inner_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
-                card_frame.add(inner_box)
-                btn = Gtk.Button(label=title)
-                btn.xid = xid
-                btn.connect("clicked", self.on_window_button_clicked)
-                inner_box.pack_start(btn, False, False, 0)
-                display = Gdk.Display.get_default()
-                gdk_win = GdkX11.X11Window.foreign_new_for_display(display, xid)
-                thumb = None
-                if gdk_win:
-                    geom = gdk_win.get_geometry()
-                    w_width, w_height = geom.width, geom.height
-                    pb = Gdk.pixbuf_get_from_window(gdk_win, 0, 0, w_width, w_height)
-                    if pb:
-                        new_width = self.screen_width // self.thumb_divisor
-                        scale_factor = new_width / float(w_width) if w_width else 1
-                        new_height = int(w_height * scale_factor) if w_height else 0
-                        if new_width > 0 and new_height > 0:
-                            thumb = pb.scale_simple(new_width, new_height, GdkPixbuf.InterpType.HYPER)
-                if not thumb:
-                    thumb = win.get_icon()
-                image_widget = Gtk.Image()
-                if thumb:
-                    image_widget.set_from_pixbuf(thumb)
+        for win in screen.get_windows():
+            if self.listed(win):
+                self.add_window_card(win)
+
+    def listed(self, win):
+        return bool(win.get_name()) and not win.is_minimized()
+
+    def add_window_card(self, win):
+        title = win.get_name()
+        xid = win.get_xid()
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        card_frame = Gtk.Frame()
+        card_frame.set_shadow_type(Gtk.ShadowType.IN)
+        card_frame.set_border_width(self.container_border)
+        inner_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        card_frame.add(inner_box)
+        btn = Gtk.Button(label=title)
+        btn.xid = xid
+        btn.connect("clicked", self.on_window_button_clicked)
+        inner_box.pack_start(btn, False, False, 0)
+        watch_btn = Gtk.ToggleButton(label="Watch")
+        watch_btn.xid = xid
+        watch_btn.set_active(xid in self.watchers)
+        watch_btn.connect("toggled", self.on_watch_toggled)
+        inner_box.pack_start(watch_btn, False, False, 0)
+        region_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+        region_btn = Gtk.Button(label="Region")
+        region_btn.set_tooltip_text("Capture only the part of this window picked with Select Region")
+        region_btn.connect("clicked", lambda b, xid=xid, win=win: self.capture_region(xid, win.get_class_group_name() or win.get_name()))
+        region_box.pack_start(region_btn, True, True, 0)
+        select_btn = Gtk.Button(label="Select Region")
+        select_btn.connect("clicked", lambda b, xid=xid, win=win: self.capture_region(xid, win.get_class_group_name() or win.get_name(), select=True))
+        region_box.pack_start(select_btn, True, True, 0)
+        inner_box.pack_start(region_box, False, False, 0)
+        # Show the cached thumbnail or the icon now; grab the real one later
+        image_widget = Gtk.Image()
+        thumb = self.thumbnail_cache.get(xid)
+        if not thumb:
+            thumb = win.get_icon()
+            self.queue_thumbnail(xid)
+        if thumb:
+            image_widget.set_from_pixbuf(thumb)
+        else:
+            image_widget.set_from_icon_name("application-x-executable", Gtk.IconSize.DIALOG)
+        self.thumbnail_widgets[xid] = image_widget
+        self.watch_window(win)
+        inner_box.pack_start(image_widget, False, False, 0)
+        vbox.pack_start(card_frame, True, True, 0)
+        self.flowbox.add(vbox)
+        vbox.show_all()
+        self.window_cards[xid] = (vbox.get_parent(), btn, watch_btn)
+
+    def remove_window_card(self, xid):
+        card = self.window_cards.pop(xid, None)
+        if card is None:
+            return
+        self.flowbox.remove(card[0])
+        self.thumbnail_widgets.pop(xid, None)
+        if xid in self.thumbnail_queue:
+            self.thumbnail_queue.remove(xid)
+
+    # Follow windows opening, closing, being renamed and (un)minimized
+    def track_windows(self):
+        if self.tracking_windows:
+            return
+        self.tracking_windows = True
+        screen = Wnck.Screen.get_default()
+        screen.connect("window-opened", lambda screen, win: self.schedule_window_update(win))
+        screen.connect("window-closed", lambda screen, win: self.schedule_window_update(win, closed=True))
+
+    # A burst of events (a workspace switch, an app opening several windows)
+    # is applied once, WINDOW_UPDATE_DELAY_MS after the first of them
+    def schedule_window_update(self, win, closed=False):
+        self.pending_windows[win.get_xid()] = None if closed else win
+        if self.window_update_source is None:
+            self.window_update_source = GLib.timeout_add(WINDOW_UPDATE_DELAY_MS, self.apply_window_updates)
+
+    def apply_window_updates(self):
+        self.window_update_source = None
+        pending, self.pending_windows = self.pending_windows, {}
+        with tracing.span("window_list.update", windows=len(pending)):
+            for xid, win in pending.items():
+                if win is None:
+                    self.forget_window(xid)
+                elif not self.listed(win):
+                    self.remove_window_card(xid)
+                elif xid in self.window_cards:
+                    self.window_cards[xid][1].set_label(win.get_name())
                 else:
-                    image_widget.set_from_icon_name("application-x-executable", Gtk.IconSize.DIALOG)
-                inner_box.pack_start(image_widget, False, False, 0)
-                vbox.pack_start(card_frame, True, True, 0)
-                self.flowbox.add(vbox)
-        self.flowbox.show_all()
+                    self.add_window_card(win)
+        return False
 
-    def on_window_button_clicked(self, button):
-        xid = button.xid
+    def forget_window(self, xid):
+        self.remove_window_card(xid)
+        self.watched_windows.discard(xid)
+        self.thumbnail_cache.pop(xid, None)
+        self.thumbnail_sizes.pop(xid, None)
+        self.stop_watch(xid)
+
+    # Thumbnails are grabbed one window per idle callback (Gdk calls must stay
+    # on the main thread) and scaled on a worker thread.
+    def queue_thumbnail(self, xid):
+        if xid not in self.thumbnail_queue:
+            self.thumbnail_queue.append(xid)
+        if self.thumbnail_source is None:
+            self.thumbnail_source = GLib.idle_add(self.grab_next_thumbnail)
+
+    def grab_next_thumbnail(self):
+        if not self.thumbnail_queue:
+            self.thumbnail_source = None
+            return False
+        xid = self.thumbnail_queue.pop(0)
         display = Gdk.Display.get_default()
         gdk_win = GdkX11.X11Window.foreign_new_for_display(display, xid)
-        if not gdk_win:
-            print("Failed to get Gdk.Window for XID", xid)
+        if gdk_win:
+            geom = gdk_win.get_geometry()
+            w_width, w_height = geom.width, geom.height
+            pb = Gdk.pixbuf_get_from_window(gdk_win, 0, 0, w_width, w_height)
+            if pb:
+                future = self.thumbnail_pool.submit(self.scale_thumbnail, pb, w_width, w_height)
+                size = (w_width, w_height)
+                future.add_done_callback(
+                    lambda f, xid=xid, size=size: GLib.idle_add(self.on_thumbnail_ready, xid, size, f.result()))
+        return True
+
+    def scale_thumbnail(self, pb, w_width, w_height):
+        new_width = self.screen_width // self.thumb_divisor
+        scale_factor = new_width / float(w_width) if w_width else 1
+        new_height = int(w_height * scale_factor) if w_height else 0
+        if new_width > 0 and new_height > 0:
+            return pb.scale_simple(new_width, new_height, GdkPixbuf.InterpType.HYPER)
+        return None
+
+    def on_thumbnail_ready(self, xid, size, thumb):
+        if thumb:
+            self.thumbnail_cache[xid] = thumb
+            self.thumbnail_sizes[xid] = size
+            image_widget = self.thumbnail_widgets.get(xid)
+            if image_widget:
+                image_widget.set_from_pixbuf(thumb)
+        return False
+
+    # Cached thumbnails stay valid until the window is resized or retitled
+    # (the closest to content damage that Wnck reports).  Title and state
+    # changes also update the window's card.
+    def watch_window(self, win):
+        xid = win.get_xid()
+        if xid in self.watched_windows:
+            return
+        self.watched_windows.add(xid)
+        win.connect("geometry-changed", self.on_window_geometry_changed)
+        win.connect("name-changed", self.on_window_content_changed)
+        win.connect("name-changed", self.schedule_window_update)
+        win.connect("state-changed", lambda win, changed, state: self.schedule_window_update(win))
+
+    def on_window_geometry_changed(self, win):
+        # Moving a window does not change what the thumbnail shows
+        x, y, width, height = win.get_client_window_geometry()
+        if self.thumbnail_sizes.get(win.get_xid()) != (width, height):
+            self.on_window_content_changed(win)
+
+    def on_window_content_changed(self, win):
+        xid = win.get_xid()
+        self.thumbnail_cache.pop(xid, None)
+        if xid in self.thumbnail_widgets:
+            self.queue_thumbnail(xid)
+
+    def on_watch_toggled(self, button):
+        if button.get_active():
+            self.start_watch(button.xid)
+        else:
+            self.stop_watch(button.xid)
+
+    # Capture the window every 1/watch_fps seconds without hiding the app and
+    # stream redacted frames to the sink (by default a buffer in /dev/shm)
+    def start_watch(self, xid):
+        if xid in self.watchers:
+            return
+        from common.watch import FrameRedactor, WatchPipeline, open_sink
+        spec = self.watch_sink or "shm:" + os.path.join(shm_image.shm_dir(), f"smartscreenshot-watch-{xid}{shm_image.SUFFIX}")
+        try:
+            sink = open_sink(os.path.expanduser(spec), self.watch_fps)
+        except ValueError as e:
+            print(e)
+            self.show_watching(xid, False)
+            return
+        redactor = FrameRedactor(f"watch:{xid}", self.manual_kernel, self.manual_sigma, self.watch_budget_ms)
+        source = GLib.timeout_add(max(1, int(1000 / self.watch_fps)), self.on_watch_tick, xid)
+        self.watchers[xid] = (WatchPipeline(redactor, sink), source)
+        print(f"Watching window {xid} at {self.watch_fps:g} fps into '{spec}'.")
+
+    def stop_watch(self, xid):
+        watcher = self.watchers.pop(xid, None)
+        if watcher is None:
             return
+        pipeline, source = watcher
+        if source:
+            GLib.source_remove(source)
+        stats = pipeline.redactor.stats
+        print(f"Stopped watching window {xid}: {stats['frames']} frames, {stats['reused']} with reused boxes, "
+              f"{stats['masked']} masked while OCR caught up, {pipeline.dropped} dropped.")
+        # Waits for the frame in flight, so keep it off the main loop
+        self.thumbnail_pool.submit(pipeline.close)
+        self.show_watching(xid, False)
+
+    # Set the card's Watch toggle without starting or stopping anything
+    def show_watching(self, xid, active):
+        card = self.window_cards.get(xid)
+        if card is None:
+            return
+        watch_btn = card[2]
+        watch_btn.handler_block_by_func(self.on_watch_toggled)
+        watch_btn.set_active(active)
+        watch_btn.handler_unblock_by_func(self.on_watch_toggled)
+
+    def on_watch_tick(self, xid):
+        if xid not in self.watchers:
+            return False
+        pipeline = self.watchers[xid][0]
+        # Still busy with the last frame: drop this one without capturing it
+        if pipeline.busy.is_set():
+            pipeline.dropped += 1
+            return True
+        display = Gdk.Display.get_default()
+        gdk_win = GdkX11.X11Window.foreign_new_for_display(display, xid)
+        if not gdk_win:
+            print("Watched window", xid, "is gone.")
+            self.watchers[xid] = (pipeline, 0)
+            self.stop_watch(xid)
+            return False
+        geom = gdk_win.get_geometry()
+        pb = Gdk.pixbuf_get_from_window(gdk_win, 0, 0, geom.width, geom.height)
+        if pb:
+            from pixbuf_bridge import pixbuf_to_array, to_bgr_frame
+            pipeline.submit(pixbuf_to_array(pb), convert=to_bgr_frame)
+        return True
+
+    def on_window_button_clicked(self, button):
+        xid = button.xid
+        with tracing.span("capture.window", xid=xid):
+            display = Gdk.Display.get_default()
+            gdk_win = GdkX11.X11Window.foreign_new_for_display(display, xid)
+            if not gdk_win:
+                print("Failed to get Gdk.Window for XID", xid)
+                return
+            geom = gdk_win.get_geometry()
+            width, height = geom.width, geom.height
+            pb = self.grab_window(gdk_win, width, height)
+            if not pb:
+                print("Failed to capture window with XID", xid)
+                return
+            revision = self.store.add_capture(pb, button.get_label())
+            if self.shm_handoff:
+                input_path = self.write_job_input(pb)
+                self.export_later(revision, "window_screenshot.png")
+            else:
+                with tracing.span("encode", path="window_screenshot.png"):
+                    input_path = self.store.export(revision, os.path.abspath("window_screenshot.png"))
+                print("Window screenshot saved at:", input_path)
+            self.show_revision(revision)
+            self.show_preview_dialog(revision, title="Window Capture Preview")
+            self.run_secrets_handling(input_path, "output.png", 51, 20, key=f"xid:{xid}")
+
+    # Capture part of a window (the whole screen when `xid` is None).  The region
+    # remembered for `name` is grabbed on its own; with `select`, or nothing
+    # remembered yet, the whole window is grabbed once to pick a new region.
+    def capture_region(self, xid, name, select=False):
+        display = Gdk.Display.get_default()
+        if xid is None:
+            gdk_win = Gdk.get_default_root_window()
+        else:
+            gdk_win = GdkX11.X11Window.foreign_new_for_display(display, xid)
+            if not gdk_win:
+                print("Failed to get Gdk.Window for XID", xid)
+                return
         geom = gdk_win.get_geometry()
         width, height = geom.width, geom.height
-        self.hide()
-        while Gtk.events_pending():
-            Gtk.main_iteration_do(False)
-        time.sleep(self.capture_delay)
-        pb = Gdk.pixbuf_get_from_window(gdk_win, 0, 0, width, height)
-        self.show()
+        region = self.regions.get(name)
+        region = clip_region(region, width, height) if region else None
+        if region and not select:
+            x, y, w, h = region
+            with tracing.span("capture.region", xid=xid, x=x, y=y, width=w, height=h):
+                pb = self.grab_window(gdk_win, w, h, x, y)
+            if not pb:
+                print(f"Failed to capture the region of '{name}'.")
+                return
+            self.process_region(pb, xid, name, region)
+            return
+
+        pb = self.grab_window(gdk_win, width, height)
         if not pb:
-            print("Failed to capture window with XID", xid)
+            print(f"Failed to capture '{name}'.")
             return
-        pb.savev("window_screenshot.png", "png", [], [])
-        abs_path = os.path.abspath("window_screenshot.png")
-        print("Window screenshot saved at:", abs_path)
-        self.update_global_preview(pb, button.get_label())
-        self.show_preview_dialog(pb, title="Window Capture Preview")
-        
-        secrets_script = os.path.join("scripts", "secrets-handling", "main.py")
-        cmd = ["python3", secrets_script, abs_path, "output.png", "51", "20"]
-        print("Running secrets-handling script with command:", " ".join(cmd))
-        subprocess.run(cmd)
+        # Device pixels per window pixel
+        scale = pb.get_width() / float(width) if width else 1.0
+        initial = tuple(int(v * scale) for v in region) if region else None
+
+        def on_selected(rect):
+            if rect is None:
+                return
+            region = clip_region(tuple(int(round(v / scale)) for v in rect), width, height)
+            if region is None:
+                return
+            self.regions.set(name, region)
+            x, y, w, h = rect
+            self.process_region(pb.new_subpixbuf(x, y, w, h).copy(), xid, name, region)
+        RegionSelector(pb, on_selected, initial=initial, title=f"Select Region: {name}", fullscreen=xid is None)
+
+    # Redact a region capture; only its pixels are encoded, OCR'd and blurred
+    def process_region(self, pb, xid, name, region):
+        x, y, w, h = region
+        with tracing.span("capture.region.process", width=pb.get_width(), height=pb.get_height()):
+            revision = self.store.add_capture(pb, f"{name} ({w}x{h} at {x},{y})")
+            if self.shm_handoff:
+                input_path = self.write_job_input(pb)
+                self.export_later(revision, "region_screenshot.png")
+            else:
+                with tracing.span("encode", path="region_screenshot.png"):
+                    input_path = self.store.export(revision, os.path.abspath("region_screenshot.png"))
+                print("Region screenshot saved at:", input_path)
+            self.show_revision(revision)
+            # Each remembered region of a window is its own incremental OCR source
+            key = f"xid:{xid}@{x},{y},{w},{h}" if xid is not None else f"screen@{x},{y},{w},{h}"
+            origin = {"window": name, "x": x, "y": y, "width": w, "height": h,
+                      "scale": pb.get_width() / float(w)}
+            self.run_secrets_handling(input_path, "output.png", 51, 20, key=key, origin=origin)
 
     def on_run_script(self, button, script_name, container):
         if self.last_pixbuf is None:
             print("No capture available!")
             return
-        temp_input = "last_capture.png"
-        self.last_pixbuf.savev(temp_input, "png", [], [])
+        # The revision's own PNG; the script only reads it
+        parent = self.store.current
+        temp_input = self.store.file(parent)
         params = []
         if container is not None and hasattr(container, "param_entries"):
             params = [entry.get_text() for entry in container.param_entries]
-        subprocess.run(["python3", script_name, temp_input, "last_capture.png"] + params)
-        try:
-            pb_processed = GdkPixbuf.Pixbuf.new_from_file("processed.png")
-            self.show_preview_dialog(pb_processed, title=f"{script_name} Preview")
-            clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
-            clipboard.set_image(pb_processed)
-            clipboard.store()
-        except Exception as e:
-            print("Error loading processed image:", e)
-        
+        temp_output = self.job_path("output")
+        self.jobs.submit(Job(script_name, argv=["python3", script_name, temp_input, temp_output] + params,
+                             output=(temp_output, "processed.png"),
+                             on_done=lambda job: self.on_job_output(job, parent=parent)))
+
     def on_preview_processed(self, button):
         if os.path.exists("processed.png"):
             try:
                 pb = GdkPixbuf.Pixbuf.new_from_file("processed.png")
-                self.show_preview_dialog(pb, title="Processed Image Preview")
+                self.open_in_viewer("processed.png")
                 clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
                 clipboard.set_image(pb)
                 clipboard.store()
@@ -529,14 +1355,9 @@ class ScreenshotApp(Gtk.Window):
             print("Selected file:", selected_file)
             pb = GdkPixbuf.Pixbuf.new_from_file(selected_file)
             if pb:
-                self.last_pixbuf = pb
-                self.last_capture_name = os.path.basename(selected_file)
-                self.update_global_preview(pb, self.last_capture_name)
+                self.show_revision(self.store.add_capture(pb, os.path.basename(selected_file)))
                 abs_path = os.path.abspath(selected_file)
-                secrets_script = os.path.join("scripts", "secrets-handling", "main.py")
-                cmd = ["python3", secrets_script, abs_path, "output.png", "51", "20"]
-                print("Running secrets-handling script with command:", " ".join(cmd))
-                subprocess.run(cmd)
+                self.run_secrets_handling(abs_path, "output.png", 51, 20)
             else:
                 print("Failed to load the selected image.")
         dialog.destroy()
@@ -544,4 +1365,6 @@ class ScreenshotApp(Gtk.Window):
 if __name__ == "__main__":
     app = ScreenshotApp()
     app.connect("destroy", Gtk.main_quit)
+    app.connect("destroy", lambda w: [w.stop_watch(xid) for xid in list(w.watchers)])
+    app.connect("destroy", lambda w: shutil.rmtree(w.work_dir, ignore_errors=True))
     Gtk.main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# In-memory history of captures and the edits made to them.
+#
+# A capture is a list of revisions: the captured pixels, then one per
+# redaction, keyword blur or re-render shown in the Scripts tab.  A revision
+# is a grid of TILE x TILE tiles, and a revision made from another one shares
+# every tile that did not change, so a keyword blur only stores the tiles it
+# touched.  Undo and redo move along the current capture's revisions; a new
+# edit after an undo drops the revisions that were undone.
+#
+# A job (a redaction, a script) starts from one revision and may finish after
+# the user made more edits.  Its result is then rebased: it goes on top of the
+# capture's current revision, with every pixel the newer edits changed taken
+# from them, so neither the job's work nor the user's is lost.  That holds
+# when the starting revision has since been dropped from the history too.  If
+# the capture itself was evicted, the result becomes a capture of its own.
+#
+# Each tile's bytes are counted once, by the revision that introduced it.
+# Beyond `max_bytes`, or `max_captures` captures, whole captures are evicted,
+# least recently used first; the current capture is never evicted.  Pixbufs
+# are assembled from the tiles when asked for and the last few are kept.
+# PNG files are only written when a file is needed (an external viewer, a
+# script, a saved copy), and at most once per revision.
+import itertools
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+TILE = 256
+MAX_PIXBUFS = 3
+
+class Revision:
+    def __init__(self, capture, label, tiles, own_bytes):
+        self.capture = capture
+        self.label = label
+        self.tiles = tiles
+        self.own_bytes = own_bytes
+        self.path = None
+
+class Capture:
+    ids = itertools.count(1)
+
+    def __init__(self, name, width, height, channels):
+        self.id = next(Capture.ids)
+        self.name = name
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.revisions = []
+        self.index = -1
+
+    @property
+    def current(self):
+        return self.revisions[self.index]
+
+    def memory(self):
+        return sum(revision.own_bytes for revision in self.revisions)
+
+class CaptureStore:
+    def __init__(self, work_dir, max_bytes=512 * 1024 * 1024, max_captures=20, tile=TILE):
+        self.work_dir = work_dir
+        self.max_bytes = max_bytes
+        self.max_captures = max(1, max_captures)
+        self.tile = tile
+        self.captures = OrderedDict()
+        self.current_capture = None
+        self.pixbufs = OrderedDict()
+        self.encode_lock = threading.Lock()
+
+    @property
+    def current(self):
+        return self.current_capture.current if self.current_capture else None
+
+    def memory(self):
+        return sum(capture.memory() for capture in self.captures.values())
+
+    def _tiles(self, height, width):
+        for y0 in range(0, height, self.tile):
+            for x0 in range(0, width, self.tile):
+                yield (y0 // self.tile, x0 // self.tile), (x0, y0, min(width, x0 + self.tile), min(height, y0 + self.tile))
+
+    # Start a new capture; its tiles are views into one copy of the pixels.
+    # With `select=False` the current capture stays current.
+    def add_capture(self, pixbuf, name, select=True):
+        from pixbuf_bridge import pixbuf_to_array
+        pixels = pixbuf_to_array(pixbuf)
+        height, width, channels = pixels.shape
+        capture = Capture(name, width, height, channels)
+        tiles = {key: pixels[y0:y1, x0:x1] for key, (x0, y0, x1, y1) in self._tiles(height, width)}
+        revision = Revision(capture, name, tiles, pixels.nbytes)
+        capture.revisions.append(revision)
+        capture.index = 0
+        self.captures[capture.id] = capture
+        if select or self.current_capture is None:
+            self._use(capture)
+        self._keep_pixbuf(revision, pixbuf)
+        self._evict()
+        return revision
+
+    # Add an edit of `parent` (default: the current revision).  Only the tiles
+    # under the `dirty` rects are taken from the new pixels; without `dirty`
+    # every tile is compared.  `pixels` is the new image as an array when the
+    # caller already has one.  `replace` swaps out the parent instead (a
+    # re-render of the same edit).  A `parent` that is no longer its capture's
+    # current revision is rebased (see above).  The result becomes current in
+    # its capture; the capture becomes the current one only if it was already.
+    def add_revision(self, pixbuf, label, dirty=None, pixels=None, parent=None, replace=False):
+        import numpy as np
+        from pixbuf_bridge import pixbuf_to_array
+        parent = parent or self.current
+        if parent is None:
+            return self.add_capture(pixbuf, label)
+        capture = parent.capture
+        selected = capture is self.current_capture
+        if capture.id not in self.captures:
+            return self.add_capture(pixbuf, label, select=False)
+        if pixels is None:
+            pixels = pixbuf_to_array(pixbuf)
+        if pixels.shape != (capture.height, capture.width, capture.channels):
+            return self.add_capture(pixbuf, label, select=selected and parent is capture.current)
+
+        base = capture.current
+        rebased = parent is not base
+        tiles = dict(base.tiles)
+        own_bytes = 0
+        for key, (x0, y0, x1, y1) in self._tiles(capture.height, capture.width):
+            if dirty is not None and not any(x < x1 and x + w > x0 and y < y1 and y + h > y0
+                                             for x, y, w, h in dirty):
+                continue
+            tile = pixels[y0:y1, x0:x1]
+            if rebased:
+                tile = self._rebase_tile(tile, parent.tiles[key], base.tiles[key])
+            if tile is base.tiles[key] or np.array_equal(tile, base.tiles[key]):
+                continue
+            tiles[key] = tile.copy()
+            own_bytes += tile.nbytes
+        revision = Revision(capture, label, tiles, own_bytes)
+
+        position = capture.index
+        if replace and not rebased and position > 0:
+            position -= 1
+            # The tiles the replaced revision introduced now belong to this one
+            revision.own_bytes = self._introduced(capture.revisions[position], revision)
+        for dropped in capture.revisions[position + 1:]:
+            self._forget(dropped)
+        capture.revisions[position + 1:] = [revision]
+        capture.index = position + 1
+        if selected:
+            self._use(capture)
+        if not rebased:
+            self._keep_pixbuf(revision, pixbuf)
+        self._evict()
+        return revision
+
+    # The job's tile with every pixel that later edits changed (from `old`,
+    # what the job started from, to `new`, the current revision) kept from them
+    def _rebase_tile(self, tile, old, new):
+        import numpy as np
+        if new is old or np.array_equal(new, old):
+            return tile
+        if np.array_equal(tile, old):
+            return new
+        changed = (new != old).any(axis=2, keepdims=True) if new.ndim == 3 else new != old
+        return np.where(changed, new, tile)
+
+    # Bytes of `revision`'s tiles that `base` does not have
+    def _introduced(self, base, revision):
+        return sum(tile.nbytes for key, tile in revision.tiles.items() if tile is not base.tiles[key])
+
+    def undo(self):
+        capture = self.current_capture
+        if capture is None or capture.index == 0:
+            return None
+        capture.index -= 1
+        return capture.current
+
+    def redo(self):
+        capture = self.current_capture
+        if capture is None or capture.index == len(capture.revisions) - 1:
+            return None
+        capture.index += 1
+        return capture.current
+
+    def can_undo(self):
+        return self.current_capture is not None and self.current_capture.index > 0
+
+    def can_redo(self):
+        capture = self.current_capture
+        return capture is not None and capture.index < len(capture.revisions) - 1
+
+    # Switch to another capture (by id); returns its current revision
+    def select(self, capture_id):
+        capture = self.captures.get(capture_id)
+        if capture is None:
+            return None
+        self._use(capture)
+        return capture.current
+
+    def _use(self, capture):
+        self.current_capture = capture
+        self.captures.move_to_end(capture.id)
+
+    def _evict(self):
+        while len(self.captures) > 1 and (len(self.captures) > self.max_captures or self.memory() > self.max_bytes):
+            # Least recently used first, skipping the current capture
+            capture_id = next(key for key in self.captures if key != self.current_capture.id)
+            capture = self.captures.pop(capture_id)
+            for revision in capture.revisions:
+                self._forget(revision)
+            print(f"Capture history: dropped '{capture.name}' ({capture.memory() / 1e6:.1f} MB).")
+
+    def _forget(self, revision):
+        self.pixbufs.pop(id(revision), None)
+        if revision.path and os.path.exists(revision.path):
+            os.remove(revision.path)
+        revision.path = None
+
+    def _keep_pixbuf(self, revision, pixbuf):
+        self.pixbufs[id(revision)] = (revision, pixbuf)
+        self.pixbufs.move_to_end(id(revision))
+        while len(self.pixbufs) > MAX_PIXBUFS:
+            self.pixbufs.popitem(last=False)
+
+    # The revision as a pixbuf; the same object while it stays cached
+    def pixbuf(self, revision):
+        cached = self.pixbufs.get(id(revision))
+        if cached is not None:
+            self.pixbufs.move_to_end(id(revision))
+            return cached[1]
+        import numpy as np
+        from pixbuf_bridge import array_to_pixbuf
+        capture = revision.capture
+        image = np.empty((capture.height, capture.width, capture.channels), dtype=np.uint8)
+        for key, (x0, y0, x1, y1) in self._tiles(capture.height, capture.width):
+            image[y0:y1, x0:x1] = revision.tiles[key]
+        pixbuf = array_to_pixbuf(image)
+        self._keep_pixbuf(revision, pixbuf)
+        return pixbuf
+
+    # A PNG of the revision, encoded on first use.  Off the main thread, pass
+    # the revision's `pixbuf` (from pixbuf()) so the cache is not touched there.
+    def file(self, revision, pixbuf=None):
+        with self.encode_lock:
+            if revision.path is None or not os.path.exists(revision.path):
+                capture = revision.capture
+                path = os.path.join(self.work_dir, f"capture-{capture.id}-{id(revision):x}.png")
+                (pixbuf or self.pixbuf(revision)).savev(path, "png", [], [])
+                revision.path = path
+            return revision.path
+
+    # Write the revision to `path`: a copy of its PNG when there already is one
+    def export(self, revision, path, pixbuf=None):
+        shutil.copyfile(self.file(revision, pixbuf), path)
+        return path
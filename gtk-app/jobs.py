@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# Script runs as non-blocking jobs driven by the GLib main loop.
+#
+# A job is either a command line, run with Gio.Subprocess so its exit is
+# delivered by the main loop, or a Python callable run on a worker thread
+# (used for requests to the redaction daemon).  A callable may start a
+# command itself with run_child(); Cancel stops that command too.  At most `max_running` jobs run
+# at once; the rest wait in order.  Every job gets a row with its status,
+# elapsed time and a Cancel button, and `on_done(job)` is called on the main
+# thread when it finishes successfully.
+import itertools
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gi
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gio, GLib, Gtk
+from common import tracing
+
+class Job:
+    ids = itertools.count(1)
+
+    def __init__(self, name, argv=None, function=None, on_done=None, output=None):
+        self.id = next(Job.ids)
+        self.name = name
+        self.argv = argv
+        self.function = function
+        self.on_done = on_done
+        self.output = output
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.process = None
+        # A command started from a callable job (see run_child)
+        self.child = None
+        # Spans of the job (and of the script it runs) nest under whatever
+        # span was current when the job was created.
+        self.trace_parent = tracing.context()
+        self.span = tracing.NO_SPAN
+        self.status_label = None
+        self.time_label = None
+        self.cancel_btn = None
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+class JobQueue:
+    def __init__(self, max_running=2):
+        self.max_running = max(1, max_running)
+        self.pending = []
+        self.running = []
+        self.pool = ThreadPoolExecutor(max_workers=self.max_running)
+        self.timer = None
+        self.listbox = Gtk.ListBox()
+        self.listbox.set_selection_mode(Gtk.SelectionMode.NONE)
+
+    def submit(self, job):
+        self._add_row(job)
+        self.pending.append(job)
+        self._start_next()
+        return job
+
+    def cancel(self, job):
+        if job.status == "queued":
+            self.pending.remove(job)
+            job.status = "cancelled"
+            self._update_row(job)
+        elif job.status == "running":
+            job.status = "cancelled"
+            if job.process:
+                job.process.force_exit()
+            else:
+                if job.child:
+                    job.child.kill()
+                # A daemon request cannot be interrupted; its result is dropped
+                self._finish(job)
+
+    def _add_row(self, job):
+        row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        name_label = Gtk.Label(label=f"#{job.id} {job.name}")
+        name_label.set_xalign(0)
+        row.pack_start(name_label, True, True, 0)
+        job.status_label = Gtk.Label()
+        row.pack_start(job.status_label, False, False, 0)
+        job.time_label = Gtk.Label()
+        row.pack_start(job.time_label, False, False, 0)
+        job.cancel_btn = Gtk.Button(label="Cancel")
+        job.cancel_btn.connect("clicked", lambda b: self.cancel(job))
+        row.pack_start(job.cancel_btn, False, False, 0)
+        self.listbox.prepend(row)
+        row.show_all()
+        self._update_row(job)
+
+    def _update_row(self, job):
+        text = job.status if not job.error else f"{job.status}: {job.error}"
+        job.status_label.set_text(text)
+        job.time_label.set_text(f"{job.elapsed():.1f} s")
+        job.cancel_btn.set_sensitive(job.status in ("queued", "running"))
+
+    def _start_next(self):
+        while self.pending and len(self.running) < self.max_running:
+            self._start(self.pending.pop(0))
+
+    def _start(self, job):
+        job.status = "running"
+        job.started = time.monotonic()
+        job.span = tracing.start_span("job", parent=job.trace_parent, name=job.name, job_id=job.id)
+        self.running.append(job)
+        self._update_row(job)
+        if job.argv:
+            print("Running job:", " ".join(job.argv))
+            launcher = Gio.SubprocessLauncher.new(Gio.SubprocessFlags.NONE)
+            for name, value in tracing.child_env(job.span).items():
+                launcher.setenv(name, value, True)
+            try:
+                job.process = launcher.spawnv(job.argv)
+            except GLib.Error as e:
+                job.status = "failed"
+                job.error = e.message
+                self._finish(job)
+                return
+            job.process.wait_async(None, self._on_process_exit, job)
+        else:
+            future = self.pool.submit(self._run_function, job)
+            future.add_done_callback(lambda f: GLib.idle_add(self._on_function_done, job, f))
+        if self.timer is None:
+            self.timer = GLib.timeout_add(250, self._tick)
+
+    # Run `argv` for `job` from its worker thread and wait for it; raises when
+    # it fails, so the job does too.  `env` adds variables to the child's
+    def run_child(self, job, argv, env=None):
+        print("Running job:", " ".join(argv))
+        env = dict(os.environ, **tracing.child_env(job.span), **(env or {}))
+        job.child = subprocess.Popen(argv, env=env)
+        returncode = job.child.wait()
+        if returncode != 0:
+            raise RuntimeError(f"'{os.path.basename(argv[1])}' exited with status {returncode}")
+        return returncode
+
+    def _run_function(self, job):
+        with tracing.attach(tracing.context(job.span)):
+            return job.function()
+
+    def _on_process_exit(self, process, result, job):
+        try:
+            process.wait_finish(result)
+        except GLib.Error as e:
+            job.error = e.message
+        if job.status == "running":
+            if process.get_if_exited() and process.get_exit_status() == 0:
+                job.status = "done"
+            else:
+                job.status = "failed"
+        self._finish(job)
+
+    def _on_function_done(self, job, future):
+        if job.status == "running":
+            try:
+                job.result = future.result()
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            self._finish(job)
+        return False
+
+    def _finish(self, job):
+        job.finished = time.monotonic()
+        job.span.set(status=job.status)
+        job.span.end()
+        if job in self.running:
+            self.running.remove(job)
+        self._update_row(job)
+        print(f"Job #{job.id} {job.name} {job.status} after {job.elapsed():.2f} s.")
+        if job.status == "done" and job.on_done:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                print(f"Error handling result of job #{job.id}:", e)
+        self._start_next()
+
+    def _tick(self):
+        for job in self.running:
+            self._update_row(job)
+        if not self.running:
+            self.timer = None
+            return False
+        return True
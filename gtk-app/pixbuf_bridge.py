@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# Move pixels between GdkPixbuf and NumPy without going through PNG files.
+#
+# Arrays keep the pixbuf's channel order (RGB or RGBA).  Gaussian blur does
+# not care about channel order, so the in-app blur runs on these arrays as-is;
+# use to_bgr() only when handing pixels to code that expects OpenCV's order.
+import gi
+gi.require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf, GLib
+import numpy as np
+from common import shm_image
+
+# The pixbuf's pixels as an (height, width, channels) uint8 array.
+# PyGObject hands the pixel bytes over as a copy (get_data() returns bytes),
+# so this is one copy of the pixbuf; the array is a read-only strided view of
+# that copy and honours rowstride without repacking rows.  Pass writable=True
+# for an array that can be blurred in place (a second, compact copy).
+def pixbuf_to_array(pixbuf, writable=False):
+    if pixbuf.get_bits_per_sample() != 8 or pixbuf.get_colorspace() != GdkPixbuf.Colorspace.RGB:
+        raise ValueError("Only 8-bit RGB(A) pixbufs are supported")
+    width = pixbuf.get_width()
+    height = pixbuf.get_height()
+    channels = pixbuf.get_n_channels()
+    rowstride = pixbuf.get_rowstride()
+    flat = np.frombuffer(pixbuf.read_pixel_bytes().get_data(), dtype=np.uint8)
+    # The last row is not padded out to rowstride, so build the view by hand
+    view = np.lib.stride_tricks.as_strided(
+        flat, shape=(height, width, channels), strides=(rowstride, channels, 1), writeable=False)
+    if writable:
+        return view.copy()
+    return view
+
+# Wrap an (height, width, 3|4) uint8 RGB(A) array in a new pixbuf
+def array_to_pixbuf(array):
+    if array.dtype != np.uint8 or array.ndim != 3 or array.shape[2] not in (3, 4):
+        raise ValueError(f"Expected an (h, w, 3|4) uint8 array, got {array.shape} {array.dtype}")
+    height, width, channels = array.shape
+    # tobytes() packs any strided array into rows of width * channels
+    data = GLib.Bytes.new(array.tobytes())
+    return GdkPixbuf.Pixbuf.new_from_bytes(
+        data, GdkPixbuf.Colorspace.RGB, channels == 4, 8, width, height, width * channels)
+
+# Contiguous copy with the colour channels reversed (RGB <-> BGR, alpha stays last)
+def to_bgr(array):
+    if array.shape[2] == 4:
+        return np.ascontiguousarray(array[..., [2, 1, 0, 3]])
+    return np.ascontiguousarray(array[..., ::-1])
+
+to_rgb = to_bgr
+
+# Contiguous 3-channel BGR frame from RGB(A) pixels, alpha dropped
+def to_bgr_frame(array):
+    return np.ascontiguousarray(array[..., 2::-1])
+
+# Hand a pixbuf to a script through a shared-memory buffer (see
+# common/shm_image.py); rows are copied as-is, rowstride padding included
+def pixbuf_to_buffer(pixbuf, path):
+    if pixbuf.get_bits_per_sample() != 8 or pixbuf.get_colorspace() != GdkPixbuf.Colorspace.RGB:
+        raise ValueError("Only 8-bit RGB(A) pixbufs are supported")
+    shm_image.write_buffer(path, pixbuf.read_pixel_bytes().get_data(), pixbuf.get_width(),
+                           pixbuf.get_height(), pixbuf.get_n_channels(),
+                           stride=pixbuf.get_rowstride(), order=shm_image.RGB)
+
+# Load a script's output buffer as a pixbuf
+def buffer_to_pixbuf(path):
+    view, order = shm_image.map_buffer(path)
+    if order == shm_image.BGR:
+        return array_to_pixbuf(to_rgb(view))
+    return array_to_pixbuf(view)
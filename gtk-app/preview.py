@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Preview scaling for the Scripts tab.
+#
+# A BILINEAR preview is returned straight away and the HYPER version is
+# rendered on a worker thread and handed back through the main loop.  Results
+# are cached per image revision (the capture history's Revision objects, held
+# weakly), so undo and redo show a cached preview.  When a new revision only
+# differs from the previous one inside a few rectangles (a keyword blur), the
+# previous high-quality preview is copied and just those rectangles are
+# re-scaled.
+import math
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import gi
+gi.require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf, GLib
+
+FILTER_MARGIN = 2
+
+class PreviewScaler:
+    def __init__(self, max_cached=4):
+        self.max_cached = max_cached
+        self.cache = OrderedDict()
+        self.current = None
+        self.pool = ThreadPoolExecutor(max_workers=1)
+
+    # id() alone could be reused by a later revision; the weakref tells them apart
+    def _key(self, revision, width, height):
+        return (id(revision), width, height)
+
+    def _get(self, revision, width, height):
+        cached = self.cache.get(self._key(revision, width, height))
+        if cached is None or cached[0]() is not revision:
+            return None
+        return cached[1:]
+
+    def _store(self, revision, width, height, pixbuf, quality):
+        key = self._key(revision, width, height)
+        self.cache[key] = (weakref.ref(revision), pixbuf, quality)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_cached:
+            self.cache.popitem(last=False)
+
+    def _patch(self, source, base, width, height, dirty):
+        patched = base.copy()
+        scale_x = width / float(source.get_width())
+        scale_y = height / float(source.get_height())
+        for x, y, w, h in dirty:
+            dx0 = max(0, int(math.floor(x * scale_x)) - FILTER_MARGIN)
+            dy0 = max(0, int(math.floor(y * scale_y)) - FILTER_MARGIN)
+            dx1 = min(width, int(math.ceil((x + w) * scale_x)) + FILTER_MARGIN)
+            dy1 = min(height, int(math.ceil((y + h) * scale_y)) + FILTER_MARGIN)
+            if dx1 > dx0 and dy1 > dy0:
+                source.scale(patched, dx0, dy0, dx1 - dx0, dy1 - dy0, 0, 0,
+                             scale_x, scale_y, GdkPixbuf.InterpType.HYPER)
+        return patched
+
+    # Preview of `pixbuf`, the pixels of `revision`, to show now.  `on_ready`
+    # gets the high-quality version later unless it is returned right away.
+    # `dirty` lists the (x, y, w, h) rects that changed since `base_revision`.
+    def scale(self, pixbuf, width, height, on_ready, revision, dirty=None, base_revision=None):
+        self.current = revision
+        cached = self._get(revision, width, height)
+        if cached and cached[1] == "high":
+            return cached[0]
+        base = self._get(base_revision, width, height) if dirty is not None and base_revision is not None else None
+        if base and base[1] == "high":
+            patched = self._patch(pixbuf, base[0], width, height, dirty)
+            self._store(revision, width, height, patched, "high")
+            return patched
+        fast = pixbuf.scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
+        self._store(revision, width, height, fast, "fast")
+
+        ref = weakref.ref(revision)
+        def finished(future):
+            GLib.idle_add(self._on_high_quality, ref, width, height, future.result(), on_ready)
+        self.pool.submit(pixbuf.scale_simple, width, height, GdkPixbuf.InterpType.HYPER).add_done_callback(finished)
+        return fast
+
+    def _on_high_quality(self, ref, width, height, scaled, on_ready):
+        revision = ref()
+        if scaled is not None and revision is not None and self._get(revision, width, height):
+            self._store(revision, width, height, scaled, "high")
+            if revision is self.current:
+                on_ready(scaled)
+        return False
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# Rubber-band selection of part of a capture, and the regions remembered per window.
+#
+# RegionSelector shows a captured pixbuf (scaled down to fit the screen, or
+# full screen for the desktop) and lets the user drag a rectangle over it.
+# Enter or a double click takes the remembered region again, Escape cancels.
+# The rectangle is handed back in the pixbuf's pixels.
+#
+# RegionStore keeps one region per window in a JSON file, keyed by the
+# window's application class so it survives the window being reopened.
+# Regions are stored in window coordinates (logical pixels), which is what
+# Gdk.pixbuf_get_from_window takes; HiDPI captures have more pixels than that.
+import json
+import os
+
+import cairo
+import gi
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gdk, GdkPixbuf, Gtk
+
+MIN_SIZE = 8
+SCREEN_FRACTION = 0.9
+
+class RegionSelector(Gtk.Window):
+    # `on_done(rect)` gets (x, y, w, h) in pixbuf pixels, or None when cancelled
+    def __init__(self, pixbuf, on_done, initial=None, title="Select Region", fullscreen=False):
+        super().__init__(title=title)
+        self.pixbuf = pixbuf
+        self.on_done = on_done
+        self.initial = initial
+        self.start = None
+        self.rect = initial
+        self.finished = False
+        width, height = pixbuf.get_width(), pixbuf.get_height()
+        geometry = Gdk.Display.get_default().get_primary_monitor().get_geometry()
+        if fullscreen:
+            self.scale = min(1.0, geometry.width / width, geometry.height / height)
+            self.fullscreen()
+        else:
+            self.scale = min(1.0, SCREEN_FRACTION * geometry.width / width, SCREEN_FRACTION * geometry.height / height)
+        self.shown = pixbuf
+        if self.scale < 1.0:
+            self.shown = pixbuf.scale_simple(max(1, int(width * self.scale)), max(1, int(height * self.scale)),
+                                             GdkPixbuf.InterpType.BILINEAR)
+
+        self.area = Gtk.DrawingArea()
+        self.area.set_size_request(self.shown.get_width(), self.shown.get_height())
+        self.area.add_events(Gdk.EventMask.BUTTON_PRESS_MASK | Gdk.EventMask.BUTTON_RELEASE_MASK
+                             | Gdk.EventMask.POINTER_MOTION_MASK)
+        self.area.connect("draw", self.on_draw)
+        self.area.connect("button-press-event", self.on_press)
+        self.area.connect("motion-notify-event", self.on_motion)
+        self.area.connect("button-release-event", self.on_release)
+        self.connect("key-press-event", self.on_key)
+        self.connect("delete-event", lambda *args: self.finish(None) or False)
+        self.add(self.area)
+        self.show_all()
+        self.get_window().set_cursor(Gdk.Cursor.new_from_name(self.get_display(), "crosshair"))
+
+    # Widget position -> pixbuf pixel, clamped to the image
+    def to_image(self, x, y):
+        return (min(max(0, int(x / self.scale)), self.pixbuf.get_width()),
+                min(max(0, int(y / self.scale)), self.pixbuf.get_height()))
+
+    def on_draw(self, widget, cr):
+        Gdk.cairo_set_source_pixbuf(cr, self.shown, 0, 0)
+        cr.paint()
+        # Dim everything outside the selection
+        cr.set_source_rgba(0, 0, 0, 0.45)
+        cr.rectangle(0, 0, self.shown.get_width(), self.shown.get_height())
+        if self.rect:
+            x, y, w, h = (v * self.scale for v in self.rect)
+            cr.rectangle(x, y, w, h)
+            cr.set_fill_rule(cairo.FILL_RULE_EVEN_ODD)
+            cr.fill()
+            cr.set_source_rgb(0.2, 0.6, 1.0)
+            cr.set_line_width(2)
+            cr.rectangle(x, y, w, h)
+            cr.stroke()
+        else:
+            cr.fill()
+        return False
+
+    def on_press(self, widget, event):
+        if event.type == Gdk.EventType._2BUTTON_PRESS and self.initial:
+            self.finish(self.initial)
+            return True
+        self.start = self.to_image(event.x, event.y)
+        self.rect = None
+        return True
+
+    def on_motion(self, widget, event):
+        if self.start is None:
+            return False
+        x, y = self.to_image(event.x, event.y)
+        x0, y0 = self.start
+        self.rect = (min(x0, x), min(y0, y), abs(x - x0), abs(y - y0))
+        self.area.queue_draw()
+        return True
+
+    def on_release(self, widget, event):
+        if self.start is None:
+            return False
+        self.on_motion(widget, event)
+        self.start = None
+        if self.rect and self.rect[2] >= MIN_SIZE and self.rect[3] >= MIN_SIZE:
+            self.finish(self.rect)
+        return True
+
+    def on_key(self, widget, event):
+        if event.keyval == Gdk.KEY_Escape:
+            self.finish(None)
+        elif event.keyval in (Gdk.KEY_Return, Gdk.KEY_KP_Enter) and self.rect:
+            self.finish(self.rect)
+        return True
+
+    def finish(self, rect):
+        if self.finished:
+            return
+        self.finished = True
+        self.destroy()
+        self.on_done(rect)
+
+class RegionStore:
+    def __init__(self, path):
+        self.path = path
+        self.regions = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.regions = {key: tuple(rect) for key, rect in json.load(f).items()}
+            except (OSError, ValueError) as e:
+                print(f"Could not read the saved regions in '{path}':", e)
+
+    def get(self, key):
+        return self.regions.get(key)
+
+    def set(self, key, rect):
+        if rect is None:
+            self.regions.pop(key, None)
+        else:
+            self.regions[key] = tuple(int(v) for v in rect)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.regions, f, indent=4)
+
+# The part of `rect` (window coordinates) inside a window of this size; None if empty
+def clip_region(rect, width, height):
+    x, y, w, h = rect
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(width, x + w), min(height, y + h)
+    if x1 - x0 < MIN_SIZE or y1 - y0 < MIN_SIZE:
+        return None
+    return (x0, y0, x1 - x0, y1 - y0)
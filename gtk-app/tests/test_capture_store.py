@@ -0,0 +1,63 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from capture_store import CaptureStore
+
+# Arrays stand in for pixbufs, so the store runs without GTK
+@pytest.fixture(autouse=True)
+def array_pixbufs(monkeypatch):
+    bridge = types.ModuleType("pixbuf_bridge")
+    bridge.pixbuf_to_array = lambda pixbuf, writable=False: pixbuf.copy() if writable else pixbuf
+    bridge.array_to_pixbuf = lambda array: array.copy()
+    monkeypatch.setitem(sys.modules, "pixbuf_bridge", bridge)
+
+def blurred(image, x, y, w, h, value):
+    image = image.copy()
+    image[y:y + h, x:x + w] = value
+    return image
+
+def test_edit_made_while_a_job_is_in_flight_is_kept(tmp_path):
+    store = CaptureStore(str(tmp_path), tile=64)
+    capture = np.zeros((200, 300, 3), dtype=np.uint8)
+    start = store.add_capture(capture, "capture")
+    # The job starts from `start`; meanwhile the user blurs a keyword
+    keyword = store.add_revision(blurred(capture, 200, 150, 60, 30, 50), "blur", dirty=[(200, 150, 60, 30)])
+    # The job's redaction lands afterwards, and overlaps the keyword's tile
+    result = store.add_revision(blurred(capture, 10, 10, 220, 150, 200), "redaction", parent=start)
+
+    assert store.current is result
+    assert store.current_capture.revisions == [start, keyword, result]
+    image = store.pixbuf(result)
+    assert (image[10:160, 10:200] == 200).all()
+    assert (image[150:180, 200:260] == 50).all()
+    assert (image[160:, :200] == 0).all()
+    # Undo goes back to the keyword blur, not past it
+    assert store.undo() is keyword
+
+def test_job_result_after_its_start_was_dropped(tmp_path):
+    store = CaptureStore(str(tmp_path), tile=64)
+    capture = np.zeros((128, 128, 3), dtype=np.uint8)
+    first = store.add_capture(capture, "capture")
+    start = store.add_revision(blurred(capture, 0, 0, 10, 10, 9), "edit")
+    store.undo()
+    # A new edit after the undo drops `start` from the history
+    other = store.add_revision(blurred(capture, 100, 100, 10, 10, 7), "other")
+    assert store.current_capture.revisions == [first, other]
+    result = store.add_revision(blurred(capture, 50, 50, 10, 10, 3), "job", parent=start)
+    assert store.current_capture.revisions == [first, other, result]
+    image = store.pixbuf(result)
+    assert (image[50:60, 50:60] == 3).all()
+    assert (image[100:110, 100:110] == 7).all()
+
+def test_job_result_for_an_evicted_capture_does_not_replace_the_current_one(tmp_path):
+    store = CaptureStore(str(tmp_path), max_captures=1, tile=64)
+    old = store.add_capture(np.zeros((64, 64, 3), dtype=np.uint8), "old")
+    current = store.add_capture(np.ones((64, 64, 3), dtype=np.uint8), "new")
+    assert old.capture.id not in store.captures
+    result = store.add_revision(np.full((64, 64, 3), 5, dtype=np.uint8), "job", parent=old)
+    assert store.current is current
+    assert result.capture is not current.capture
+    assert len(store.captures) == 1
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# Benchmark the redaction pipelines on synthetic screenshots.
+#
+#   python3 scripts/benchmarks/run.py --sizes 1080p 4k --repeat 3 --output results.json
+#   python3 scripts/benchmarks/run.py --baseline results.json
+#
+# For every pipeline x layout x size it reports the median latency of each
+# stage, throughput, peak memory, and detection recall/precision against the
+# ground truth the renderer drew.  Results are written as JSON and can be
+# compared with a stored baseline run.
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import cv2
+import pytesseract
+from common import engine, tracing
+from common.token_index import parse_terms
+from benchmarks.synthetic import LAYOUTS, SIZES, render
+
+PIPELINES = ["secrets-handling", "userspecific"]
+# What the userspecific run types at the keyword prompt
+KEYWORDS = "admin, host"
+STAGES = ["decode", "ocr", "detect", "blur", "keyword", "encode"]
+COVERED = 0.5
+
+def _area(box):
+    return max(0, box[2]) * max(0, box[3])
+
+def _overlap(a, b):
+    w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0
+
+# Recall over secret values; precision over detections landing on a label or secret
+def score(boxes, truth):
+    secrets = [box for kind, _text, box in truth if kind == "secret"]
+    sensitive = [box for kind, _text, box in truth if kind in ("secret", "label")]
+    found = sum(1 for s in secrets if sum(_overlap(s, b) for b in boxes) >= COVERED * _area(s))
+    correct = sum(1 for b in boxes if any(_overlap(b, s) >= COVERED * min(_area(b), _area(s)) for s in sensitive))
+    return {
+        "secrets": len(secrets),
+        "detections": len(boxes),
+        "recall": found / len(secrets) if secrets else 1.0,
+        "precision": correct / len(boxes) if boxes else 1.0,
+    }
+
+# The scripts' own pipeline; each stage is timed by the span it already opens
+# (ocr, detect, blur), plus decode, keyword and encode around it
+def run_pipeline(pipeline, png, kernel_size=99, sigma=30):
+    with tracing.collect() as stages:
+        with tracing.span("decode"):
+            image = cv2.imdecode(png, cv2.IMREAD_COLOR)
+        boxes = engine.redact(image, kernel_size, sigma, verbose=False)
+        if pipeline == "userspecific":
+            with tracing.span("keyword"):
+                engine.blur_keywords(image, parse_terms(KEYWORDS), kernel_size, sigma)
+        with tracing.span("encode"):
+            cv2.imencode(".png", image)
+    # No boxes means no blur span
+    return {stage: stages.get(stage, 0.0) for stage in STAGES if stage in stages or stage != "keyword"}, boxes
+
+def run_scenario(pipeline, layout, size, repeat, seed, warm_cache):
+    image, truth = render(layout, size, seed)
+    png = cv2.imencode(".png", image)[1]
+    megapixels = image.shape[0] * image.shape[1] / 1e6
+    runs = []
+    tracemalloc.start()
+    for _ in range(repeat):
+        if not warm_cache:
+            engine.ocr_cache.clear()
+        stages, boxes = run_pipeline(pipeline, png)
+        runs.append(stages)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stages = {stage: statistics.median(run[stage] for run in runs) for stage in runs[0]}
+    total = sum(stages.values())
+    result = {
+        "megapixels": round(megapixels, 2),
+        "stages_ms": {stage: round(ms, 2) for stage, ms in stages.items()},
+        "total_ms": round(total, 2),
+        "throughput_mp_s": round(megapixels / (total / 1000), 2) if total else 0.0,
+        "peak_python_mb": round(peak / 1e6, 1),
+    }
+    result.update(score(boxes, truth))
+    return result
+
+def environment():
+    try:
+        tesseract = str(pytesseract.get_tesseract_version())
+    except Exception:
+        tesseract = "unknown"
+    return {
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "tesseract": tesseract,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "ocr_settings": {key: value for key, value in engine.ocr_settings.items() if key != "prefilter"},
+        "redaction_mode": engine.redaction_mode,
+    }
+
+def print_results(results):
+    print(f"{'scenario':<34} {'total ms':>10} {'MP/s':>7} {'recall':>7} {'prec':>7} {'peak MB':>8}  stages (ms)")
+    for name, r in results.items():
+        stages = " ".join(f"{stage}={ms:.0f}" for stage, ms in r["stages_ms"].items())
+        print(f"{name:<34} {r['total_ms']:>10.1f} {r['throughput_mp_s']:>7.2f} {r['recall']:>7.3f} "
+              f"{r['precision']:>7.3f} {r['peak_python_mb']:>8.1f}  {stages}")
+
+# OCR time saved and recall lost by the text-region prefilter, per scenario
+def compare_prefilter(results):
+    print("\nText-region prefilter (on vs off):")
+    print(f"{'scenario':<34} {'ocr ms off':>10} {'ocr ms on':>10} {'saved':>7} {'recall':>9}")
+    for name, r in results.items():
+        if not name.endswith("+prefilter"):
+            continue
+        base = results[name[:-len("+prefilter")]]
+        off, on = base["stages_ms"]["ocr"], r["stages_ms"]["ocr"]
+        saved = (off - on) / off * 100 if off else 0.0
+        print(f"{name[:-len('+prefilter')]:<34} {off:>10.1f} {on:>10.1f} {saved:>6.0f}% {r['recall'] - base['recall']:>+9.3f}")
+
+# Print differences against a baseline; returns the number of regressions
+def compare(results, baseline, threshold):
+    regressions = 0
+    print(f"\nCompared with baseline (regression: latency +{threshold:.0f}% or recall/precision -0.01):")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<34} no baseline")
+            continue
+        notes = []
+        for stage, ms in r["stages_ms"].items():
+            old = base["stages_ms"].get(stage)
+            if old:
+                change = (ms - old) / old * 100
+                if abs(change) >= threshold:
+                    notes.append(f"{stage} {change:+.0f}%")
+                    regressions += change > 0
+        for metric in ("recall", "precision"):
+            change = r[metric] - base[metric]
+            if abs(change) >= 0.01:
+                notes.append(f"{metric} {change:+.3f}")
+                regressions += change < 0
+        total_change = (r["total_ms"] - base["total_ms"]) / base["total_ms"] * 100 if base["total_ms"] else 0.0
+        print(f"{name:<34} total {total_change:+6.1f}%  {', '.join(notes) or 'no significant change'}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the redaction pipelines on synthetic screenshots.")
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=PIPELINES)
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=LAYOUTS)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warm-cache", action="store_true", help="keep OCR results cached between repeats")
+    parser.add_argument("--prefilter", choices=["off", "on", "compare"], default="off",
+                        help="OCR only text regions; 'compare' runs every scenario both ways")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare with a JSON file written by --output")
+    parser.add_argument("--threshold", type=float, default=10.0, help="latency change (%%) reported as significant")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    modes = {"off": [0], "on": [1], "compare": [0, 1]}[args.prefilter]
+    results = {}
+    for pipeline in args.pipelines:
+        for layout in args.layouts:
+            for size in args.sizes:
+                for prefilter in modes:
+                    engine.ocr_settings["prefilter"] = prefilter
+                    name = f"{pipeline}/{layout}/{size}" + ("+prefilter" if prefilter else "")
+                    print(f"Running {name} ...", flush=True)
+                    results[name] = run_scenario(pipeline, layout, size, args.repeat, args.seed, args.warm_cache)
+    print()
+    print_results(results)
+    if args.prefilter == "compare":
+        compare_prefilter(results)
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(f"\nPeak RSS: {usage:.0f} MB (largest tesseract process {children:.0f} MB)")
+
+    report = {"environment": environment(), "seed": args.seed, "repeat": args.repeat, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# Synthetic screenshots with secrets at known coordinates.
+#
+# A screen is tiled with "windows" of one layout (terminal, form or config
+# file) and every word is drawn separately, so its box is known exactly.  Each
+# ground-truth entry is (kind, text, (x, y, w, h)) where kind is "secret" for
+# values that must be redacted, "label" for the labels next to them (which the
+# pipeline blurs too) and "text" for everything else.  The same seed always
+# renders the same image.
+import random
+import string
+
+import cv2
+import numpy as np
+
+SIZES = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+    "dual-1080p": (3840, 1080),
+    "dual-4k": (7680, 2160),
+}
+LAYOUTS = ["terminal", "form", "config"]
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.7
+THICKNESS = 1
+LINE_HEIGHT = 34
+PANE_SIZE = (960, 540)
+
+WORDS = ["build", "deploy", "server", "status", "running", "user", "admin", "host", "port",
+         "region", "cluster", "version", "release", "update", "service", "database", "cache",
+         "timeout", "enabled", "logging", "debug", "listen", "config", "output", "project"]
+LABELS = ["password:", "api_key:", "token:", "secret:", "pwd:", "credential:"]
+
+def random_secret(rng):
+    kind = rng.choice(["hex", "jwt", "base64", "token", "aws"])
+    if kind == "hex":
+        return "".join(rng.choice("0123456789abcdef") for _ in range(rng.randint(32, 40)))
+    if kind == "jwt":
+        part = lambda n: "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(n))
+        return f"eyJ{part(18)}.eyJ{part(24)}.{part(20)}"
+    if kind == "base64":
+        return "".join(rng.choice(string.ascii_letters + string.digits + "+/") for _ in range(40)) + "=="
+    if kind == "aws":
+        return "AKIA" + "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(16))
+    return "ghp_" + "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(36))
+
+class Canvas:
+    def __init__(self, width, height, background):
+        self.image = np.full((height, width, 3), background, dtype=np.uint8)
+        self.truth = []
+
+    # Draw words left to right from (x, baseline y); returns the x after the last word
+    def words(self, x, y, words, color, x_limit):
+        for kind, text in words:
+            (w, h), baseline = cv2.getTextSize(text, FONT, FONT_SCALE, THICKNESS)
+            if x + w > x_limit:
+                break
+            cv2.putText(self.image, text, (x, y), FONT, FONT_SCALE, color, THICKNESS, cv2.LINE_AA)
+            self.truth.append((kind, text, (x, y - h, w, h + baseline)))
+            x += w + 14
+        return x
+
+def _filler(rng, count):
+    return [("text", rng.choice(WORDS)) for _ in range(count)]
+
+def _terminal_pane(canvas, rng, x0, y0, x1, y1):
+    canvas.image[y0:y1, x0:x1] = (30, 30, 30)
+    for y in range(y0 + LINE_HEIGHT, y1 - 8, LINE_HEIGHT):
+        line = [("text", "$")] + _filler(rng, rng.randint(2, 6))
+        if rng.random() < 0.25:
+            line = [("text", "$"), ("text", "export"), ("label", rng.choice(LABELS)), ("secret", random_secret(rng))]
+        elif rng.random() < 0.1:
+            line = [("secret", random_secret(rng))]
+        canvas.words(x0 + 12, y, line, (220, 220, 220), x1 - 8)
+
+def _form_pane(canvas, rng, x0, y0, x1, y1):
+    canvas.image[y0:y1, x0:x1] = (245, 245, 245)
+    for y in range(y0 + LINE_HEIGHT + 10, y1 - 16, LINE_HEIGHT + 16):
+        if rng.random() < 0.35:
+            label = ("label", rng.choice(LABELS))
+            value = ("secret", random_secret(rng) if rng.random() < 0.5 else "".join(rng.choice(string.ascii_lowercase) for _ in range(10)))
+        else:
+            label = ("text", rng.choice(WORDS) + ":")
+            value = ("text", rng.choice(WORDS))
+        cv2.rectangle(canvas.image, (x0 + 220, y - LINE_HEIGHT + 6), (x1 - 20, y + 10), (200, 200, 200), 1)
+        canvas.words(x0 + 20, y, [label], (40, 40, 40), x0 + 215)
+        canvas.words(x0 + 230, y, [value], (20, 20, 20), x1 - 24)
+
+def _config_pane(canvas, rng, x0, y0, x1, y1):
+    canvas.image[y0:y1, x0:x1] = (255, 255, 250)
+    for y in range(y0 + LINE_HEIGHT, y1 - 8, LINE_HEIGHT):
+        if rng.random() < 0.3:
+            line = [("label", rng.choice(LABELS)), ("secret", random_secret(rng))]
+        else:
+            line = [("text", rng.choice(WORDS) + ":")] + _filler(rng, rng.randint(1, 3))
+        canvas.words(x0 + 16, y, line, (60, 40, 20), x1 - 8)
+
+PANES = {"terminal": _terminal_pane, "form": _form_pane, "config": _config_pane}
+
+# Returns (BGR image, ground truth list) for one layout at one size
+def render(layout, size, seed=0):
+    width, height = SIZES[size] if isinstance(size, str) else size
+    rng = random.Random(f"{layout}|{width}x{height}|{seed}")
+    canvas = Canvas(width, height, (90, 90, 90))
+    pane_w, pane_h = PANE_SIZE
+    for y0 in range(0, height - pane_h // 2, pane_h):
+        for x0 in range(0, width - pane_w // 2, pane_w):
+            x1, y1 = min(width, x0 + pane_w) - 6, min(height, y0 + pane_h) - 6
+            PANES[layout](canvas, rng, x0 + 6, y0 + 6, x1, y1)
+    return canvas.image, canvas.truth
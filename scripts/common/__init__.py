@@ -0,0 +1,2 @@
+# Shared redaction code used by the scripts in this folder and the GTK app.
+# This folder has no main.py, so it never shows up in the script selector.
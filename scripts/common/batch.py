@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# Batch redaction of many images with a pipelined pool of processes.
+#
+# Decode, OCR, detection, blur and encode each run in their own worker
+# processes connected by bounded queues, so slow OCR on one file overlaps
+# with decoding the next and encoding the previous one, and memory stays
+# bounded however many files are queued.  Outputs are identical to the
+# single-file path of secrets-handling/main.py.
+import glob
+import multiprocessing as mp
+import os
+import threading
+import time
+
+from common import tracing
+
+STAGES = ["decode", "ocr", "detect", "blur", "encode"]
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+# Expand a directory, a glob pattern or an @file list into (input, output)
+# pairs.  Outputs keep each input's path below the inputs' deepest common
+# directory, so files of the same name in different directories do not
+# overwrite each other.
+def collect_jobs(spec, output_dir):
+    if spec.startswith("@"):
+        with open(spec[1:], "r") as f:
+            inputs = [line.strip() for line in f if line.strip()]
+    elif os.path.isdir(spec):
+        inputs = []
+        for root, _dirs, files in os.walk(spec):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    inputs.append(os.path.join(root, name))
+    else:
+        inputs = sorted(glob.glob(spec, recursive=True))
+    inputs = list(dict.fromkeys(os.path.abspath(path) for path in inputs))
+    if not inputs:
+        return []
+    root = spec if os.path.isdir(spec) else os.path.commonpath([os.path.dirname(path) for path in inputs])
+    return [(path, os.path.join(output_dir, os.path.relpath(path, os.path.abspath(root)))) for path in inputs]
+
+def is_up_to_date(input_path, output_path):
+    try:
+        return os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+    except OSError:
+        return False
+
+def _decode(item, params):
+    import cv2
+    image = cv2.imread(item["input"])
+    if image is None:
+        raise ValueError(f"Could not read the image file '{item['input']}'")
+    item["image"] = image
+    item["pixels"] = image.shape[0] * image.shape[1]
+
+def _ocr(item, params):
+    from common import engine
+    # The OCR stage already runs one process per worker, and its processes
+    # are daemonic, so they cannot start a tile pool: OCR tiles in turn
+    engine.ocr_settings["workers"] = 1
+    item["data"] = engine.run_ocr(item["image"])
+
+def _detect(item, params):
+    from common import engine, manifest
+    if params["manifest"]:
+        # Built before the blur stage, from the source pixels
+        item["manifest"] = manifest.build(item["image"], item.pop("data"), verbose=False)
+        item["boxes"] = [tuple(redaction["box"]) for redaction in item["manifest"]["redactions"]]
+    else:
+        item["boxes"] = engine.find_sensitive_boxes(item.pop("data"), verbose=False)
+
+def _blur(item, params):
+    from common import engine
+    engine.blur_boxes(item["image"], item["boxes"], params["kernel_size"], params["sigma"])
+
+def _encode(item, params):
+    import cv2
+    os.makedirs(os.path.dirname(os.path.abspath(item["output"])), exist_ok=True)
+    if not cv2.imwrite(item["output"], item.pop("image")):
+        raise ValueError(f"Could not write '{item['output']}'")
+    if "manifest" in item:
+        from common import manifest
+        manifest.save(manifest.manifest_path(item["output"]), item.pop("manifest"))
+
+STAGE_FUNCTIONS = {"decode": _decode, "ocr": _ocr, "detect": _detect, "blur": _blur, "encode": _encode}
+
+def _stage_worker(stage, in_queue, out_queue, params):
+    function = STAGE_FUNCTIONS[stage]
+    while True:
+        item = in_queue.get()
+        if item is None:
+            break
+        if "error" not in item:
+            start = time.perf_counter()
+            try:
+                with tracing.span(stage, path=item["input"]):
+                    function(item, params)
+            except Exception as e:
+                item["error"] = f"{stage}: {e}"
+                item.pop("image", None)
+            item["timings"][stage] = time.perf_counter() - start
+        out_queue.put(item)
+
+def _stage_sizes(workers):
+    side = max(1, workers // 4)
+    return {"decode": side, "ocr": workers, "detect": 1, "blur": 1, "encode": side}
+
+# `write_manifest` saves <output>.redactions.json next to every output
+def run_batch(spec, output_dir, kernel_size, sigma, workers=None, queue_size=4, force=False, write_manifest=False):
+    from common.manifest import manifest_path
+    workers = workers or os.cpu_count() or 1
+    params = {"kernel_size": kernel_size, "sigma": sigma, "manifest": write_manifest}
+    jobs = collect_jobs(spec, output_dir)
+    pending = [(i, o) for i, o in jobs
+               if force or not is_up_to_date(i, o) or (write_manifest and not is_up_to_date(i, manifest_path(o)))]
+    skipped = len(jobs) - len(pending)
+    print(f"Batch: {len(jobs)} files, {skipped} already up to date, {len(pending)} to redact with {workers} OCR workers.")
+
+    sizes = _stage_sizes(workers)
+    queues = [mp.Queue(maxsize=queue_size * sizes[stage]) for stage in STAGES]
+    results = mp.Queue()
+    outputs = queues[1:] + [results]
+    processes = {}
+    for stage, in_queue, out_queue in zip(STAGES, queues, outputs):
+        processes[stage] = [mp.Process(target=_stage_worker, args=(stage, in_queue, out_queue, params), daemon=True)
+                            for _ in range(sizes[stage])]
+        for process in processes[stage]:
+            process.start()
+
+    # Feed inputs, then shut the stages down in order as each one drains
+    def feed():
+        for input_path, output_path in pending:
+            queues[0].put({"input": input_path, "output": output_path, "timings": {}})
+        for stage, in_queue in zip(STAGES, queues):
+            for _ in processes[stage]:
+                in_queue.put(None)
+            for process in processes[stage]:
+                process.join()
+        results.put(None)
+
+    start = time.perf_counter()
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    finished = []
+    while True:
+        item = results.get()
+        if item is None:
+            break
+        finished.append(item)
+        status = item.get("error") or f"{len(item.get('boxes', []))} boxes"
+        print(f"[{len(finished)}/{len(pending)}] {item['input']} -> {item['output']}: {status} "
+              f"({sum(item['timings'].values()) * 1000:.0f} ms)")
+    feeder.join()
+    elapsed = time.perf_counter() - start
+    print_summary(finished, skipped, elapsed)
+    return finished
+
+def print_summary(finished, skipped, elapsed):
+    failed = [item for item in finished if "error" in item]
+    done = len(finished) - len(failed)
+    megapixels = sum(item.get("pixels", 0) for item in finished if "error" not in item) / 1e6
+    print(f"Redacted {done} files, {len(failed)} failed, {skipped} skipped in {elapsed:.2f} s "
+          f"({done / elapsed if elapsed else 0:.2f} files/s, {megapixels / elapsed if elapsed else 0:.1f} MP/s).")
+    for stage in STAGES:
+        times = [item["timings"][stage] for item in finished if stage in item["timings"]]
+        if times:
+            print(f"  {stage:<7} avg {sum(times) / len(times) * 1000:8.1f} ms  total {sum(times):8.2f} s")
+    for item in failed:
+        print(f"  FAILED {item['input']}: {item['error']}")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# Client side of the redaction daemon (see daemon.py).
+#
+# Every message is a 4 byte big-endian header length, a JSON header and
+# `payload_size` bytes of raw payload (pixels, when an image is sent inline).
+# This module only needs the standard library so the GTK app and the scripts
+# can probe for the daemon without paying for the OpenCV import.
+import json
+import os
+import socket
+import struct
+import tempfile
+
+from common import tracing
+
+# Seconds the daemon may go without answering before the caller runs the
+# pipeline itself; SMARTSCREENSHOT_DAEMON_TIMEOUT overrides it (0: no limit)
+DEFAULT_TIMEOUT = 60.0
+
+def request_timeout():
+    try:
+        timeout = float(os.environ.get("SMARTSCREENSHOT_DAEMON_TIMEOUT") or DEFAULT_TIMEOUT)
+    except ValueError:
+        timeout = DEFAULT_TIMEOUT
+    return timeout if timeout > 0 else None
+
+def default_socket_path():
+    env_path = os.environ.get("SMARTSCREENSHOT_SOCKET")
+    if env_path:
+        return env_path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, "smartscreenshot-redactd.sock")
+
+def send_message(sock, header, payload=b""):
+    header = dict(header, payload_size=len(payload))
+    raw = json.dumps(header).encode("utf-8")
+    sock.sendall(struct.pack("!I", len(raw)) + raw)
+    if payload:
+        sock.sendall(payload)
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        n = sock.recv_into(view[pos:])
+        if n == 0:
+            raise ConnectionError("Connection closed by peer")
+        pos += n
+    return buf
+
+def recv_message(sock):
+    (size,) = struct.unpack("!I", _recv_exact(sock, 4))
+    header = json.loads(bytes(_recv_exact(sock, size)).decode("utf-8"))
+    payload = _recv_exact(sock, header.get("payload_size", 0))
+    return header, payload
+
+# Send one request; returns (header, payload), or None when no daemon is
+# listening or it does not answer within `timeout` (default: request_timeout())
+def request(header, payload=b"", socket_path=None, timeout=None):
+    header = dict(header, trace=tracing.context())
+    path = socket_path or default_socket_path()
+    # SMARTSCREENSHOT_DAEMON=0: a caller already gave up on the daemon
+    if os.environ.get("SMARTSCREENSHOT_DAEMON") == "0" or not os.path.exists(path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout if timeout is not None else request_timeout())
+            sock.connect(path)
+            send_message(sock, header, payload)
+            return recv_message(sock)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return None
+    except (OSError, ValueError) as e:
+        # Hung, wedged or dying daemon: the caller falls back as if none ran
+        print(f"Redaction daemon did not answer ({e or type(e).__name__}); running without it.")
+        return None
+
+def is_running(socket_path=None):
+    reply = request({"op": "ping"}, socket_path=socket_path, timeout=1.0)
+    return reply is not None and reply[0].get("ok", False)
+
+def _check_reply(reply):
+    if reply is None:
+        return None
+    header, payload = reply
+    if not header.get("ok"):
+        print("Redaction daemon error:", header.get("error"))
+        return None
+    return header, payload
+
+# Ask the daemon to redact a file on disk. Returns the list of blurred boxes,
+# or None if the caller should fall back to running the pipeline itself.
+# Captures sent with the same `key` (e.g. a window XID) are OCR'd incrementally
+# by the daemon; the fallback has no earlier capture and OCRs all of it.
+# `profile` names the OCR profile; None uses the daemon's default.  With
+# `manifest_path` the daemon also saves a redaction manifest (manifest.py) there.
+def redact_file(input_path, output_path, kernel_size, sigma, socket_path=None, key=None, profile=None,
+                manifest_path=None):
+    header = {
+        "op": "redact",
+        "input_path": os.path.abspath(input_path),
+        "output_path": os.path.abspath(output_path),
+        "kernel_size": kernel_size,
+        "sigma": sigma,
+        "key": key,
+        "profile": profile,
+        "manifest_path": os.path.abspath(manifest_path) if manifest_path else None,
+    }
+    reply = _check_reply(request(header, socket_path=socket_path))
+    if reply is None:
+        return None
+    return [tuple(box) for box in reply[0]["boxes"]]
+
+# Send a BGR numpy image inline and get (redacted_image, boxes) back, or None
+def redact_array(image, kernel_size, sigma, socket_path=None, key=None, profile=None):
+    import numpy as np
+    header = {
+        "op": "redact",
+        "shape": list(image.shape),
+        "dtype": str(image.dtype),
+        "kernel_size": kernel_size,
+        "sigma": sigma,
+        "return_image": True,
+        "key": key,
+        "profile": profile,
+    }
+    reply = _check_reply(request(header, image.tobytes(), socket_path=socket_path))
+    if reply is None:
+        return None
+    header, payload = reply
+    redacted = np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"])
+    return redacted, [tuple(box) for box in header["boxes"]]
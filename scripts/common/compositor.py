@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Redact many boxes at once.
+#
+# Overlapping or touching boxes (a label and its value) are merged into one
+# region, so every pixel is processed once.  Every region is computed from the
+# original pixels before any of them is written back, each with one copy
+# masked to the union of its boxes.  Modes:
+#   gaussian  Gaussian blur of the region, as blur_region() does (the default)
+#   fast      downsample a region padded for the kernel, so its edges match a
+#             blur of the whole image, blur with a proportionally smaller
+#             kernel, upsample
+#   pixelate  coarse blocks, scaled with kernel_size
+#   fill      solid colour
+import cv2
+import numpy as np
+
+MODES = ["gaussian", "fast", "pixelate", "fill"]
+
+def _clip(box, width, height):
+    x, y, w, h = box
+    x0, y0 = max(0, int(x)), max(0, int(y))
+    x1, y1 = min(width, int(x + w)), min(height, int(y + h))
+    return (x0, y0, x1, y1) if x1 > x0 and y1 > y0 else None
+
+def _touches(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+# Group boxes that overlap or touch; returns [(bounding_rect, member_rects)]
+# with rects as (x0, y0, x1, y1)
+def merge_boxes(boxes, width, height):
+    rects = [r for r in (_clip(box, width, height) for box in boxes) if r]
+    parent = list(range(len(rects)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    order = sorted(range(len(rects)), key=lambda i: rects[i][0])
+    for n, i in enumerate(order):
+        for j in order[n + 1:]:
+            if rects[j][0] > rects[i][2]:
+                break
+            if _touches(rects[i], rects[j]):
+                parent[find(i)] = find(j)
+    groups = {}
+    for i, rect in enumerate(rects):
+        groups.setdefault(find(i), []).append(rect)
+    merged = []
+    for members in groups.values():
+        bounds = (min(r[0] for r in members), min(r[1] for r in members),
+                  max(r[2] for r in members), max(r[3] for r in members))
+        merged.append((bounds, members))
+    return merged
+
+def _gaussian(padded, kernel_size, sigma):
+    return cv2.GaussianBlur(padded, (kernel_size, kernel_size), sigma)
+
+def _fast(padded, kernel_size, sigma):
+    scale = max(1, kernel_size // 16)
+    height, width = padded.shape[:2]
+    if scale == 1 or min(height, width) < 2 * scale:
+        return _gaussian(padded, kernel_size, sigma)
+    small = cv2.resize(padded, (width // scale, height // scale), interpolation=cv2.INTER_AREA)
+    small_kernel = max(3, (kernel_size // scale) | 1)
+    small = cv2.GaussianBlur(small, (small_kernel, small_kernel), sigma / scale)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+def _pixelate(roi, kernel_size):
+    height, width = roi.shape[:2]
+    block = max(2, kernel_size // 4)
+    small = cv2.resize(roi, (max(1, width // block), max(1, height // block)), interpolation=cv2.INTER_AREA)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST)
+
+def composite(image, boxes, kernel_size, sigma, mode="gaussian", fill_color=(0, 0, 0)):
+    if mode not in MODES:
+        raise ValueError(f"Unknown redaction mode '{mode}', expected one of {MODES}")
+    height, width = image.shape[:2]
+    pad = kernel_size // 2 if mode == "fast" else 0
+    channels = image.shape[2] if image.ndim == 3 else 1
+    # Opaque fill; extra channels beyond the colour (alpha) are set to 255
+    fill = (list(fill_color) + [255] * channels)[:channels]
+
+    # Padding can reach into a neighbouring region: read everything first
+    results = []
+    for (x0, y0, x1, y1), members in merge_boxes(boxes, width, height):
+        roi = image[y0:y1, x0:x1]
+        if mode == "fill":
+            result = np.empty_like(roi)
+            result[...] = fill if image.ndim == 3 else fill[0]
+        elif mode == "pixelate":
+            result = _pixelate(roi, kernel_size)
+        elif mode == "gaussian":
+            result = _gaussian(roi, kernel_size, sigma)
+        else:
+            px0, py0 = max(0, x0 - pad), max(0, y0 - pad)
+            px1, py1 = min(width, x1 + pad), min(height, y1 + pad)
+            blurred = _fast(image[py0:py1, px0:px1], kernel_size, sigma)
+            result = blurred[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+        results.append(((x0, y0, x1, y1), members, result))
+
+    for (x0, y0, x1, y1), members, result in results:
+        roi = image[y0:y1, x0:x1]
+        if len(members) == 1:
+            roi[...] = result
+            continue
+        # Only the union of the member boxes, not the whole bounding rect
+        mask = np.zeros(roi.shape[:2], dtype=bool)
+        for mx0, my0, mx1, my1 in members:
+            mask[my0 - y0:my1 - y0, mx0 - x0:mx1 - x0] = True
+        np.copyto(roi, result, where=mask[..., None] if image.ndim == 3 else mask)
+    return image
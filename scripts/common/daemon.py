@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# Long-lived redaction service listening on a Unix socket.
+#
+# Start it once with `python3 scripts/common/daemon.py [socket_path]` and the
+# GTK app and the scripts send their images here instead of spawning a fresh
+# interpreter, importing OpenCV and tesseract for every capture.  Each request
+# runs on a pool of `max_workers` threads as soon as one is free, so requests
+# are OCR'd concurrently (each tesseract call is its own process) and a large
+# capture does not hold up the small ones queued behind it.
+import os
+import signal
+import socketserver
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from common import client, engine, manifest, shm_image, tracing
+from common.incremental import IncrementalOCR
+from common.ml_detector import get_classifier
+
+class RedactionDaemon:
+    def __init__(self, socket_path, max_workers=8):
+        self.socket_path = socket_path
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        # Previous capture and tokens per window, for requests that send a key
+        self.incremental = IncrementalOCR()
+
+    # Called from the connection's thread; returns (reply, reply payload)
+    def submit(self, header, payload):
+        return self.pool.submit(self._process, header, payload).result()
+
+    def _process(self, header, payload):
+        try:
+            with tracing.attach(header.get("trace")), tracing.span("daemon.redact"):
+                return self._redact(header, payload)
+        except Exception as e:
+            return {"ok": False, "error": str(e)}, b""
+
+    def _redact(self, header, payload):
+        with tracing.span("decode"):
+            if header.get("input_path"):
+                image = shm_image.read_image(header["input_path"])
+                if image is None:
+                    return {"ok": False, "error": f"Could not read the image file '{header['input_path']}'"}, b""
+            else:
+                image = np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"])
+        kernel_size = engine.normalize_kernel(int(header.get("kernel_size", 99)))
+        sigma = float(header.get("sigma", 30))
+
+        profile = header.get("profile")
+        data = None
+        if header.get("key"):
+            data = self.incremental.run_ocr(header["key"], image, profile)
+        if header.get("manifest_path"):
+            redactions = manifest.redact(image, kernel_size, sigma, data=data, profile=profile)
+            manifest.save(header["manifest_path"], redactions)
+            boxes = [r["box"] for r in redactions["redactions"]]
+        else:
+            boxes = engine.redact(image, kernel_size, sigma, data=data, profile=profile)
+
+        reply = {"ok": True, "boxes": [[int(v) for v in box] for box in boxes]}
+        reply_payload = b""
+        if header.get("output_path"):
+            with tracing.span("write", path=header["output_path"]):
+                shm_image.write_image(header["output_path"], image)
+            print(f"Processed image saved as '{header['output_path']}'.")
+        if header.get("return_image"):
+            reply.update(shape=list(image.shape), dtype=str(image.dtype))
+            reply_payload = image.tobytes()
+        return reply, reply_payload
+
+class RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            header, payload = client.recv_message(self.request)
+        except (ConnectionError, ValueError) as e:
+            print("Dropping malformed request:", e)
+            return
+        op = header.get("op")
+        if op == "ping":
+            client.send_message(self.request, {"ok": True})
+        elif op == "redact":
+            reply, reply_payload = self.server.daemon.submit(header, payload)
+            client.send_message(self.request, reply, reply_payload)
+        else:
+            client.send_message(self.request, {"ok": False, "error": f"Unknown op '{op}'"})
+
+class RedactionServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, daemon):
+        self.daemon = daemon
+        super().__init__(daemon.socket_path, RequestHandler)
+
+def remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+    if client.is_running(path):
+        print(f"A redaction daemon is already listening on '{path}'.")
+        sys.exit(1)
+    os.unlink(path)
+
+def main():
+    socket_path = sys.argv[1] if len(sys.argv) > 1 else client.default_socket_path()
+    try:
+        max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    except ValueError:
+        max_workers = 8
+    remove_stale_socket(socket_path)
+    os.umask(0o077)
+    server = RedactionServer(RedactionDaemon(socket_path, max_workers=max_workers))
+    # Load the classifier (if one is configured) before the first request
+    get_classifier()
+    signal.signal(signal.SIGTERM, lambda *args: threading.Thread(target=server.shutdown).start())
+    print(f"Redaction daemon listening on '{socket_path}'.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+if __name__ == "__main__":
+    main()
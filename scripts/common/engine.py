@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# OCR, detection and blurring shared by every entry point.
+import os
+import cv2
+import pytesseract
+from common import tracing
+from common.compositor import composite
+from common.line_index import LineIndex
+from common.matcher import Hit, get_matcher
+from common.ml_detector import get_classifier, ml_settings
+from common.ocr_cache import OCRCache
+from common.ocr_profiles import DEFAULT_PROFILE, PROFILES, get_profile, preprocess, resize_factor, scale_boxes
+from common.text_regions import prefiltered_image_to_data
+from common.tiled_ocr import tiled_image_to_data
+from common.token_index import TokenIndex
+
+def normalize_kernel(kernel_size):
+    if kernel_size % 2 == 0:
+        kernel_size += 1
+    return kernel_size
+
+def blur_region(image, x, y, w, h, kernel_size, sigma):
+    roi = image[y:y+h, x:x+w]
+    blurred_roi = cv2.GaussianBlur(roi, (kernel_size, kernel_size), sigma)
+    image[y:y+h, x:x+w] = blurred_roi
+
+# Shared by auto-blur and keyword blur; set SMARTSCREENSHOT_OCR_CACHE to a
+# directory to keep results across runs and processes.
+ocr_cache = OCRCache(disk_dir=os.environ.get("SMARTSCREENSHOT_OCR_CACHE") or None,
+                     phash_threshold=int(os.environ.get("SMARTSCREENSHOT_OCR_PHASH_THRESHOLD") or 0))
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def _env_profile():
+    name = os.environ.get("SMARTSCREENSHOT_OCR_PROFILE") or DEFAULT_PROFILE
+    if name not in PROFILES:
+        print(f"Unknown OCR profile '{name}', using '{DEFAULT_PROFILE}'.")
+        return DEFAULT_PROFILE
+    return name
+
+class OCRTimeout(RuntimeError):
+    pass
+
+# Tiled OCR kicks in for images larger than one tile; tile_size 0 disables it.
+# With prefilter on, only the regions that look like text are OCR'd (instead
+# of tiling).  `profile` names the preprocessing and tesseract options (see
+# ocr_profiles.py), `timeout` bounds each tesseract call in seconds (0: none).
+ocr_settings = {
+    "tile_size": _env_int("SMARTSCREENSHOT_OCR_TILE_SIZE", 0),
+    "tile_overlap": _env_int("SMARTSCREENSHOT_OCR_TILE_OVERLAP", 200),
+    "workers": _env_int("SMARTSCREENSHOT_OCR_WORKERS", 0),
+    "prefilter": _env_int("SMARTSCREENSHOT_OCR_PREFILTER", 0),
+    "profile": _env_profile(),
+    "timeout": _env_float("SMARTSCREENSHOT_OCR_TIMEOUT", 0),
+    "scale_factor": _env_float("SMARTSCREENSHOT_SCALE_FACTOR", 1.0),
+}
+
+def _uses_tiles(image):
+    tile_size = ocr_settings["tile_size"]
+    return tile_size > 0 and max(image.shape[:2]) > tile_size
+
+# Everything that changes the OCR output for a given image, for the cache key
+def _cache_settings(image, config, profile):
+    factor = resize_factor(get_profile(profile), ocr_settings["scale_factor"])
+    settings = f"{config}|profile={profile}@{factor:g}"
+    if ocr_settings["prefilter"]:
+        return f"{settings}|prefilter"
+    if _uses_tiles(image):
+        return f"{settings}|tiles={ocr_settings['tile_size']}/{ocr_settings['tile_overlap']}"
+    return settings
+
+# OCR `image` with the named profile (default: ocr_settings["profile"]);
+# raises OCRTimeout when a tesseract call runs past ocr_settings["timeout"]
+def run_ocr(image, config="", profile=None):
+    profile = profile or ocr_settings["profile"]
+    with tracing.span("ocr", width=image.shape[1], height=image.shape[0], profile=profile) as span:
+        settings = _cache_settings(image, config, profile)
+        key, data = ocr_cache.get(image, settings)
+        span.set(cached=data is not None)
+        if data is not None:
+            return data
+        options = get_profile(profile)
+        factor = resize_factor(options, ocr_settings["scale_factor"])
+        with tracing.span("preprocess", profile=profile):
+            prepared = preprocess(image, options, ocr_settings["scale_factor"])
+        tesseract_config = f"{options['config']} {config}".strip()
+        timeout = ocr_settings["timeout"]
+        try:
+            if ocr_settings["prefilter"]:
+                data = prefiltered_image_to_data(prepared, ocr_settings["workers"] or None, tesseract_config, timeout)
+            elif _uses_tiles(image):
+                data = tiled_image_to_data(prepared, ocr_settings["tile_size"], ocr_settings["tile_overlap"],
+                                           ocr_settings["workers"] or None, tesseract_config, timeout)
+            else:
+                data = pytesseract.image_to_data(prepared, config=tesseract_config,
+                                                 output_type=pytesseract.Output.DICT, timeout=timeout)
+        except RuntimeError as e:
+            if "timeout" in str(e).lower():
+                raise OCRTimeout(f"tesseract took longer than {timeout:g}s (profile '{profile}')") from e
+            raise
+        scale_boxes(data, factor)
+        ocr_cache.put(image, data, settings, key=key)
+        return data
+
+# Blurring changes the pixels but not where the text is, so map the blurred
+# image to the OCR of the original and later keyword passes skip tesseract.
+def remember_ocr(image, data, config="", profile=None):
+    ocr_cache.put(image, data, _cache_settings(image, config, profile or ocr_settings["profile"]))
+
+# Classify the OCR tokens and return the (x, y, w, h) boxes that look sensitive
+def find_sensitive_boxes(data, matcher=None, verbose=True):
+    return [tuple(redaction["box"]) for redaction in find_redactions(data, matcher, verbose)]
+
+# Like find_sensitive_boxes, with why each box was picked: a dict per box with
+# "box", "kind" (label, value or secret), "rule", "score" (entropy or
+# probability; None for values) and "confidence" (tesseract's, 0-100)
+def find_redactions(data, matcher=None, verbose=True):
+    with tracing.span("detect", tokens=len(data["text"])) as span:
+        redactions = _find_redactions(data, matcher, verbose)
+        span.set(boxes=len(redactions))
+        return redactions
+
+def _find_redactions(data, matcher, verbose):
+    texts = data["text"]
+    lefts = data["left"]
+    tops = data["top"]
+    widths = data["width"]
+    heights = data["height"]
+    confs = data.get("conf") or [-1] * len(texts)
+    log = print if verbose else (lambda *args: None)
+    log(f"Detected {len([t for t in texts if t.strip()])} non-empty text regions.")
+
+    hits = (matcher or get_matcher()).classify(texts)
+    classifier = get_classifier()
+    if classifier is not None:
+        with tracing.span("classify", budget_ms=ml_settings["budget_ms"]):
+            scores = classifier.scores(texts, ml_settings["budget_ms"])
+        for i, score in enumerate(scores):
+            if hits[i] is None and score is not None and score >= ml_settings["threshold"]:
+                hits[i] = Hit("secret", "classifier", score)
+    labels = {i for i, hit in enumerate(hits) if hit is not None and hit.kind == "label"}
+    index = LineIndex(data) if labels else None
+    def redaction(i, kind, rule, score):
+        return {"box": (lefts[i], tops[i], widths[i], heights[i]), "kind": kind, "rule": rule,
+                "score": score, "confidence": float(confs[i])}
+
+    redactions = []
+    for i, hit in enumerate(hits):
+        if hit is None:
+            continue
+        if hit.kind == "label":
+            log(f"Found potential sensitive label '{hit.rule}' in text: '{texts[i]}'")
+            redactions.append(redaction(i, "label", hit.rule, hit.score))
+            value = index.value_for(i, stop=labels)
+            if value:
+                log(f"Blurring the value next to it: '{' '.join(texts[j].strip() for j in value)}'")
+            for j in value:
+                redactions.append(redaction(j, "value", hit.rule, None))
+        else:
+            measure = "probability" if hit.rule == "classifier" else "entropy"
+            log(f"Found potential standalone secret ({hit.rule}, {measure} {hit.score:.2f}): '{texts[i].strip()}'")
+            redactions.append(redaction(i, "secret", hit.rule, float(hit.score)))
+    log(f"Number of sensitive boxes detected: {len(redactions)}")
+    return redactions
+
+# fast, gaussian, pixelate or fill; see compositor.py
+redaction_mode = os.environ.get("SMARTSCREENSHOT_REDACTION_MODE", "gaussian")
+
+def blur_boxes(image, boxes, kernel_size, sigma, mode=None):
+    with tracing.span("blur", boxes=len(boxes), mode=mode or redaction_mode):
+        return composite(image, boxes, kernel_size, sigma, mode or redaction_mode)
+
+def detect(image):
+    return find_sensitive_boxes(run_ocr(image))
+
+# Detect and blur in place; returns the boxes that were blurred.
+# Pass `data` when the OCR result is already known.
+def redact(image, kernel_size, sigma, data=None, profile=None, verbose=True):
+    if data is None:
+        data = run_ocr(image, profile=profile)
+    boxes = find_sensitive_boxes(data, verbose=verbose)
+    if boxes:
+        blur_boxes(image, boxes, kernel_size, sigma)
+        remember_ocr(image, data, profile=profile)
+    return boxes
+
+# Automatically blur sensitive regions based on OCR results
+def auto_blur(image, kernel_size, sigma):
+    redact(image, kernel_size, sigma)
+    return image
+
+# userspecific's keyword step: blur the words matching `terms` (see
+# token_index.parse_terms) and return their boxes.  `index` is the image's
+# TokenIndex, built from its OCR (cached after redact()) when not given.
+def blur_keywords(image, terms, kernel_size, sigma, index=None):
+    if index is None:
+        index = TokenIndex(run_ocr(image))
+    boxes = index.boxes(index.search_all(terms))
+    blur_boxes(image, boxes, kernel_size, sigma)
+    return boxes
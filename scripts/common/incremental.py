@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Incremental OCR for repeated captures of the same window.
+#
+# The previous capture and its OCR tokens are kept per key (the window XID).
+# A new capture of the same size is compared with it tile by tile; rows of
+# changed tiles become full-width bands that are OCR'd again, and every old
+# token outside those bands is carried over unchanged.  A band is grown until
+# no old token straddles its edge, so words are never cut in half.
+#
+# The state lives in the redaction daemon (the only long-running process that
+# sees every capture), so only captures redacted through the daemon benefit.
+# Without a daemon, secrets-handling is started afresh for each capture and
+# OCRs it whole; the OCR cache still skips tesseract for identical pixels.
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from common import engine
+
+TILE_SIZE = 64
+BAND_MARGIN = 8
+
+def changed_tiles(previous, image, tile_size=TILE_SIZE):
+    diff = previous != image
+    if diff.ndim == 3:
+        diff = diff.any(axis=2)
+    height, width = diff.shape
+    rows = -(-height // tile_size)
+    cols = -(-width // tile_size)
+    padded = np.zeros((rows * tile_size, cols * tile_size), dtype=bool)
+    padded[:height, :width] = diff
+    return padded.reshape(rows, tile_size, cols, tile_size).any(axis=(1, 3))
+
+# Merge rows of changed tiles into (y0, y1) bands, grown to cover old tokens
+def changed_bands(tiles, height, boxes, tile_size=TILE_SIZE, margin=BAND_MARGIN):
+    bands = []
+    for row in np.flatnonzero(tiles.any(axis=1)):
+        y0 = max(0, row * tile_size - margin)
+        y1 = min(height, (row + 1) * tile_size + margin)
+        if bands and y0 <= bands[-1][1]:
+            bands[-1][1] = max(bands[-1][1], y1)
+        else:
+            bands.append([y0, y1])
+    grown = True
+    while grown:
+        grown = False
+        for band in bands:
+            for _x, top, _w, h in boxes:
+                if top < band[1] and top + h > band[0] and (top < band[0] or top + h > band[1]):
+                    band[0] = max(0, min(band[0], top - margin))
+                    band[1] = min(height, max(band[1], top + h + margin))
+                    grown = True
+        merged = []
+        for band in sorted(bands):
+            if merged and band[0] <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], band[1])
+            else:
+                merged.append(band)
+        bands = merged
+    return [tuple(band) for band in bands]
+
+def _words(data):
+    keys = list(data.keys())
+    return [{key: data[key][i] for key in keys} for i in range(len(data["text"])) if data["text"][i].strip()]
+
+def _to_data(words, keys):
+    words.sort(key=lambda w: (w["top"], w["left"]))
+    return {key: [w[key] for w in words] for key in keys}
+
+class IncrementalOCR:
+    def __init__(self, max_windows=16):
+        self.max_windows = max_windows
+        self.previous = OrderedDict()
+        self.lock = threading.Lock()
+
+    def forget(self, key):
+        with self.lock:
+            self.previous.pop(key, None)
+
+    def run_ocr(self, key, image, profile=None):
+        profile = profile or engine.ocr_settings["profile"]
+        with self.lock:
+            previous = self.previous.get(key)
+        if previous is None or previous[0].shape != image.shape or previous[2] != profile:
+            data = engine.run_ocr(image, profile=profile)
+        else:
+            data = self._update(previous[0], previous[1], image, profile)
+        with self.lock:
+            self.previous[key] = (image.copy(), data, profile)
+            self.previous.move_to_end(key)
+            while len(self.previous) > self.max_windows:
+                self.previous.popitem(last=False)
+        return data
+
+    def _update(self, prev_image, prev_data, image, profile):
+        tiles = changed_tiles(prev_image, image)
+        if not tiles.any():
+            print("Capture unchanged; reusing previous OCR tokens.")
+            return prev_data
+        height = image.shape[0]
+        old_words = _words(prev_data)
+        boxes = [(w["left"], w["top"], w["width"], w["height"]) for w in old_words]
+        bands = changed_bands(tiles, height, boxes)
+
+        words = [w for w in old_words
+                 if not any(w["top"] < y1 and w["top"] + w["height"] > y0 for y0, y1 in bands)]
+        carried = len(words)
+        next_block = max([w.get("block_num", 0) for w in old_words] + [0]) + 1
+        for y0, y1 in bands:
+            band_data = engine.run_ocr(image[y0:y1], profile=profile)
+            for word in _words(band_data):
+                word["top"] += y0
+                word["block_num"] = word.get("block_num", 0) + next_block
+                words.append(word)
+            next_block = max([w.get("block_num", 0) for w in words] + [next_block]) + 1
+
+        redone = sum(y1 - y0 for y0, y1 in bands)
+        print(f"Re-OCR'd {len(bands)} changed bands ({100.0 * redone / height:.1f}% of the capture), "
+              f"carried over {carried} tokens.")
+        return _to_data(words, list(prev_data.keys()))
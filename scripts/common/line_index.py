@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# Where is the value that belongs to a label such as "password:"?
+#
+# LineIndex is built once per OCR result.  Words are grouped into tesseract's
+# lines (block/par/line numbers) and put into a grid of horizontal rows, each
+# row list sorted by left edge, so a lookup only looks at a handful of words:
+#   - to the right: the rest of the label's line, or the nearest word in the
+#     rows it overlaps when tesseract put the value in another block
+#   - below: the word under the label's left edge in the next line down
+#   - failing both, the nearest word further right on the label's row
+# A label with nothing near it on either side takes a value up to half the
+# width of the text away on its row, so a wide form still works.
+# A value is that word and the ones after it on its line with word-sized
+# gaps, up to the next label, so multi-word values are covered; a long token
+# that ends its line is continued onto the next line of the same paragraph.
+import bisect
+
+ROW_HEIGHT = 16
+# Gaps measured in label heights; the first gap may also be up to
+# FIRST_GAP_FRACTION of the width the words span
+FIRST_GAP = 12
+FIRST_GAP_FRACTION = 0.5
+WORD_GAP = 1.5
+BELOW_GAP = 1.5
+MAX_VALUE_WORDS = 8
+# A token at least this long running to the end of its line is taken to wrap
+WRAP_MIN_CHARS = 16
+SEPARATORS = {":", "=", "-", "|", "->", "=>"}
+PROMPTS = {"$", "#", ">", "%"}
+
+class LineIndex:
+    def __init__(self, data, row_height=ROW_HEIGHT):
+        self.row_height = row_height
+        self.texts = [t.strip() for t in data["text"]]
+        self.left = data["left"]
+        self.top = data["top"]
+        self.width = data["width"]
+        self.height = data["height"]
+        words = [i for i, text in enumerate(self.texts) if text]
+        self.extent = max((self._right(i) for i in words), default=0) - min((self.left[i] for i in words), default=0)
+        has_lines = all(key in data for key in ("block_num", "par_num", "line_num"))
+
+        # Tesseract's lines, each sorted left to right
+        self.line_of = {}
+        self.lines = {}
+        for i in words:
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i]) if has_lines else ("row", i)
+            self.lines.setdefault(key, []).append(i)
+            self.line_of[i] = key
+        self.position = {}
+        self.paragraphs = {}
+        for key, members in self.lines.items():
+            members.sort(key=lambda i: self.left[i])
+            for position, i in enumerate(members):
+                self.position[i] = position
+            left, right = self.paragraphs.get(key[:2], (self.left[members[0]], 0))
+            self.paragraphs[key[:2]] = (min(left, self.left[members[0]]), max(right, self._right(members[-1])))
+
+        # Row grid over every word; each row sorted by left edge
+        self.rows = {}
+        for i in words:
+            for row in self._rows(self.top[i], self.top[i] + self.height[i]):
+                self.rows.setdefault(row, []).append(i)
+        self.row_lefts = {}
+        for row, members in self.rows.items():
+            members.sort(key=lambda i: self.left[i])
+            self.row_lefts[row] = [self.left[i] for i in members]
+
+    def _rows(self, y0, y1):
+        return range(y0 // self.row_height, max(y0, y1 - 1) // self.row_height + 1)
+
+    def _right(self, i):
+        return self.left[i] + self.width[i]
+
+    def _same_row(self, i, j):
+        overlap = min(self.top[i] + self.height[i], self.top[j] + self.height[j]) - max(self.top[i], self.top[j])
+        return overlap >= 0.5 * min(self.height[i], self.height[j])
+
+    # Nearest word starting right of x within `max_gap`, on the same row as i
+    def _next_in_rows(self, i, x, max_gap):
+        best = None
+        for row in self._rows(self.top[i], self.top[i] + self.height[i]):
+            members = self.rows.get(row)
+            if not members:
+                continue
+            start = bisect.bisect_left(self.row_lefts[row], x)
+            for j in members[start:]:
+                if self.left[j] - x > max_gap:
+                    break
+                if j != i and self._same_row(i, j):
+                    if best is None or self.left[j] < self.left[best]:
+                        best = j
+                    break
+        return best
+
+    # The word after j on its line, else (with `any_line`) the nearest one to its right
+    def _next_word(self, j, max_gap, any_line=False):
+        line = self.lines[self.line_of[j]]
+        position = self.position[j]
+        if position + 1 < len(line):
+            nxt = line[position + 1]
+            return nxt if self.left[nxt] - self._right(j) <= max_gap else None
+        return self._next_in_rows(j, self._right(j), max_gap) if any_line else None
+
+    # The word below i whose left edge is nearest to i's, within BELOW_GAP heights
+    def _below(self, i):
+        y0 = self.top[i] + self.height[i]
+        y1 = y0 + int(BELOW_GAP * self.height[i]) + 1
+        best = None
+        for row in self._rows(y0, y1 + 1):
+            for j in self.rows.get(row, []):
+                if not (y0 <= self.top[j] <= y1) or j == i:
+                    continue
+                if self.left[j] > self._right(i) or self._right(j) < self.left[i]:
+                    continue
+                if best is None or (self.top[j], abs(self.left[j] - self.left[i])) < \
+                        (self.top[best], abs(self.left[best] - self.left[i])):
+                    best = j
+        return best
+
+    # `first` and the words after it on its line, up to the next label
+    def _run(self, first, height, stop):
+        run = [first]
+        words = 0 if self.texts[first] in SEPARATORS else 1
+        while words < MAX_VALUE_WORDS:
+            nxt = self._next_word(run[-1], WORD_GAP * height)
+            if nxt is None or nxt in stop or self.texts[nxt][-1] in ":=":
+                break
+            run.append(nxt)
+            words += 1
+        wrapped = self._wrapped(run[-1])
+        if wrapped is not None and wrapped not in stop:
+            run.append(wrapped)
+        return run
+
+    # The start of the next line of the paragraph when the long token j ends
+    # its line and that line starts right under it
+    def _wrapped(self, j):
+        key = self.line_of[j]
+        if len(self.texts[j]) < WRAP_MIN_CHARS or self.lines[key][-1] != j or key[0] == "row":
+            return None
+        following = self.lines.get((key[0], key[1], key[2] + 1))
+        if not following:
+            return None
+        nxt = following[0]
+        # Wrapped text fills the paragraph's width
+        left, right = self.paragraphs[key[:2]]
+        if self._right(j) < right - self.height[j] or self.left[nxt] > left + self.height[j]:
+            return None
+        below = 0 <= self.top[nxt] - (self.top[j] + self.height[j]) <= BELOW_GAP * self.height[j]
+        return nxt if below else None
+
+    # Far from its label, only a word that starts its own line and is not
+    # itself a label or a prompt is taken as the value
+    def _far_value(self, j):
+        text = self.texts[j]
+        return self.position[j] == 0 and text[-1] not in ":=" and text not in SEPARATORS | PROMPTS
+
+    # Word indices of the value belonging to the label word i: to its right on
+    # the same line, or else directly below, or else further right on its row
+    # (a wide form).  Words in `stop` (other labels) end a value.
+    def value_for(self, i, stop=()):
+        height = max(1, self.height[i])
+        for max_gap, near in ((FIRST_GAP * height, True), (FIRST_GAP_FRACTION * self.extent, False)):
+            first = self._next_word(i, max_gap, any_line=True)
+            if first is not None and not near and not self._far_value(first):
+                first = None
+            if first is not None and first not in stop:
+                run = self._run(first, height, stop)
+                # A bare separator is not a value; look below instead
+                if not all(self.texts[j] in SEPARATORS for j in run):
+                    return run
+            if near:
+                first = self._below(i)
+                if first is not None and first not in stop:
+                    return self._run(first, height, stop)
+        return []
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# Redaction manifests: detect once, render as often as needed.
+#
+# A manifest records what detection found in one image: every box with the
+# rule that fired, its score and tesseract's confidence, plus the size, a
+# SHA-256 of the pixels and a thumbnail of the source.  Rendering a
+# manifest onto the original pixels only blurs, so a different kernel size,
+# sigma or redaction mode takes milliseconds instead of another OCR pass.
+# A rescaled copy of the source (same aspect ratio, a 32x32 grayscale
+# thumbnail within a few levels of the source's) gets the boxes and the blur
+# strength scaled to its size.
+#
+# Manifests are JSON, saved next to the output as <output>.redactions.json.
+# A region capture's manifest also has "region": where the crop sits in its
+# window (x, y, width, height in window coordinates, and the device pixels
+# per window pixel); window_boxes() maps the boxes back there.
+# Only the standard library is imported up front, so the scripts can parse
+# their arguments and the app can read a manifest before OpenCV is loaded.
+import hashlib
+import json
+import math
+import sys
+
+VERSION = 1
+SUFFIX = ".redactions.json"
+THUMBNAIL_SIZE = 32
+# Mean difference (0-255) between the thumbnails of the source and a copy
+MAX_THUMBNAIL_DIFF = 6
+# Relative difference in aspect ratio still treated as a rescaled copy
+ASPECT_TOLERANCE = 0.01
+
+class ManifestMismatch(ValueError):
+    pass
+
+def manifest_path(output_path):
+    return output_path + SUFFIX
+
+def image_hash(image):
+    import numpy as np
+    digest = hashlib.sha256(f"{image.shape}|{image.dtype}".encode("utf-8"))
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+def thumbnail(image):
+    import cv2
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return cv2.resize(gray, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA)
+
+# A manifest for `image` from OCR output `data`; call before blurring
+def build(image, data, profile=None, verbose=True):
+    from common import engine
+    height, width = image.shape[:2]
+    redactions = engine.find_redactions(data, verbose=verbose)
+    for redaction in redactions:
+        redaction["box"] = [int(v) for v in redaction["box"]]
+    return {
+        "version": VERSION,
+        "source": {"width": width, "height": height, "sha256": image_hash(image),
+                   "thumbnail": thumbnail(image).tobytes().hex()},
+        "profile": profile or engine.ocr_settings["profile"],
+        "redactions": redactions,
+    }
+
+# Manifest entries for boxes blurred by hand for `keyword`
+def keyword_redactions(boxes, keyword):
+    return [{"box": [int(v) for v in box], "kind": "keyword", "rule": keyword, "score": None, "confidence": None}
+            for box in boxes]
+
+# OCR (unless `data` is given) and describe `image`
+def detect(image, data=None, profile=None, verbose=True):
+    from common import engine
+    if data is None:
+        data = engine.run_ocr(image, profile=profile)
+    return build(image, data, profile, verbose), data
+
+# (x_scale, y_scale) that maps the manifest's boxes onto `image`; raises
+# ManifestMismatch when `image` is not the source or a rescaled copy of it
+def match(image, manifest):
+    import numpy as np
+    source = manifest["source"]
+    height, width = image.shape[:2]
+    if (width, height) == (source["width"], source["height"]) and image_hash(image) == source["sha256"]:
+        return 1.0, 1.0
+    source_aspect = source["width"] / source["height"]
+    if abs(width / height - source_aspect) > ASPECT_TOLERANCE * source_aspect:
+        raise ManifestMismatch(f"image is {width}x{height}, the manifest is for "
+                               f"{source['width']}x{source['height']}")
+    expected = np.frombuffer(bytes.fromhex(source["thumbnail"]), dtype=np.uint8)
+    difference = np.abs(thumbnail(image).ravel().astype(np.int16) - expected).mean()
+    if difference > MAX_THUMBNAIL_DIFF:
+        raise ManifestMismatch(f"image differs from the manifest's source (mean difference {difference:.1f})")
+    return width / source["width"], height / source["height"]
+
+# The manifest's boxes in `image`'s pixels
+def scaled_boxes(manifest, x_scale=1.0, y_scale=1.0):
+    boxes = []
+    for redaction in manifest["redactions"]:
+        x, y, w, h = redaction["box"]
+        # Round outwards so a shrunk box still covers the text
+        x0, y0 = math.floor(x * x_scale), math.floor(y * y_scale)
+        x1, y1 = math.ceil((x + w) * x_scale), math.ceil((y + h) * y_scale)
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+    return boxes
+
+# The boxes in window coordinates, for a region capture's manifest
+def window_boxes(manifest):
+    region = manifest.get("region")
+    if not region:
+        return scaled_boxes(manifest)
+    scale = 1.0 / region.get("scale", 1.0)
+    return [(x + region["x"], y + region["y"], w, h) for x, y, w, h in scaled_boxes(manifest, scale, scale)]
+
+# Blur `image` in place as described by `manifest`; returns the boxes blurred.
+# `check=False` skips the source check (the caller knows the pixels match).
+def render(image, manifest, kernel_size, sigma, mode=None, check=True):
+    from common import engine
+    x_scale, y_scale = match(image, manifest) if check else (1.0, 1.0)
+    boxes = scaled_boxes(manifest, x_scale, y_scale)
+    if boxes:
+        # The same blur relative to the text on a rescaled copy
+        scale = (x_scale + y_scale) / 2
+        kernel_size = engine.normalize_kernel(max(1, int(round(kernel_size * scale))))
+        engine.blur_boxes(image, boxes, kernel_size, sigma * scale, mode)
+    return boxes
+
+# engine.redact that also returns the manifest of what was blurred
+def redact(image, kernel_size, sigma, data=None, profile=None):
+    from common import engine
+    manifest, data = detect(image, data, profile)
+    boxes = render(image, manifest, kernel_size, sigma, check=False)
+    if boxes:
+        engine.remember_ocr(image, data, profile=profile)
+    return manifest
+
+def save(path, manifest):
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=1)
+
+def load(path):
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != VERSION:
+        raise ManifestMismatch(f"'{path}' is not a version {VERSION} redaction manifest")
+    return manifest
+
+# The scripts' --render: blur `image_path` into `output_path` from the saved
+# manifest at `path` instead of running OCR; exits on errors
+def render_file(path, image_path, output_path, kernel_size, sigma):
+    from common import shm_image, tracing
+    try:
+        redactions = load(path)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not read the manifest '{path}': {e}")
+        sys.exit(1)
+    with tracing.span("decode", path=image_path):
+        image = shm_image.read_image(image_path)
+    if image is None:
+        print(f"Error: Could not read the image file '{image_path}'")
+        sys.exit(1)
+    try:
+        boxes = render(image, redactions, kernel_size, sigma)
+    except ManifestMismatch as e:
+        print(f"Error: {e}; no output written.")
+        sys.exit(1)
+    with tracing.span("write", path=output_path):
+        shm_image.write_image(output_path, image)
+    print(f"Blurred {len(boxes)} boxes from '{path}'; saved as '{output_path}'.")
+
+# Take "--manifest" and "--render <manifest.json>" out of argv; returns
+# (write_manifest, render_path)
+def pop_manifest_args(argv):
+    write = "--manifest" in argv
+    if write:
+        argv.remove("--manifest")
+    render_path = None
+    if "--render" in argv:
+        index = argv.index("--render")
+        if index + 1 >= len(argv):
+            print("--render takes the path of a redaction manifest")
+            sys.exit(1)
+        render_path = argv[index + 1]
+        del argv[index:index + 2]
+    return write, render_path
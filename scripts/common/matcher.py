@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Compiled matcher deciding which OCR tokens look sensitive.
+#
+# All labels are folded into one alternation, so classify() joins the
+# lowercased tokens of a screenshot into one string, a token per line, and
+# finds every label in a single pass.  Each secret shape is run once over the
+# joined original tokens (in MULTILINE mode, so ^ and $ bind to a token) to
+# find the few tokens it could match; only those are then matched token by
+# token, which is what decides.  A match whose Shannon entropy is below the
+# rule's threshold does not count, but the token's other matches and the
+# other rules are still tried; this filters out long ordinary words and runs
+# of repeated characters.  Shapes with \A, \Z or lookbehinds, whose meaning
+# could change in the joined string, skip the first pass.
+#
+# A rule file (JSON) can replace the defaults:
+#   {"labels": ["password", ...],
+#    "patterns": [{"name": "hex", "regex": "[a-fA-F0-9]{32,}", "min_entropy": 3.0}, ...]}
+import bisect
+import json
+import math
+import os
+import re
+from collections import Counter, namedtuple
+
+Hit = namedtuple("Hit", ["kind", "rule", "score"])
+
+# Constructs that see past a token when the tokens are joined
+CONTEXT_RE = re.compile(r"\\A|\\Z|\(\?<[=!]")
+
+DEFAULT_LABELS = ["password", "api key", "secret", "token", "pwd", "pass", "credential", "key"]
+DEFAULT_PATTERNS = [
+    {"name": "jwt", "regex": r"eyJ[A-Za-z0-9_-]+\.eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+", "min_entropy": 0},
+    {"name": "hex", "regex": r"[a-fA-F0-9]{32,}", "min_entropy": 3.0},
+    {"name": "token", "regex": r"[A-Za-z0-9_-]{20,}", "min_entropy": 3.5},
+    {"name": "base64", "regex": r"[A-Za-z0-9+/]{20,}=*", "min_entropy": 3.5},
+]
+
+def shannon_entropy(text):
+    if not text:
+        return 0.0
+    length = len(text)
+    return -sum(n / length * math.log2(n / length) for n in Counter(text).values())
+
+class Matcher:
+    def __init__(self, labels=None, patterns=None):
+        labels = DEFAULT_LABELS if labels is None else labels
+        patterns = DEFAULT_PATTERNS if patterns is None else patterns
+        self.labels = sorted({label.lower() for label in labels}, key=len, reverse=True)
+        self.label_re = re.compile("|".join(re.escape(label) for label in self.labels)) if self.labels else None
+        # (name, per-token regex, joined-string regex or None, min entropy)
+        self.rules = []
+        for pattern in patterns:
+            name = pattern["name"]
+            if not name.isidentifier():
+                raise ValueError(f"Pattern name '{name}' must be a valid identifier")
+            regex = pattern["regex"]
+            joined_re = None if CONTEXT_RE.search(regex) else re.compile(regex, re.MULTILINE)
+            self.rules.append((name, re.compile(regex), joined_re, float(pattern.get("min_entropy", 0))))
+
+    # Returns one Hit (or None) per token; labels take precedence over shapes,
+    # and earlier shapes over later ones
+    def classify(self, texts):
+        tokens = [t.strip().replace("\n", " ") for t in texts]
+        hits = [None] * len(tokens)
+
+        if self.label_re is not None:
+            # Built from the lowercased tokens: lower() can change a length
+            lowered = [token.lower() for token in tokens]
+            lowered_starts = _starts(lowered)
+            for m in self.label_re.finditer("\n".join(lowered)):
+                i = _token_at(lowered_starts, m.start())
+                if hits[i] is None:
+                    hits[i] = Hit("label", m.group(0), 1.0)
+        if not self.rules:
+            return hits
+        starts = _starts(tokens)
+        joined = "\n".join(tokens)
+        for name, token_re, joined_re, min_entropy in self.rules:
+            if joined_re is None:
+                candidates = range(len(tokens))
+            else:
+                # Every token a match touches; a match running into the next
+                # token may hide one that starts there
+                candidates = set()
+                for m in joined_re.finditer(joined):
+                    candidates.update(range(_token_at(starts, m.start()), _token_at(starts, max(m.start(), m.end() - 1)) + 1))
+            for i in sorted(candidates):
+                if hits[i] is not None or not tokens[i]:
+                    continue
+                for m in token_re.finditer(tokens[i]):
+                    score = shannon_entropy(m.group(0))
+                    if m.group(0) and score >= min_entropy:
+                        hits[i] = Hit("secret", name, score)
+                        break
+        return hits
+
+# Offset of each token in the tokens joined with "\n"
+def _starts(tokens):
+    starts = []
+    pos = 0
+    for token in tokens:
+        starts.append(pos)
+        pos += len(token) + 1
+    return starts
+
+def _token_at(starts, offset):
+    return bisect.bisect_right(starts, offset) - 1
+
+def load_rules(path):
+    with open(path, "r") as f:
+        rules = json.load(f)
+    return Matcher(rules.get("labels"), rules.get("patterns"))
+
+_matchers = {}
+
+# Matcher for the rule file in SMARTSCREENSHOT_RULES (or `path`), compiled
+# once per file modification so the per-token loop never touches the disk.
+def get_matcher(path=None):
+    path = path or os.environ.get("SMARTSCREENSHOT_RULES") or None
+    if not path:
+        key = None
+    else:
+        try:
+            key = (path, os.path.getmtime(path))
+        except OSError as e:
+            print(f"Could not read rule file '{path}', using default rules:", e)
+            key = None
+    if key not in _matchers:
+        _matchers[key] = load_rules(path) if key else Matcher()
+    return _matchers[key]
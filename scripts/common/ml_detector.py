@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# Model-based sensitive-text detection, alongside the regex rules.
+#
+# A Hugging Face sequence-classification model (SMARTSCREENSHOT_ML_MODEL, a
+# hub id or a local directory) scores each distinct OCR token of a screenshot
+# in a few batched forward passes.  The model is loaded once per process and
+# dynamically quantized to int8 for CPU inference; scores are memoized by
+# token text, so repeated captures only pay for new tokens.  Each screenshot
+# gets a latency budget (SMARTSCREENSHOT_ML_BUDGET_MS): tokens left over when
+# it runs out are judged by the regex rules alone.
+#
+# torch and transformers are optional; without them, or without a model
+# configured, get_classifier() returns None and detection is regex-only.
+import os
+import threading
+import time
+from collections import OrderedDict
+
+BATCH_SIZE = 32
+MAX_LENGTH = 32
+MAX_MEMO = 20000
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+class TokenClassifier:
+    def __init__(self, model_name, label=1, batch_size=BATCH_SIZE, max_memo=MAX_MEMO):
+        self.model_name = model_name
+        self.label = label
+        self.batch_size = batch_size
+        self.max_memo = max_memo
+        self.memo = OrderedDict()
+        self.lock = threading.Lock()
+        self.tokenizer = None
+        self.model = None
+
+    def load(self):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        start = time.perf_counter()
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        model.eval()
+        self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        if isinstance(self.label, str):
+            self.label = model.config.label2id[self.label]
+        print(f"Loaded classifier '{self.model_name}' in {time.perf_counter() - start:.1f}s.")
+
+    # Probability of the sensitive label for each text in one forward pass
+    def _predict(self, texts):
+        import torch
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors="pt")
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
+        return torch.softmax(logits, dim=-1)[:, self.label].tolist()
+
+    # One score (or None when the budget ran out first) per text
+    def scores(self, texts, budget_ms):
+        tokens = [t.strip() for t in texts]
+        with self.lock:
+            pending = list(dict.fromkeys(t for t in tokens if t and t not in self.memo))
+            deadline = time.perf_counter() + budget_ms / 1000.0
+            batch_time = 0.0
+            done = 0
+            while done < len(pending):
+                # Stop before a batch that would overrun the budget
+                if time.perf_counter() + batch_time > deadline:
+                    break
+                start = time.perf_counter()
+                batch = pending[done:done + self.batch_size]
+                for text, score in zip(batch, self._predict(batch)):
+                    self.memo[text] = score
+                done += len(batch)
+                batch_time = time.perf_counter() - start
+            if done < len(pending):
+                print(f"Classifier budget of {budget_ms:.0f}ms used up; {len(pending) - done} tokens left to the rules.")
+            result = []
+            for t in tokens:
+                score = self.memo.get(t) if t else None
+                if score is not None:
+                    self.memo.move_to_end(t)
+                result.append(score)
+            while len(self.memo) > self.max_memo:
+                self.memo.popitem(last=False)
+        return result
+
+_classifiers = {}
+_load_lock = threading.Lock()
+
+# The classifier for SMARTSCREENSHOT_ML_MODEL (or `model_name`), loaded on
+# first use; None when no model is configured or it cannot be loaded
+def get_classifier(model_name=None):
+    model_name = model_name or os.environ.get("SMARTSCREENSHOT_ML_MODEL") or None
+    if not model_name:
+        return None
+    with _load_lock:
+        if model_name not in _classifiers:
+            label = os.environ.get("SMARTSCREENSHOT_ML_LABEL", "1")
+            classifier = TokenClassifier(model_name, int(label) if label.isdigit() else label)
+            try:
+                classifier.load()
+            except Exception as e:
+                print(f"Could not load classifier '{model_name}', using the rules only:", e)
+                classifier = None
+            _classifiers[model_name] = classifier
+        return _classifiers[model_name]
+
+# Per-screenshot inference budget and decision threshold
+ml_settings = {
+    "budget_ms": _env_float("SMARTSCREENSHOT_ML_BUDGET_MS", 200),
+    "threshold": _env_float("SMARTSCREENSHOT_ML_THRESHOLD", 0.5),
+}
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# Content-addressed cache of tesseract `image_to_data` results.
+#
+# Entries are keyed by a hash of the pixels plus the OCR settings, kept in an
+# in-memory LRU and optionally mirrored to a directory of JSON files so the
+# daemon, the scripts and the GTK app can share them.
+#
+# Only identical pixels reuse an entry by default.  A perceptual hash barely
+# moves when a line of text is added or a secret is changed, so near-duplicate
+# reuse would hand back tokens that miss the new text.  With `phash_threshold`
+# above 0 (SMARTSCREENSHOT_OCR_PHASH_THRESHOLD), an image of the same size
+# within that many bits of a cached one reuses its entry only when no tile
+# differs from the cached pixels by more than PIXEL_TOLERANCE levels (a
+# re-saved or re-compressed copy); the pixels are only kept in memory.
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+TILE_SIZE = 32
+PIXEL_TOLERANCE = 24
+
+def content_key(image, settings=""):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.shape}|{image.dtype}|{settings}".encode("utf-8"))
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+# 256 bit difference hash of a 17x16 grayscale thumbnail
+def perceptual_hash(image):
+    small = cv2.resize(_gray(image), (17, 16), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+def _gray(image):
+    if image.ndim == 3 and image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+# True when every TILE_SIZE tile of two same-sized grayscale images is within
+# PIXEL_TOLERANCE, i.e. nothing was drawn or erased between them
+def same_content(gray, cached, tolerance=PIXEL_TOLERANCE):
+    if gray.shape != cached.shape:
+        return False
+    diff = cv2.absdiff(gray, cached) > tolerance
+    height, width = diff.shape
+    rows, cols = -(-height // TILE_SIZE), -(-width // TILE_SIZE)
+    padded = np.zeros((rows * TILE_SIZE, cols * TILE_SIZE), dtype=bool)
+    padded[:height, :width] = diff
+    return not padded.reshape(rows, TILE_SIZE, cols, TILE_SIZE).any(axis=(1, 3)).any()
+
+class OCRCache:
+    def __init__(self, max_entries=32, disk_dir=None, phash_threshold=0):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.phash_threshold = phash_threshold or 0
+        self.entries = OrderedDict()
+        # Grayscale pixels per key, for the near-duplicate check
+        self.pixels = {}
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            old_key, _ = self.entries.popitem(last=False)
+            self.pixels.pop(old_key, None)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + ".json")
+
+    def _load_from_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_to_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            tmp_path = self._disk_path(key) + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            print("Could not write OCR cache entry:", e)
+
+    def _find_near_duplicate(self, image, settings):
+        shape = list(image.shape)
+        phash = perceptual_hash(image)
+        gray = None
+        for key, entry in reversed(self.entries.items()):
+            if entry["shape"] != shape or entry["settings"] != settings or key not in self.pixels:
+                continue
+            if hamming(entry["phash"], phash) > self.phash_threshold:
+                continue
+            if gray is None:
+                gray = _gray(image)
+            if same_content(gray, self.pixels[key]):
+                return key, entry
+        return None, None
+
+    # Returns (key, data); data is None on a miss and key can be passed to put()
+    def get(self, image, settings=""):
+        key = content_key(image, settings)
+        with self.lock:
+            return key, self._get_locked(image, settings, key)
+
+    def _get_locked(self, image, settings, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self._load_from_disk(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None and self.phash_threshold > 0:
+            near_key, entry = self._find_near_duplicate(image, settings)
+            if entry is not None:
+                print(f"Reusing OCR result of near-duplicate image {near_key[:8]}.")
+                self._remember(key, entry)
+                self.pixels[key] = self.pixels[near_key]
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry["data"]
+
+    def put(self, image, data, settings="", key=None):
+        key = key or content_key(image, settings)
+        entry = {
+            "shape": list(image.shape),
+            "settings": settings,
+            "phash": perceptual_hash(image),
+            "data": data,
+        }
+        with self.lock:
+            self._remember(key, entry)
+            if self.phash_threshold > 0:
+                self.pixels[key] = _gray(image).copy()
+        self._save_to_disk(key, entry)
+        return key
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.pixels.clear()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Named OCR profiles: image preprocessing plus the tesseract options to use.
+#
+#   fast      grayscale, Otsu binarisation with dark themes inverted, sparse
+#             text layout (--psm 11), tesseract's own inverted-text retry off
+#   balanced  grayscale, automatic layout (--psm 3)
+#   accurate  the colour image at twice the logical resolution, --psm 3
+#
+# Each profile OCRs text at `scale` times its logical size: captures from a
+# HiDPI screen (SMARTSCREENSHOT_SCALE_FACTOR, exported by the app) are shrunk
+# first, which is where most of the time goes on 4K screens.  Boxes are mapped
+# back to the original pixels by the caller with scale_boxes().
+import sys
+
+PROFILES = {
+    "fast": {"grayscale": True, "binarize": True, "scale": 1.0,
+             "config": "--oem 1 --psm 11 -c tessedit_do_invert=0"},
+    "balanced": {"grayscale": True, "binarize": False, "scale": 1.0,
+                 "config": "--oem 1 --psm 3"},
+    "accurate": {"grayscale": False, "binarize": False, "scale": 2.0,
+                 "config": "--oem 1 --psm 3"},
+}
+DEFAULT_PROFILE = "balanced"
+
+def get_profile(name):
+    if name not in PROFILES:
+        raise ValueError(f"Unknown OCR profile '{name}' (choose from {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+# How much a profile resizes a capture taken at `scale_factor` device pixels
+# per logical pixel
+def resize_factor(profile, scale_factor=1.0):
+    return profile["scale"] / max(scale_factor, 1.0)
+
+# The image tesseract should see for `profile`
+def preprocess(image, profile, scale_factor=1.0):
+    import cv2
+    factor = resize_factor(profile, scale_factor)
+    if profile["grayscale"] and image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if factor != 1.0:
+        height, width = image.shape[:2]
+        size = (max(1, int(round(width * factor))), max(1, int(round(height * factor))))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA if factor < 1 else cv2.INTER_CUBIC)
+    if profile["binarize"] and image.ndim == 2:
+        _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        # tesseract expects dark text on a light background
+        if image.mean() < 128:
+            image = cv2.bitwise_not(image)
+    return image
+
+# Map the boxes of an image_to_data dict OCR'd at `factor` back to full size
+def scale_boxes(data, factor):
+    if factor == 1.0:
+        return data
+    for key in ("left", "top", "width", "height"):
+        data[key] = [int(round(v / factor)) for v in data[key]]
+    return data
+
+# Take "--profile <name>" out of argv; returns the name, or None if absent.
+# Exits with a message for an unknown name.
+def pop_profile_arg(argv):
+    if "--profile" not in argv:
+        return None
+    index = argv.index("--profile")
+    if index + 1 >= len(argv) or argv[index + 1] not in PROFILES:
+        print(f"--profile takes one of: {', '.join(PROFILES)}")
+        sys.exit(1)
+    name = argv[index + 1]
+    del argv[index:index + 2]
+    return name
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Raw-pixel image handoff between the app and the scripts.
+#
+# An image buffer is a file, normally under /dev/shm, holding a fixed header
+# followed by the pixel rows:
+#   magic "SSIMG001", then width, height, stride, channels and channel order
+#   (0 = BGR, 1 = RGB) as little-endian uint32s.
+# Paths ending in ".ssimg" are read and written as buffers by read_image() and
+# write_image(); any other path goes through OpenCV, so the scripts keep
+# working on PNG files from the command line.
+import mmap
+import os
+import struct
+import tempfile
+
+MAGIC = b"SSIMG001"
+HEADER = struct.Struct("<8s5I")
+SUFFIX = ".ssimg"
+BGR = 0
+RGB = 1
+
+# Directory for buffers: SMARTSCREENSHOT_SHM_DIR, /dev/shm, or the temp dir
+def shm_dir():
+    for path in (os.environ.get("SMARTSCREENSHOT_SHM_DIR"), "/dev/shm"):
+        if path and os.path.isdir(path) and os.access(path, os.W_OK):
+            return path
+    return tempfile.gettempdir()
+
+def is_buffer(path):
+    return str(path).endswith(SUFFIX)
+
+# Write `pixels` (rows `stride` bytes apart; the last row may be unpadded) to a buffer
+def write_buffer(path, pixels, width, height, channels, stride=None, order=BGR):
+    if stride is None:
+        stride = width * channels
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, height, stride, channels, order))
+        f.write(memoryview(pixels).cast("B"))
+
+# Read-only (height, width, channels) view of a buffer, and its channel order.
+# The mapping stays alive as long as the returned array does.
+def map_buffer(path):
+    import numpy as np
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < HEADER.size:
+        raise ValueError(f"'{path}' is too short to be an image buffer")
+    magic, width, height, stride, channels, order = HEADER.unpack_from(mapped)
+    if magic != MAGIC:
+        raise ValueError(f"'{path}' is not an image buffer")
+    if height and len(mapped) < HEADER.size + stride * (height - 1) + width * channels:
+        raise ValueError(f"'{path}' is truncated")
+    flat = np.frombuffer(mapped, dtype=np.uint8, offset=HEADER.size)
+    view = np.lib.stride_tricks.as_strided(
+        flat, shape=(height, width, channels), strides=(stride, channels, 1), writeable=False)
+    return view, order
+
+# Load an image as a writable BGR array, like cv2.imread; None when unreadable
+def read_image(path):
+    if not is_buffer(path):
+        import cv2
+        return cv2.imread(path)
+    try:
+        view, order = map_buffer(path)
+    except (OSError, ValueError) as e:
+        print("Error reading image buffer:", e)
+        return None
+    if order == RGB:
+        return view[..., 2::-1].copy()
+    return view[..., :3].copy()
+
+# Save a BGR array, like cv2.imwrite; returns True on success
+def write_image(path, image):
+    if not is_buffer(path):
+        import cv2
+        return cv2.imwrite(path, image)
+    import numpy as np
+    image = np.ascontiguousarray(image)
+    if image.ndim == 2:
+        image = image[..., None]
+    height, width, channels = image.shape
+    write_buffer(path, image, width, height, channels, order=BGR)
+    return True
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# Find the parts of a screenshot that contain text, so tesseract can skip the rest.
+#
+# Text is a dense run of sharp, short strokes: a morphological gradient
+# thresholded with Otsu, closed horizontally, turns each word or line into one
+# blob.  Tall blobs are kept only if they are solid enough to be strokes
+# rather than an outline, and have the empty rows between lines that a
+# paragraph has and a photo or icon does not; the rest are padded and
+# merged into a few crops.  Each crop is OCR'd on its own and the words are
+# mapped back to full-image coordinates.
+# The result has the same keys as pytesseract's image_to_data dict.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import pytesseract
+
+from common.compositor import merge_boxes
+from common.tiled_ocr import BLOCKS_PER_TILE, DATA_KEYS
+
+# Wider images are searched at half resolution; screen text survives a 2x downscale
+DETECT_WIDTH = 1920
+MIN_TEXT_HEIGHT = 6
+MAX_LINE_HEIGHT = 96
+# A tall blob is text when at least this share of it is set and this share
+# of its rows is (almost) empty
+MIN_FILL = 0.05
+MIN_GAP_ROWS = 0.1
+PADDING = 12
+MAX_CROPS = 8
+# Above this share of the image, one full-image call is cheaper than the crops
+MAX_COVERAGE = 0.6
+
+# (x0, y0, x1, y1) crops that together cover the text of `image`; None when
+# cropping would not save anything
+def find_text_regions(image, max_crops=MAX_CROPS, max_coverage=MAX_COVERAGE):
+    height, width = image.shape[:2]
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    # Line gaps close up below half resolution, so never go further than that
+    scale = 2 if width > DETECT_WIDTH else 1
+    if scale > 1:
+        gray = cv2.resize(gray, (width // scale, height // scale), interpolation=cv2.INTER_AREA)
+
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, 15 // scale), 1)))
+    count, labels, stats, _centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+    boxes = []
+    for label in range(1, count):
+        x, y, w, h, _area = stats[label]
+        if h * scale < MIN_TEXT_HEIGHT or w * scale < MIN_TEXT_HEIGHT:
+            continue
+        if h * scale > MAX_LINE_HEIGHT and not _has_line_gaps(labels[y:y+h, x:x+w] == label):
+            continue
+        x, y, w, h = x * scale, y * scale, w * scale, h * scale
+        boxes.append((x - PADDING, y - PADDING, w + 2 * PADDING, h + 2 * PADDING))
+    crops = [bounds for bounds, _members in merge_boxes(boxes, width, height)]
+    crops = _reduce(crops, max_crops)
+    covered = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in crops)
+    if covered > max_coverage * width * height:
+        return None
+    return sorted(crops, key=lambda c: (c[1], c[0]))
+
+def _has_line_gaps(component):
+    filled = component.mean(axis=1)
+    return filled.mean() >= MIN_FILL and (filled < 0.02).mean() >= MIN_GAP_ROWS
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def _area(rect):
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+def _merge_overlapping(crops):
+    width = max(c[2] for c in crops)
+    height = max(c[3] for c in crops)
+    merged = merge_boxes([(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in crops], width, height)
+    return sorted((bounds for bounds, _members in merged), key=lambda c: c[1])
+
+# Every tesseract call has a fixed start-up cost, so neighbouring crops (in
+# top-to-bottom order) are merged, cheapest union first, until at most
+# `max_crops` remain
+def _reduce(crops, max_crops):
+    crops = sorted(crops, key=lambda c: c[1])
+    while len(crops) > max_crops:
+        costs = [_area(_union(a, b)) - _area(a) - _area(b) for a, b in zip(crops, crops[1:])]
+        i = costs.index(min(costs))
+        crops[i:i + 2] = [_union(crops[i], crops[i + 1])]
+        # The union may now overlap other crops
+        crops = _merge_overlapping(crops)
+    return crops
+
+def _ocr_crop(crop, config, timeout=0):
+    return pytesseract.image_to_data(crop, config=config, output_type=pytesseract.Output.DICT, timeout=timeout)
+
+# Shift each crop's words back into the full image, crops in reading order
+def merge_crops(crops, results):
+    merged = {key: [] for key in DATA_KEYS}
+    for index, ((x0, y0, _x1, _y1), data) in enumerate(zip(crops, results)):
+        for i in range(len(data["text"])):
+            for key in DATA_KEYS:
+                merged[key].append(data[key][i])
+            merged["left"][-1] += x0
+            merged["top"][-1] += y0
+            merged["block_num"][-1] = index * BLOCKS_PER_TILE + data["block_num"][i]
+    return merged
+
+# OCR only the text regions of `image`; falls back to the whole image when
+# the regions cover most of it.  tesseract runs out of process, so threads
+# are enough to OCR the crops in parallel.
+def prefiltered_image_to_data(image, workers=None, config="", timeout=0):
+    crops = find_text_regions(image)
+    if crops is None:
+        return _ocr_crop(image, config, timeout)
+    if not crops:
+        return {key: [] for key in DATA_KEYS}
+    images = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in crops]
+    workers = min(workers or os.cpu_count() or 1, len(crops))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_ocr_crop, images, [config] * len(images), [timeout] * len(images)))
+    return merge_crops(crops, results)
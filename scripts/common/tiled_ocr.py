@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# Tiled OCR for large captures.
+#
+# A single tesseract call works on one core, so a 4K or multi-monitor capture
+# is split into overlapping tiles that are OCR'd by a process pool.  Each tile
+# owns the middle of its overlap with its neighbours: a word that no inner
+# edge cuts is kept from the tile that owns its centre, and from another tile
+# only if it is not there already, which removes the duplicates along the
+# seams.  A word wider than the overlap is cut in every tile; its fragments
+# are joined across the seam into one box (with the widest fragment's text),
+# so long tokens such as keys and URLs are still redacted.  The result has the
+# same keys as pytesseract's image_to_data dict, in tile-major reading order.
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytesseract
+
+DATA_KEYS = ["level", "page_num", "block_num", "par_num", "line_num", "word_num",
+             "left", "top", "width", "height", "conf", "text"]
+EDGE_MARGIN = 2
+BLOCKS_PER_TILE = 10000
+
+# (x0, y0, x1, y1) spans of overlapping tiles along one axis
+def _spans(length, tile_size, overlap):
+    if length <= tile_size:
+        return [(0, length)]
+    step = tile_size - overlap
+    starts = list(range(0, length - tile_size, step)) + [length - tile_size]
+    return [(s, s + tile_size) for s in starts]
+
+def tile_grid(width, height, tile_size, overlap):
+    overlap = min(overlap, tile_size // 2)
+    return [(x0, y0, x1, y1)
+            for y0, y1 in _spans(height, tile_size, overlap)
+            for x0, x1 in _spans(width, tile_size, overlap)]
+
+def _limit_threads():
+    # One tesseract per core; stop each of them from spawning OpenMP threads
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+def _ocr_tile(tile, config, timeout=0):
+    return pytesseract.image_to_data(tile, config=config, output_type=pytesseract.Output.DICT, timeout=timeout)
+
+# The part of a tile whose word centres it is responsible for
+def _owned_region(tile, tiles):
+    x0, y0, x1, y1 = tile
+    ox0, oy0, ox1, oy1 = x0, y0, x1, y1
+    for nx0, ny0, nx1, ny1 in tiles:
+        same_row = ny0 == y0
+        same_col = nx0 == x0
+        if same_row and x0 < nx0 < x1:
+            ox1 = min(ox1, (nx0 + x1) // 2)
+        if same_row and x0 < nx1 < x1:
+            ox0 = max(ox0, (x0 + nx1) // 2)
+        if same_col and y0 < ny0 < y1:
+            oy1 = min(oy1, (ny0 + y1) // 2)
+        if same_col and y0 < ny1 < y1:
+            oy0 = max(oy0, (y0 + ny1) // 2)
+    return ox0, oy0, ox1, oy1
+
+def _iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+def _overlap_area(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return max(0, min(ax + aw, bx + bw) - max(ax, bx)) * max(0, min(ay + ah, by + bh) - max(ay, by))
+
+# Fragments of one word cut by different tiles: on the same line, and
+# overlapping or touching across the seam
+def _same_word(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    vertical = min(ay + ah, by + bh) - max(ay, by)
+    return vertical >= 0.5 * min(ah, bh) and bx <= ax + aw + EDGE_MARGIN and ax <= bx + bw + EDGE_MARGIN
+
+def _union(a, b):
+    x0, y0 = min(a[0], b[0]), min(a[1], b[1])
+    x1, y1 = max(a[0] + a[2], b[0] + b[2]), max(a[1] + a[3], b[1] + b[3])
+    return (x0, y0, x1 - x0, y1 - y0)
+
+def merge_tiles(tiles, results, width, height):
+    owned, others, fragments = [], [], []
+    for index, (tile, data) in enumerate(zip(tiles, results)):
+        x0, y0, x1, y1 = tile
+        ox0, oy0, ox1, oy1 = _owned_region(tile, tiles)
+        for i, text in enumerate(data["text"]):
+            if not text.strip():
+                continue
+            left, top = data["left"][i] + x0, data["top"][i] + y0
+            w, h = data["width"][i], data["height"][i]
+            word = (index, i, (left, top, w, h))
+            # Words cut by an inner tile edge are usually complete in the neighbour
+            if (x0 > 0 and left - x0 <= EDGE_MARGIN) or (x1 < width and x1 - (left + w) <= EDGE_MARGIN) or \
+                    (y0 > 0 and top - y0 <= EDGE_MARGIN) or (y1 < height and y1 - (top + h) <= EDGE_MARGIN):
+                fragments.append(word)
+                continue
+            cx, cy = left + w / 2.0, top + h / 2.0
+            (owned if ox0 <= cx < ox1 and oy0 <= cy < oy1 else others).append(word)
+
+    kept = []
+    for index, i, box in owned:
+        text = results[index]["text"][i]
+        if not any(t == text and _iou(box, b) > 0.5 for _, _, t, b in kept):
+            kept.append((index, i, text, box))
+    # Complete in a tile that does not own its centre (the owner cut it)
+    for index, i, box in others:
+        if not any(_iou(box, b) > 0.5 for _, _, _, b in kept):
+            kept.append((index, i, results[index]["text"][i], box))
+
+    # Join the fragments of words that no tile saw whole
+    groups = []
+    for index, i, box in sorted(fragments, key=lambda f: f[2][0]):
+        for group in groups:
+            if _same_word(group["box"], box):
+                group["box"] = _union(group["box"], box)
+                if box[2] > group["widest"][2][2]:
+                    group["widest"] = (index, i, box)
+                break
+        else:
+            groups.append({"box": box, "widest": (index, i, box)})
+    for group in groups:
+        box = group["box"]
+        # Already covered by words seen whole
+        if sum(_overlap_area(box, b) for _, _, _, b in kept) > 0.5 * box[2] * box[3]:
+            continue
+        index, i, _ = group["widest"]
+        kept.append((index, i, results[index]["text"][i], box))
+
+    merged = {key: [] for key in DATA_KEYS}
+    for index, i, _text, (left, top, w, h) in sorted(kept, key=lambda k: (k[0], k[1])):
+        data = results[index]
+        for key in DATA_KEYS:
+            merged[key].append(data[key][i])
+        merged["left"][-1] = left
+        merged["top"][-1] = top
+        merged["width"][-1] = w
+        merged["height"][-1] = h
+        merged["block_num"][-1] = index * BLOCKS_PER_TILE + data["block_num"][i]
+    return merged
+
+def tiled_image_to_data(image, tile_size=1600, overlap=200, workers=None, config="", timeout=0):
+    height, width = image.shape[:2]
+    tiles = tile_grid(width, height, tile_size, overlap)
+    if len(tiles) == 1:
+        return _ocr_tile(image, config, timeout)
+    crops = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in tiles]
+    workers = min(workers or os.cpu_count() or 1, len(tiles))
+    # One worker: no pool, so this also runs inside daemonic processes
+    if workers == 1:
+        results = [_ocr_tile(crop, config, timeout) for crop in crops]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_limit_threads) as pool:
+            results = list(pool.map(_ocr_tile, crops, [config] * len(crops), [timeout] * len(crops)))
+    print(f"OCR'd {len(tiles)} tiles of {tile_size}px with {workers} workers.")
+    return merge_tiles(tiles, results, width, height)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# Which OCR words contain a keyword, fast enough to ask on every keystroke.
+#
+# TokenIndex is built once per OCR result.  Words are lowercased and grouped
+# by text, and every distinct text is filed under each of its substrings of
+# up to GRAM chars.  A keyword that short is a single lookup; a longer one
+# intersects the lists of its GRAM-grams and checks the few texts left.
+# Results are kept per keyword, and a keyword that extends one already asked
+# (the user typed another letter) only filters that keyword's matches.
+#
+# Keywords are separated by commas; /.../ is a regular expression, matched
+# against each distinct text (case-insensitive).
+import re
+
+GRAM = 3
+MAX_CACHED = 256
+
+# Terms from the user's text: lowercase strings and compiled patterns
+def parse_terms(text):
+    terms = []
+    for part in text.split(","):
+        part = part.strip()
+        if len(part) > 2 and part.startswith("/") and part.endswith("/"):
+            terms.append(re.compile(part[1:-1], re.IGNORECASE))
+        elif part:
+            terms.append(part.lower())
+    return terms
+
+# How a term is written back, e.g. into a manifest's "rule"
+def term_label(term):
+    return f"/{term.pattern}/" if hasattr(term, "pattern") else term
+
+class TokenIndex:
+    def __init__(self, data):
+        self.data = data
+        self.words = {}
+        for i, text in enumerate(data["text"]):
+            text = text.strip().lower()
+            if text:
+                self.words.setdefault(text, []).append(i)
+        self.grams = {}
+        for text in self.words:
+            for n in range(1, GRAM + 1):
+                for start in range(len(text) - n + 1):
+                    self.grams.setdefault(text[start:start + n], set()).add(text)
+        self.cache = {}
+
+    # Distinct texts containing `keyword`
+    def _texts(self, keyword):
+        if len(keyword) <= GRAM:
+            return self.grams.get(keyword, ())
+        # Typing one more letter: only the previous keyword's texts can match
+        for shorter in (keyword[:-1], keyword[1:]):
+            if shorter in self.cache:
+                return [text for text in self.cache[shorter] if keyword in text]
+        postings = sorted((self.grams.get(keyword[start:start + GRAM], ()) for start in range(len(keyword) - GRAM + 1)),
+                          key=len)
+        if not postings[0]:
+            return []
+        return [text for text in postings[0] if keyword in text and all(text in p for p in postings[1:])]
+
+    # Sorted word indices matching a term from parse_terms()
+    def search(self, term):
+        key = term_label(term)
+        texts = self.cache.get(key)
+        if texts is None:
+            if hasattr(term, "pattern"):
+                texts = [text for text in self.words if term.search(text)]
+            else:
+                texts = list(self._texts(term))
+            if len(self.cache) >= MAX_CACHED:
+                self.cache.clear()
+            self.cache[key] = texts
+        return sorted(i for text in texts for i in self.words[text])
+
+    # Word indices matching any of `terms`
+    def search_all(self, terms):
+        return sorted({i for term in terms for i in self.search(term)})
+
+    def boxes(self, words):
+        data = self.data
+        return [(data["left"][i], data["top"][i], data["width"][i], data["height"][i]) for i in words]
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# Lightweight span tracing for the app, the scripts and the daemon.
+#
+# Off unless SMARTSCREENSHOT_TRACE=1 (or `trace = 1` in smartscreenshot.ini).
+# Each finished span is written as one JSON line to SMARTSCREENSHOT_TRACE_FILE
+# (stderr when unset) and, if SMARTSCREENSHOT_CHROME_TRACE names a file, as a
+# Chrome trace event (open it in chrome://tracing or Perfetto).
+#
+# Spans share a trace id across processes: child_env() hands the current span
+# to a script started from the app through SMARTSCREENSHOT_TRACE_PARENT, and
+# context() / attach() do the same through daemon request headers, so the GUI,
+# the scripts and the daemon end up on one timeline.
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+enabled = False
+_trace_file = None
+_chrome_file = None
+_lock = threading.Lock()
+_process = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python"
+_current = contextvars.ContextVar("smartscreenshot_span", default=None)
+# [milliseconds per span name, open spans] while collect() is active
+_collecting = contextvars.ContextVar("smartscreenshot_stages", default=None)
+_root = None
+
+def configure():
+    global enabled, _trace_file, _chrome_file, _root
+    enabled = os.environ.get("SMARTSCREENSHOT_TRACE", "0").lower() in ("1", "true", "yes", "on")
+    _trace_file = os.environ.get("SMARTSCREENSHOT_TRACE_FILE") or None
+    _chrome_file = os.environ.get("SMARTSCREENSHOT_CHROME_TRACE") or None
+    parent = os.environ.get("SMARTSCREENSHOT_TRACE_PARENT", "")
+    if ":" in parent:
+        trace_id, span_id = parent.split(":", 1)
+        _root = {"trace_id": trace_id, "span_id": span_id}
+    else:
+        _root = None
+
+def _now_us():
+    return time.time_ns() // 1000
+
+def _write(record):
+    line = json.dumps(record)
+    with _lock:
+        if _trace_file:
+            with open(_trace_file, "a") as f:
+                f.write(line + "\n")
+        else:
+            print(line, file=sys.stderr, flush=True)
+        if _chrome_file:
+            event = {
+                "name": record["name"], "cat": record["process"], "ph": "X",
+                "ts": record["start_us"], "dur": record["dur_us"],
+                "pid": record["pid"], "tid": record["tid"],
+                "args": dict(record["attrs"], trace_id=record["trace_id"],
+                             span_id=record["span_id"], parent_id=record["parent_id"]),
+            }
+            # The JSON array form of the format may be left unterminated, so
+            # several processes can append to the same file.
+            new_file = not os.path.exists(_chrome_file) or os.path.getsize(_chrome_file) == 0
+            with open(_chrome_file, "a") as f:
+                f.write(("[\n" if new_file else "") + json.dumps(event) + ",\n")
+
+class Span:
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.trace_id = parent["trace_id"] if parent else uuid.uuid4().hex[:16]
+        self.parent_id = parent["span_id"] if parent else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attrs = attrs
+        self.start_us = _now_us()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self):
+        _write({
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start_us": self.start_us, "dur_us": _now_us() - self.start_us,
+            "pid": os.getpid(), "tid": threading.get_native_id(), "process": _process,
+            "attrs": self.attrs,
+        })
+
+class _NoSpan:
+    def set(self, **attrs):
+        pass
+
+    def end(self):
+        pass
+
+NO_SPAN = _NoSpan()
+
+def _parent_context():
+    current = _current.get()
+    if current is not None:
+        return {"trace_id": current.trace_id, "span_id": current.span_id}
+    return _root
+
+# Start a span that outlives a `with` block (e.g. an asynchronous job); call .end()
+def start_span(name, parent=None, **attrs):
+    if not enabled:
+        return NO_SPAN
+    return Span(name, parent or _parent_context(), attrs)
+
+@contextmanager
+def span(name, **attrs):
+    collecting = _collecting.get()
+    if collecting is None:
+        with _span(name, attrs) as current:
+            yield current
+        return
+    collecting[1] += 1
+    start = time.perf_counter()
+    try:
+        with _span(name, attrs) as current:
+            yield current
+    finally:
+        collecting[1] -= 1
+        if collecting[1] == 0:
+            stages = collecting[0]
+            stages[name] = stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+@contextmanager
+def _span(name, attrs):
+    if not enabled:
+        yield NO_SPAN
+        return
+    current = Span(name, _parent_context(), attrs)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        current.end()
+
+# Milliseconds spent in each outermost span opened in this thread inside the
+# block, by name, whether or not tracing is on; the benchmarks time the
+# pipeline's own stages with it
+@contextmanager
+def collect():
+    stages = {}
+    token = _collecting.set([stages, 0])
+    try:
+        yield stages
+    finally:
+        _collecting.reset(token)
+
+# Trace context for a daemon request header (None when tracing is off)
+def context(span=None):
+    if not enabled:
+        return None
+    if isinstance(span, Span):
+        return {"trace_id": span.trace_id, "span_id": span.span_id}
+    return _parent_context()
+
+# Make spans in this thread children of a context received from another process
+@contextmanager
+def attach(ctx):
+    if not enabled or not ctx:
+        yield
+        return
+    parent = Span.__new__(Span)
+    parent.trace_id = ctx["trace_id"]
+    parent.span_id = ctx["span_id"]
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+# Environment for a child process so its spans join the current trace
+def child_env(span=None):
+    env = {}
+    ctx = context(span)
+    if ctx:
+        env["SMARTSCREENSHOT_TRACE_PARENT"] = f"{ctx['trace_id']}:{ctx['span_id']}"
+    return env
+
+configure()
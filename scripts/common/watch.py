@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# Live redaction of a stream of frames from one window.
+#
+# FrameRedactor turns captured frames into redacted frames within a latency
+# budget.  A frame identical to the one last OCR'd is blurred with the boxes
+# found then, without touching tesseract.  A changed frame is OCR'd
+# (incrementally, so only the changed bands) on a worker thread; if that
+# finishes within the budget its boxes are used, otherwise the frame goes out
+# with the old boxes plus every changed band blurred as a whole, so text that
+# has not been checked yet is never shown.  The next frames pick up the new
+# boxes once the OCR pass lands.
+#
+# Sinks make the redacted frames available to other programs:
+#   dir:<directory>   numbered JPEG files, the oldest removed beyond a limit
+#   shm:<path.ssimg>  the latest frame as a raw buffer (common/shm_image.py),
+#                     replaced atomically
+#   v4l2:<device>     raw frames piped through ffmpeg into a v4l2loopback device
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import cv2
+
+from common import engine, shm_image
+from common.incremental import IncrementalOCR, changed_bands, changed_tiles
+
+class FrameRedactor:
+    def __init__(self, key, kernel_size, sigma, budget_ms=150):
+        self.key = key
+        self.kernel_size = engine.normalize_kernel(kernel_size)
+        self.sigma = sigma
+        self.budget_ms = budget_ms
+        self.incremental = IncrementalOCR(max_windows=1)
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.pending = None
+        self.ocr_frame = None
+        self.boxes = []
+        self.stats = {"frames": 0, "reused": 0, "ocr": 0, "masked": 0}
+
+    def _ocr(self, frame):
+        data = self.incremental.run_ocr(self.key, frame)
+        return frame, engine.find_sensitive_boxes(data, verbose=False)
+
+    def _collect(self, wait):
+        if self.pending is None:
+            return
+        try:
+            self.ocr_frame, self.boxes = self.pending.result(timeout=wait)
+        except TimeoutError:
+            return
+        self.pending = None
+        self.stats["ocr"] += 1
+
+    def _unchanged(self, frame):
+        return (self.ocr_frame is not None and self.ocr_frame.shape == frame.shape
+                and not changed_tiles(self.ocr_frame, frame).any())
+
+    # Full-width bands covering everything that changed since the last OCR pass
+    def _unchecked(self, frame):
+        height, width = frame.shape[:2]
+        if self.ocr_frame is None or self.ocr_frame.shape != frame.shape:
+            return [(0, 0, width, height)]
+        bands = changed_bands(changed_tiles(self.ocr_frame, frame), height, self.boxes)
+        return [(0, y0, width, y1 - y0) for y0, y1 in bands]
+
+    # Redacted copy of `frame` (an (h, w, 3) BGR array)
+    def redact(self, frame):
+        start = time.perf_counter()
+        self.stats["frames"] += 1
+        self._collect(0)
+        if self._unchanged(frame):
+            self.stats["reused"] += 1
+            return self._blur(frame, self.boxes)
+        if self.pending is None:
+            self.pending = self.pool.submit(self._ocr, frame.copy())
+        self._collect(max(0.0, self.budget_ms / 1000.0 - (time.perf_counter() - start)))
+        if self._unchanged(frame):
+            return self._blur(frame, self.boxes)
+        # Not checked in time: hide everything that changed since the last pass
+        self.stats["masked"] += 1
+        return self._blur(frame, list(self.boxes) + self._unchecked(frame))
+
+    def _blur(self, frame, boxes):
+        out = frame.copy()
+        if boxes:
+            engine.blur_boxes(out, boxes, self.kernel_size, self.sigma)
+        return out
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
+class DirectorySink:
+    def __init__(self, directory, keep=300):
+        self.directory = os.path.expanduser(directory)
+        self.keep = keep
+        self.index = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, frame):
+        path = os.path.join(self.directory, f"frame-{self.index:06d}.jpg")
+        cv2.imwrite(path, frame)
+        old = os.path.join(self.directory, f"frame-{self.index - self.keep:06d}.jpg")
+        if self.index >= self.keep and os.path.exists(old):
+            os.remove(old)
+        self.index += 1
+
+    def close(self):
+        pass
+
+class ShmSink:
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, frame):
+        # Readers map the file; renaming keeps them from seeing half a frame
+        temp = self.path + ".tmp" + shm_image.SUFFIX
+        shm_image.write_image(temp, frame)
+        os.replace(temp, self.path)
+
+    def close(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class V4L2Sink:
+    def __init__(self, device, fps):
+        self.device = device
+        self.fps = fps
+        self.process = None
+        self.size = None
+        self.stopped = False
+
+    def write(self, frame):
+        if self.stopped:
+            return
+        height, width = frame.shape[:2]
+        if self.process is None or self.size != (width, height):
+            self.close()
+            self.size = (width, height)
+            self.process = subprocess.Popen(
+                ["ffmpeg", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "bgr24",
+                 "-s", f"{width}x{height}", "-r", str(self.fps), "-i", "-",
+                 "-f", "v4l2", "-pix_fmt", "yuv420p", self.device],
+                stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            # Restarting would fail the same way every frame: stop the sink
+            self.stopped = True
+            returncode, errors = self._reap()
+            print(f"ffmpeg exited with status {returncode} and stopped writing to '{self.device}'"
+                  + (f": {errors}" if errors else "."))
+
+    def close(self):
+        if self.process is not None:
+            self._reap()
+
+    # Close ffmpeg's input, wait for it to exit and return (status, stderr)
+    def _reap(self):
+        process, self.process = self.process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        errors = process.stderr.read().decode("utf-8", "replace").strip()
+        return process.wait(), errors
+
+# Build a sink from "dir:<directory>", "shm:<path>" or "v4l2:<device>"
+def open_sink(spec, fps):
+    kind, _, target = spec.partition(":")
+    if kind == "dir":
+        return DirectorySink(target)
+    if kind == "shm":
+        return ShmSink(target)
+    if kind == "v4l2":
+        return V4L2Sink(target, fps)
+    raise ValueError(f"Unknown watch sink '{spec}' (use dir:, shm: or v4l2:)")
+
+# Runs redaction and the sink on one worker thread.  submit() refuses a frame
+# while the previous one is still being processed, so a slow pass drops
+# frames instead of building a queue.
+class WatchPipeline:
+    def __init__(self, redactor, sink):
+        self.redactor = redactor
+        self.sink = sink
+        self.busy = threading.Event()
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.dropped = 0
+        self.latency = 0.0
+
+    # `convert` turns the captured pixels into a BGR frame on the worker
+    def submit(self, pixels, convert=None, on_done=None):
+        if self.busy.is_set():
+            self.dropped += 1
+            return False
+        self.busy.set()
+        self.pool.submit(self._process, pixels, convert, on_done)
+        return True
+
+    def _process(self, pixels, convert, on_done):
+        start = time.perf_counter()
+        try:
+            frame = convert(pixels) if convert else pixels
+            out = self.redactor.redact(frame)
+            self.sink.write(out)
+            self.latency = time.perf_counter() - start
+            if on_done:
+                on_done(out)
+        except Exception as e:
+            print("Watch frame failed:", e)
+        finally:
+            self.busy.clear()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.redactor.close()
+        self.sink.close()
@@ -1,87 +1,107 @@
 #!/usr/bin/env python3
-import cv2
-import pytesseract
-import re
 import os
 import sys
 
-if len(sys.argv) < 3:
-    print("Usage: {} <input_image> <output_image> [kernel_size] [sigma]".format(sys.argv[0]))
-    sys.exit(1)
-
-image_path = sys.argv[1]
-output_path = sys.argv[2]
-
-print("Image Path : ",image_path)
-print("Output Image Path : ",output_path)
-
-try:
-    kernel_size = int(sys.argv[3]) if len(sys.argv) > 3 else 99
-except:
-    kernel_size = 99
-try:
-    sigma = float(sys.argv[4]) if len(sys.argv) > 4 else 30
-except:
-    sigma = 30
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import client, tracing
+from common.manifest import manifest_path, pop_manifest_args
+from common.ocr_profiles import pop_profile_arg
 
-if kernel_size % 2 == 0:
-    kernel_size += 1
-
-overwrite_original = True
-
-image = cv2.imread(image_path)
-if image is None:
-    print(f"Error: Could not read the image file '{image_path}'")
+def usage():
+    print("Usage: {} <input_image> <output_image> [kernel_size] [sigma] [--profile fast|balanced|accurate] [--manifest]".format(sys.argv[0]))
+    print("       {} --render <manifest.json> <input_image> <output_image> [kernel_size] [sigma]".format(sys.argv[0]))
+    print("       {} --batch <input_dir|glob|@file_list> <output_dir> [kernel_size] [sigma] [workers] [--profile ...] [--manifest]".format(sys.argv[0]))
     sys.exit(1)
-print("Image loaded successfully.")
-
-data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-texts = data["text"]
-lefts = data["left"]
-tops = data["top"]
-widths = data["width"]
-heights = data["height"]
-print(f"Detected {len([t for t in texts if t.strip()])} non-empty text regions.")
-
-sensitive_labels = ["password", "api key", "secret", "token", "pwd", "pass", "credential", "key"]
-
-sensitive_patterns = [
-    re.compile(r'[a-fA-F0-9]{32,}'),
-    re.compile(r'[A-Za-z0-9-_]{20,}'),
-    re.compile(r'eyJ[A-Za-z0-9-_]+\.eyJ[A-Za-z0-9-_]+\.[A-Za-z0-9-_]+'),
-    re.compile(r'[A-Za-z0-9+/]{20,}=*'),
-]
-
-sensitive_boxes = []
-for i in range(len(texts)):
-    text = texts[i].strip()
-    if not text:
-        continue
-    lower_text = text.lower()
-
-    if any(label in lower_text for label in sensitive_labels):
-        print(f"Found potential sensitive label in text: '{texts[i]}'")
-        sensitive_boxes.append((lefts[i], tops[i], widths[i], heights[i]))
-        for j in range(i + 1, len(texts)):
-            if abs(tops[j] - tops[i]) < 10 and texts[j].strip():
-                print(f"Blurring subsequent text as sensitive value: '{texts[j]}'")
-                sensitive_boxes.append((lefts[j], tops[j], widths[j], heights[j]))
-                break
-    elif any(pattern.search(text) for pattern in sensitive_patterns):
-        print(f"Found potential standalone secret: '{text}'")
-        sensitive_boxes.append((lefts[i], tops[i], widths[i], heights[i]))
-
-print(f"Number of sensitive boxes detected: {len(sensitive_boxes)}")
-
-def blur_region(image, x, y, w, h):
-    roi = image[y:y+h, x:x+w]
-    kernel = (kernel_size, kernel_size)
-    blurred_roi = cv2.GaussianBlur(roi, kernel, sigma)
-    image[y:y+h, x:x+w] = blurred_roi
-
-for box in sensitive_boxes:
-    x, y, w, h = box
-    blur_region(image, x, y, w, h)
 
-cv2.imwrite(output_path, image)
-print(f"Processed image saved as '{output_path}'.")
\ No newline at end of file
+def parse_blur_args(args):
+    try:
+        kernel_size = int(args[0]) if len(args) > 0 else 99
+    except:
+        kernel_size = 99
+    try:
+        sigma = float(args[1]) if len(args) > 1 else 30
+    except:
+        sigma = 30
+    if kernel_size % 2 == 0:
+        kernel_size += 1
+    return kernel_size, sigma
+
+def run_batch(args, write_manifest=False):
+    if len(args) < 2:
+        usage()
+    from common.batch import run_batch
+    kernel_size, sigma = parse_blur_args(args[2:4])
+    try:
+        workers = int(args[4]) if len(args) > 4 else None
+    except ValueError:
+        workers = None
+    finished = run_batch(args[0], args[1], kernel_size, sigma, workers, write_manifest=write_manifest)
+    sys.exit(1 if any("error" in item for item in finished) else 0)
+
+def main():
+    with tracing.span("secrets-handling"):
+        redact()
+
+def redact():
+    # Through the environment so batch workers and the engine import below see it
+    profile = pop_profile_arg(sys.argv)
+    if profile:
+        os.environ["SMARTSCREENSHOT_OCR_PROFILE"] = profile
+    write_manifest, render_path = pop_manifest_args(sys.argv)
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        if render_path:
+            print("--render takes a single image and cannot be combined with --batch")
+            sys.exit(1)
+        run_batch(sys.argv[2:], write_manifest)
+    if len(sys.argv) < 3:
+        usage()
+
+    image_path = sys.argv[1]
+    output_path = sys.argv[2]
+
+    print("Image Path : ",image_path)
+    print("Output Image Path : ",output_path)
+
+    kernel_size, sigma = parse_blur_args(sys.argv[3:5])
+    if render_path:
+        from common import manifest
+        manifest.render_file(render_path, image_path, output_path, kernel_size, sigma)
+        sys.exit(0)
+    saved_manifest = manifest_path(output_path) if write_manifest else None
+
+    # Hand the work to the redaction daemon when one is running; this skips the
+    # OpenCV/tesseract imports below entirely.
+    boxes = client.redact_file(image_path, output_path, kernel_size, sigma, profile=profile,
+                               manifest_path=saved_manifest)
+    if boxes is not None:
+        print(f"Number of sensitive boxes detected: {len(boxes)}")
+        print(f"Processed image saved as '{output_path}' by the redaction daemon.")
+        sys.exit(0)
+
+    from common import engine, manifest, shm_image
+
+    with tracing.span("decode", path=image_path):
+        image = shm_image.read_image(image_path)
+    if image is None:
+        print(f"Error: Could not read the image file '{image_path}'")
+        sys.exit(1)
+    print("Image loaded successfully.")
+
+    try:
+        if saved_manifest:
+            redactions = manifest.redact(image, kernel_size, sigma)
+        else:
+            engine.redact(image, kernel_size, sigma)
+    except engine.OCRTimeout as e:
+        print(f"Error: {e}; no output written.")
+        sys.exit(1)
+
+    with tracing.span("write", path=output_path):
+        shm_image.write_image(output_path, image)
+    print(f"Processed image saved as '{output_path}'.")
+    if saved_manifest:
+        manifest.save(saved_manifest, redactions)
+        print(f"Redaction manifest saved as '{saved_manifest}'.")
+
+if __name__ == "__main__":
+    main()
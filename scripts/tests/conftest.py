@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import the shared code the way the scripts do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
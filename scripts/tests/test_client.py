@@ -0,0 +1,40 @@
+import socket
+import threading
+
+from common import client
+
+# A daemon that accepts connections and never answers
+def hung_daemon(path):
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(4)
+    accepted = []
+    def accept():
+        try:
+            while True:
+                accepted.append(server.accept())
+        except OSError:
+            pass
+    threading.Thread(target=accept, daemon=True).start()
+    return server
+
+def test_hung_daemon_times_out_and_falls_back(tmp_path, monkeypatch):
+    path = str(tmp_path / "redactd.sock")
+    server = hung_daemon(path)
+    monkeypatch.setenv("SMARTSCREENSHOT_DAEMON_TIMEOUT", "0.2")
+    try:
+        assert client.redact_file(str(tmp_path / "in.png"), str(tmp_path / "out.png"), 51, 20,
+                                  socket_path=path) is None
+        assert not client.is_running(path)
+    finally:
+        server.close()
+
+def test_daemon_can_be_switched_off(tmp_path, monkeypatch):
+    path = str(tmp_path / "redactd.sock")
+    server = hung_daemon(path)
+    monkeypatch.setenv("SMARTSCREENSHOT_DAEMON", "0")
+    monkeypatch.setenv("SMARTSCREENSHOT_DAEMON_TIMEOUT", "30")
+    try:
+        assert client.request({"op": "ping"}, socket_path=path) is None
+    finally:
+        server.close()
@@ -0,0 +1,37 @@
+from common.line_index import LineIndex
+
+def ocr_data(words):
+    keys = ["text", "left", "top", "width", "height", "block_num", "par_num", "line_num"]
+    return {key: [word[n] for word in words] for n, key in enumerate(keys)}
+
+def value_texts(data, label):
+    index = LineIndex(data)
+    return [data["text"][j] for j in index.value_for(data["text"].index(label))]
+
+def test_value_far_right_of_a_small_label():
+    # A wide form: 14 px labels, values 200 px to their right in another block
+    data = ocr_data([
+        ("Password:", 20, 40, 90, 14, 1, 1, 1),
+        ("hunter2", 310, 40, 70, 14, 2, 1, 1),
+        ("Username:", 20, 80, 90, 14, 1, 1, 2),
+        ("alice", 310, 80, 50, 14, 2, 1, 2),
+        ("Submit", 900, 120, 60, 14, 3, 1, 1),
+    ])
+    assert value_texts(data, "Password:") == ["hunter2"]
+    assert value_texts(data, "Username:") == ["alice"]
+
+def test_value_on_the_same_line():
+    data = ocr_data([
+        ("api_key", 10, 10, 70, 16, 1, 1, 1),
+        ("=", 85, 10, 10, 16, 1, 1, 1),
+        ("abc123", 100, 10, 60, 16, 1, 1, 1),
+        ("next:", 10, 40, 50, 16, 1, 1, 2),
+    ])
+    assert value_texts(data, "api_key") == ["=", "abc123"]
+
+def test_value_below_the_label():
+    data = ocr_data([
+        ("Token", 10, 10, 50, 16, 1, 1, 1),
+        ("eyJhbGciOi", 10, 32, 120, 16, 1, 1, 2),
+    ])
+    assert value_texts(data, "Token") == ["eyJhbGciOi"]
@@ -0,0 +1,31 @@
+from common.matcher import Matcher
+
+def kinds(hits):
+    return [(hit.kind, hit.rule) if hit else None for hit in hits]
+
+def test_low_entropy_match_does_not_hide_other_rules():
+    patterns = [{"name": "repeated", "regex": r"[a-z0-9]{20,}", "min_entropy": 3.5},
+                {"name": "keyish", "regex": r"k[a-z0-9]{20,}", "min_entropy": 0}]
+    matcher = Matcher(labels=[], patterns=patterns)
+    assert kinds(matcher.classify(["kaaaaaaaaaaaaaaaaaaaaaaa"])) == [("secret", "keyish")]
+
+def test_anchors_bind_to_each_token():
+    patterns = [{"name": "pin", "regex": r"^[0-9]{6}$", "min_entropy": 0}]
+    matcher = Matcher(labels=[], patterns=patterns)
+    assert kinds(matcher.classify(["code", "482913", "1234567", "x482913"])) == \
+        [None, ("secret", "pin"), None, None]
+
+def test_lookbehind_rules_are_matched_per_token():
+    patterns = [{"name": "suffix", "regex": r"(?<![A-Za-z])[0-9]{8}\Z", "min_entropy": 0}]
+    matcher = Matcher(labels=[], patterns=patterns)
+    assert kinds(matcher.classify(["a", "12345678", "b12345678"])) == [None, ("secret", "suffix"), None]
+
+def test_labels_after_length_changing_lowercase():
+    # "İ".lower() is two characters long
+    matcher = Matcher(labels=["password"], patterns=[])
+    assert kinds(matcher.classify(["İİİİİİİİİİ", "password:", "a", "b", "c"])) == \
+        [None, ("label", "password"), None, None, None]
+
+def test_default_rules():
+    hits = Matcher().classify(["Password:", "hunter2", "ghp_8fK2mQ9xLw3ZrT7vNb4Yc1Hd", "aaaaaaaaaaaaaaaaaaaaaaaa"])
+    assert kinds(hits) == [("label", "password"), None, ("secret", "token"), None]
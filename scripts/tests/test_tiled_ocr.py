@@ -0,0 +1,41 @@
+from common.tiled_ocr import merge_tiles, tile_grid
+
+# image_to_data output for `words`: (text, left, top, width, height) in tile coordinates
+def ocr_data(words):
+    data = {key: [] for key in ["level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                                "left", "top", "width", "height", "conf", "text"]}
+    for n, (text, left, top, width, height) in enumerate(words):
+        for key, value in dict(level=5, page_num=1, block_num=1, par_num=1, line_num=1, word_num=n + 1,
+                               left=left, top=top, width=width, height=height, conf=90, text=text).items():
+            data[key].append(value)
+    return data
+
+def test_token_wider_than_overlap_across_seam_is_kept():
+    tiles = tile_grid(1800, 400, 1000, 200)
+    assert tiles == [(0, 0, 1000, 400), (800, 0, 1800, 400)]
+    # A 400 px token from x=700 to 1100: cut by the right edge of the first
+    # tile and by the left edge of the second
+    results = [ocr_data([("hello", 100, 50, 80, 20), ("sk-live-abcdefgh", 700, 100, 300, 20)]),
+               ocr_data([("ghijklmnop0123", 0, 100, 300, 20), ("world", 500, 50, 80, 20)])]
+    merged = merge_tiles(tiles, results, 1800, 400)
+    boxes = dict(zip(merged["text"], zip(merged["left"], merged["top"], merged["width"], merged["height"])))
+    assert boxes["hello"] == (100, 50, 80, 20)
+    assert boxes["world"] == (1300, 50, 80, 20)
+    assert boxes["sk-live-abcdefgh"] == (700, 100, 400, 20)
+    assert len(merged["text"]) == 3
+
+def test_word_in_overlap_is_kept_once():
+    tiles = tile_grid(1800, 400, 1000, 200)
+    # Whole in both tiles, centre at x=900
+    results = [ocr_data([("token", 860, 100, 80, 20)]), ocr_data([("token", 60, 100, 80, 20)])]
+    merged = merge_tiles(tiles, results, 1800, 400)
+    assert merged["text"] == ["token"]
+    assert (merged["left"], merged["width"]) == ([860], [80])
+
+def test_fragment_of_word_seen_whole_is_dropped():
+    tiles = tile_grid(1800, 400, 1000, 200)
+    # Cut by the first tile's right edge, whole in the second
+    results = [ocr_data([("pass", 920, 100, 80, 20)]), ocr_data([("password", 120, 100, 150, 20)])]
+    merged = merge_tiles(tiles, results, 1800, 400)
+    assert merged["text"] == ["password"]
+    assert merged["left"] == [920]
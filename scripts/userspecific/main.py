@@ -1,80 +1,48 @@
 #!/usr/bin/env python3
-import cv2
-import pytesseract
-import re
 import os
+import re
 import sys
 
-def blur_region(image, x, y, w, h, kernel_size, sigma):
-    roi = image[y:y+h, x:x+w]
-    blurred_roi = cv2.GaussianBlur(roi, (kernel_size, kernel_size), sigma)
-    image[y:y+h, x:x+w] = blurred_roi
-
-def auto_blur(image, kernel_size, sigma):
-    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-    texts = data["text"]
-    lefts = data["left"]
-    tops = data["top"]
-    widths = data["width"]
-    heights = data["height"]
-    print(f"Detected {len([t for t in texts if t.strip()])} non-empty text regions.")
-
-    sensitive_labels = ["password", "api key", "secret", "token", "pwd", "pass", "credential", "key"]
-    sensitive_patterns = [
-        re.compile(r'[a-fA-F0-9]{32,}'),
-        re.compile(r'[A-Za-z0-9-_]{20,}'),
-        re.compile(r'eyJ[A-Za-z0-9-_]+\.eyJ[A-Za-z0-9-_]+\.[A-Za-z0-9-_]+'),
-        re.compile(r'[A-Za-z0-9+/]{20,}=*'),
-    ]
-
-    sensitive_boxes = []
-    for i in range(len(texts)):
-        text = texts[i].strip()
-        if not text:
-            continue
-        lower_text = text.lower()
-
-        if any(label in lower_text for label in sensitive_labels):
-            print(f"Found potential sensitive label in text: '{texts[i]}'")
-            sensitive_boxes.append((lefts[i], tops[i], widths[i], heights[i]))
-            for j in range(i + 1, len(texts)):
-                if abs(tops[j] - tops[i]) < 10 and texts[j].strip():
-                    print(f"Blurring subsequent text as sensitive value: '{texts[j]}'")
-                    sensitive_boxes.append((lefts[j], tops[j], widths[j], heights[j]))
-                    break
-        elif any(pattern.search(text) for pattern in sensitive_patterns):
-            print(f"Found potential standalone secret: '{text}'")
-            sensitive_boxes.append((lefts[i], tops[i], widths[i], heights[i]))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import client, shm_image, tracing
+from common import manifest
+from common.ocr_profiles import pop_profile_arg
+from common.token_index import TokenIndex, parse_terms, term_label
 
-    print(f"Number of sensitive boxes detected: {len(sensitive_boxes)}")
-    for box in sensitive_boxes:
-        x, y, w, h = box
-        blur_region(image, x, y, w, h, kernel_size, sigma)
-    return image
+# Keyword boxes are added to `redactions` (a manifest) when one is given
+def manual_blur_by_keyword(image, kernel_size, sigma, redactions=None):
+    from common.engine import blur_keywords, run_ocr
 
-def manual_blur_by_keyword(image, kernel_size, sigma):
-    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-    texts = data["text"]
-    lefts = data["left"]
-    tops = data["top"]
-    widths = data["width"]
-    heights = data["height"]
+    # Served from the OCR cache when auto_blur already read this image
+    index = TokenIndex(run_ocr(image))
 
     while True:
-        keyword = input("Enter a detail keyword to blur (e.g. 'password' or 'name') or press Enter to finish: ").strip().lower()
-        if not keyword:
+        text = input("Enter detail keywords to blur, comma separated (e.g. 'password, name' or '/[0-9]{6}/') "
+                     "or press Enter to finish: ").strip()
+        if not text:
             break
-        count = 0
-        for i, text in enumerate(texts):
-            if keyword in text.lower():
-                blur_region(image, lefts[i], tops[i], widths[i], heights[i], kernel_size, sigma)
-                count += 1
-        print(f"Blurred {count} regions containing '{keyword}'.")
+        try:
+            terms = parse_terms(text)
+        except re.error as e:
+            print(f"Invalid pattern: {e}")
+            continue
+        boxes = blur_keywords(image, terms, kernel_size, sigma, index)
+        if redactions is not None:
+            for term in terms:
+                redactions["redactions"].extend(manifest.keyword_redactions(index.boxes(index.search(term)),
+                                                                            term_label(term)))
+        print(f"Blurred {len(boxes)} regions matching '{text}'.")
     return image
 
 def main():
+    # Through the environment so the engine import below sees it
+    profile = pop_profile_arg(sys.argv)
+    if profile:
+        os.environ["SMARTSCREENSHOT_OCR_PROFILE"] = profile
+    write_manifest, render_path = manifest.pop_manifest_args(sys.argv)
     if len(sys.argv) < 3:
-        print("Usage: {} <input_image> <output_image> [kernel_size] [sigma]".format(sys.argv[0]))
+        print("Usage: {} <input_image> <output_image> [kernel_size] [sigma] [--profile fast|balanced|accurate] [--manifest]".format(sys.argv[0]))
+        print("       {} --render <manifest.json> <input_image> <output_image> [kernel_size] [sigma]".format(sys.argv[0]))
         sys.exit(1)
 
     image_path = sys.argv[1]
@@ -95,18 +63,44 @@ def main():
     if kernel_size % 2 == 0:
         kernel_size += 1
 
-    image = cv2.imread(image_path)
+    # Keyword blurs saved with --manifest are in the manifest, so no prompt
+    if render_path:
+        manifest.render_file(render_path, image_path, output_path, kernel_size, sigma)
+        sys.exit(0)
+
+    with tracing.span("decode", path=image_path):
+        image = shm_image.read_image(image_path)
     if image is None:
         print(f"Error: Could not read the image file '{image_path}'")
         sys.exit(1)
     print("Image loaded successfully.")
 
-    auto_blur(image, kernel_size, sigma)
-
-    manual_blur_by_keyword(image, kernel_size, sigma)
-
-    cv2.imwrite(output_path, image)
+    # The manifest is built here, so the daemon is only asked without one
+    redactions = None
+    redacted = None if write_manifest else client.redact_array(image, kernel_size, sigma, profile=profile)
+    if redacted is not None:
+        image = redacted[0]
+        print(f"Redaction daemon blurred {len(redacted[1])} sensitive boxes.")
+    else:
+        from common import engine
+        try:
+            if write_manifest:
+                redactions = manifest.redact(image, kernel_size, sigma)
+            else:
+                engine.auto_blur(image, kernel_size, sigma)
+        except engine.OCRTimeout as e:
+            print(f"Error: {e}; no output written.")
+            sys.exit(1)
+
+    manual_blur_by_keyword(image, kernel_size, sigma, redactions)
+
+    with tracing.span("write", path=output_path):
+        shm_image.write_image(output_path, image)
     print(f"Processed image saved as '{output_path}'.")
+    if redactions is not None:
+        manifest.save(manifest.manifest_path(output_path), redactions)
+        print(f"Redaction manifest saved as '{manifest.manifest_path(output_path)}'.")
 
 if __name__ == "__main__":
-    main()
+    with tracing.span("userspecific"):
+        main()